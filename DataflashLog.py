@@ -9,13 +9,53 @@ from __future__ import print_function
 import bisect
 import collections
 import ctypes
+import io
 import os
 import sys
 
-import numpy
-
 from VehicleType import VehicleType, VehicleTypeString
 
+# magic bytes of the compressed formats open_log understands
+compressionMagic = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+def compression(filename):
+    '''returns 'gzip', 'xz', 'bz2' or 'zstd' if the file is compressed, judged by its first bytes, or None'''
+    with open(filename, 'rb') as f:
+        head = f.read(6)
+    for (magic, name) in compressionMagic:
+        if head.startswith(magic):
+            return name
+    return None
+
+def open_log(filename):
+    '''opens a log for reading bytes. Compressed logs are decompressed as they are read, a buffer at a time, never as a whole'''
+    kind = compression(filename)
+    if kind == 'gzip':
+        import gzip
+        return gzip.open(filename, 'rb')
+    elif kind == 'xz':
+        import lzma
+        return lzma.open(filename, 'rb')
+    elif kind == 'bz2':
+        import bz2
+        return bz2.open(filename, 'rb')
+    elif kind == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception("{} is zstd compressed, reading it needs the zstandard module".format(filename))
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True))
+    return open(filename, 'rb')
+
+def _str(value):
+    '''binary logs hold strings as bytes, decode them on Python 3'''
+    return value if isinstance(value, str) else value.decode('ascii', 'replace')
+
 
 class Format(object):
     '''Data channel format as specified by the FMT lines in the log file'''
@@ -134,6 +174,7 @@ class BinaryFormat(ctypes.LittleEndianStructure):
         'C': 100,
         'e': 100,
         'E': 100,
+        'L': 1e7, # latitude/longitude in 1e-7 degrees
     }
 
     _packed_ = True
@@ -149,17 +190,18 @@ class BinaryFormat(ctypes.LittleEndianStructure):
         return "<{cls} {data}>".format(cls=self.__class__.__name__, data = ' '.join(["{}:{}".format(k,getattr(self,k)) for (k,_) in self._fields_[1:]]))
 
     def to_class(self):
+        name, types, labels = _str(self.name), _str(self.types), _str(self.labels)
         members = dict(
-            NAME = self.name,
+            NAME = name,
             MSG = self.type,
             SIZE = self.length,
-            labels = self.labels.split(",") if self.labels else [],
+            labels = labels.split(",") if labels else [],
             _pack_ = True)
 
-        fieldtypes = [i for i in self.types]
-        fieldlabels = self.labels.split(",")
-        if self.labels and (len(fieldtypes) != len(fieldlabels)):
-            print("Broken FMT message for {} .. ignoring".format(self.name), file=sys.stderr)
+        fieldtypes = [i for i in types]
+        fieldlabels = labels.split(",")
+        if labels and (len(fieldtypes) != len(fieldlabels)):
+            print("Broken FMT message for {} .. ignoring".format(name), file=sys.stderr)
             return None
 
         fields = [('head',logheader)]
@@ -175,6 +217,8 @@ class BinaryFormat(ctypes.LittleEndianStructure):
                 p = property(lambda x:getattr(x, attributename))
                 if scale is not None:
                     p = property(lambda x:getattr(x, attributename) / scale) 
+                elif format in "nNZ":
+                    p = property(lambda x:_str(getattr(x, attributename)))
                 members[propertyname] = p
                 try:
                     fields.append((attributename, BinaryFormat.FIELD_FORMAT[format]))
@@ -189,7 +233,7 @@ class BinaryFormat(ctypes.LittleEndianStructure):
 
         # finally, create the class
         cls = type(\
-            'Log__{:s}'.format(self.name),
+            'Log__{:s}'.format(name),
             (ctypes.LittleEndianStructure,),
             members
         )
@@ -223,6 +267,7 @@ class Channel(object):
     def max(self):
         return max(self.dictData.values())
     def avg(self):
+        import numpy # numpy is slow to import and this is its only user, so only pay for it here
         return numpy.mean(self.dictData.values())
     def getNearestValueFwd(self, lineNumber):
         '''Returns (value,lineNumber)'''
@@ -431,6 +476,7 @@ class DataflashLog(object):
         self.durationSecs = 0
         self.lineCount    = 0
         self.skippedLines = 0
+        self.corruptRanges = [] # (start, end) byte offsets of the corrupt data skipped in a binary log
         self.backpatch_these_modechanges = []
 
         if logfile:
@@ -461,28 +507,32 @@ class DataflashLog(object):
         if self.filename == '<stdin>':
             f = sys.stdin
         else:
-            f = open(self.filename, 'r')
+            f = open_log(self.filename) # bytes, decompressed on the fly
 
         if format == 'bin':
-            head = '\xa3\x95\x80\x80'
+            head = b'\xa3\x95\x80\x80'
         elif format == 'log':
-            head = ""
+            head = b""
         elif format == 'auto':
             if self.filename == '<stdin>':
                 # assuming TXT format
 #                raise ValueError("Invalid log format for stdin: {}".format(format))
-                head = ""
+                head = b""
             else:
-                head = f.read(4)
-                f.seek(0)
+                head = f.peek(4)[:4]
         else:
             raise ValueError("Unknown log format for {}: {}".format(self.filename, format))
 
-        if head == '\xa3\x95\x80\x80':
-            numBytes, lineNumber = self.read_binary(f, ignoreBadlines)
-            pass
-        else:
-            numBytes, lineNumber = self.read_text(f, ignoreBadlines)
+        try:
+            if head == b'\xa3\x95\x80\x80':
+                numBytes, lineNumber = self.read_binary(f, ignoreBadlines)
+            else:
+                if f is not sys.stdin:
+                    f = io.TextIOWrapper(f, encoding='utf-8', errors='replace')
+                numBytes, lineNumber = self.read_text(f, ignoreBadlines)
+        finally:
+            if f is not sys.stdin:
+                f.close()
 
         # gather some general stats about the log
         self.lineCount  = lineNumber
@@ -604,12 +654,16 @@ class DataflashLog(object):
                 channel.listData.append((lineNumber, value))
 
 
-    def read_text(self, f, ignoreBadlines):
-        self.formats = {'FMT':Format}
-        lineNumber = 0
+    def read_text(self, f, ignoreBadlines, firstLine=1, lastLine=None):
+        '''reads text log lines from f. To read a window of a log, f can start at line firstLine (the formats must already be known then), and reading stops after lastLine'''
+        if firstLine == 1:
+            self.formats = {'FMT':Format}
+        lineNumber = firstLine - 1
         numBytes = 0
         knownHardwareTypes = ["APM", "PX4", "MPNG"]
         for line in f:
+            if lastLine is not None and lineNumber >= lastLine:
+                break
             lineNumber = lineNumber + 1
             numBytes += len(line) + 1
             try:
@@ -664,34 +718,82 @@ class DataflashLog(object):
             numBytes += e.SIZE
 #            print(e)
             self.process(lineNumber, e)
+        if self.corruptRanges:
+            print("Skipped {} bytes of corrupt data in {} places: {}{}".format(
+                sum(end - start for (start, end) in self.corruptRanges), len(self.corruptRanges),
+                ', '.join("{}-{}".format(start, end) for (start, end) in self.corruptRanges[:10]),
+                ', ...' if len(self.corruptRanges) > 10 else ''), file=sys.stderr)
         return (numBytes,lineNumber)
 
-    def _read_binary(self, f, ignoreBadlines):
+    def _isMessageAt(self, data, offset, eof):
+        '''whether data[offset:] looks like a real message, not a 0xA3 0x95 inside corrupt data: its type is known, and it is followed by another header or by the end of the log'''
+        typ = self._formats.get(data[offset+2])
+        if typ is None:
+            return False
+        end = offset + typ.SIZE
+        if eof and end == len(data):
+            return True
+        return end + 2 <= len(data) and data[end] == 0xa3 and data[end+1] == 0x95
+
+    def _read_binary(self, f, ignoreBadlines, chunkSize=65536):
+        '''
+            yields the messages of a binary log. f is read chunkSize bytes at a time, so the whole log is never in memory.
+            With ignoreBadlines, corrupt data is skipped by searching for the next 0xA3 0x95 header that is followed by
+            another one, and the (start, end) byte offsets of the skipped data are added to self.corruptRanges.
+        '''
         self._formats = {128:BinaryFormat}
-        data = bytearray(f.read())
+        data = bytearray()
+        start = 0 # file offset of data[0]
         offset = 0
-        while len(data) > offset + ctypes.sizeof(logheader):
-            h = logheader.from_buffer(data, offset)
-            if not (h.head1 == 0xa3 and h.head2 == 0x95):
+        eof = False
+        corruptStart = None # file offset where the corrupt data being skipped starts
+        while True:
+            # keep at least one whole message (at most 255 bytes) and the next header ahead of offset
+            while not eof and len(data) - offset < 512:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    eof = True
+                    break
+                del data[:offset]
+                start += offset
+                offset = 0
+                data += chunk
+            if len(data) <= offset + ctypes.sizeof(logheader):
+                break
+            good = data[offset] == 0xa3 and data[offset+1] == 0x95
+            if good and ignoreBadlines and (corruptStart is not None or data[offset+2] not in self._formats):
+                good = self._isMessageAt(data, offset, eof)
+            if not good:
+                h = logheader.from_buffer_copy(data, offset)
                 if ignoreBadlines == False:
                     raise ValueError(h)
                 else:
                     if h.head1 == 0xff and h.head2 == 0xff and h.msgid == 0xff:
-                        print("Assuming EOF due to dataflash block tail filled with \\xff... (offset={off})".format(off=offset), file=sys.stderr)
+                        print("Assuming EOF due to dataflash block tail filled with \\xff... (offset={off})".format(off=start+offset), file=sys.stderr)
                         break
-                    offset += 1
+                    if corruptStart is None:
+                        corruptStart = start + offset
+                    # jump to the next candidate header, or to the last byte of the buffer, which may be half of one
+                    candidate = data.find(b'\xa3\x95', offset + 1)
+                    offset = candidate if candidate != -1 else max(offset + 1, len(data) - 1)
                     continue
-
-            if h.msgid in self._formats:
-                typ = self._formats[h.msgid]
-                if len(data) <= offset + typ.SIZE:
+            if corruptStart is not None:
+                self.corruptRanges.append((corruptStart, start + offset))
+                corruptStart = None
+
+            msgid = data[offset+2]
+            if msgid in self._formats:
+                typ = self._formats[msgid]
+                if len(data) < offset + typ.SIZE:
                     break
                 try:
-                    e = typ.from_buffer(data, offset)
+                    e = typ.from_buffer_copy(data, offset) # a copy, the buffer gets compacted under it
                 except:
-                    print("data:{} offset:{} size:{} sizeof:{} sum:{}".format(len(data),offset,typ.SIZE,ctypes.sizeof(typ),offset+typ.SIZE))
+                    print("data:{} offset:{} size:{} sizeof:{} sum:{}".format(len(data),start+offset,typ.SIZE,ctypes.sizeof(typ),offset+typ.SIZE))
                     raise
                 offset += typ.SIZE
             else:
-                raise ValueError(str(h) + "unknown type")
+                raise ValueError(str(logheader.from_buffer_copy(data, offset)) + "unknown type")
             yield e
+        if corruptStart is not None:
+            self.corruptRanges.append((corruptStart, start + len(data)))
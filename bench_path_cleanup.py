@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+'''
+    Micro-benchmarks for the path_cleanup kernels, on real paths from logs/ and on synthetic paths from synthetic_flight.py.
+
+    Every kernel is timed --repeat times per path length. The samples can be saved as a JSON baseline, and a later
+    run can be compared against it: a kernel is flagged as a regression when its median got slower by more than
+    --threshold percent and by more than the spread (IQR) of the baseline samples, and a permutation test on the medians
+    says the slowdown is unlikely to be noise (p < --alpha). Scheduler jitter easily makes 3 samples look like a
+    slowdown, so nothing is flagged with fewer than MIN_SAMPLES samples on either side, and compare() warns about it.
+
+    Kernels that are quadratic in the path length (detect_loops, routine_cleanup, get_flyback_path) take minutes at
+    10,000 points, so they are skipped above --quadratic_limit unless that is raised.
+
+    Next to the get_flyback_path timings, the quality of the flyback path against its input is printed and saved,
+    so a faster cleanup that makes paths worse doesn't go unnoticed.
+'''
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+import DataflashLog
+import path_cleanup
+import path_cleanup_jit
+import synthetic_flight
+from path_cleanup import Path, PathConfig, detect_loops, point_line_dist, rdp_iter, segment_segment_dist
+from path_metrics import format_metrics, path_metrics
+from positions import gps_to_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+### inputs ###
+
+def stored_points(positions):
+    '''the points a Path would store for these positions, without any cleanup'''
+    path = Path([positions[0]])
+    for p in positions[1:]:
+        path.append_if_far_enough(p)
+    return path.path
+
+def real_path(length):
+    '''
+        Joins the stored paths of every log in logs/ end to end, repeating them if needed, and returns the first 'length' points.
+        Each log is shifted so it starts where the previous one ended, so the joined path never jumps.
+    '''
+    pieces = []
+    for f in sorted(os.listdir(os.path.join(here, 'logs'))):
+        if f.endswith('.log'):
+            ned = gps_to_ned(DataflashLog.DataflashLog(os.path.join(here, 'logs', f)))
+            if ned is not None:
+                pieces.append(stored_points(list(zip(*ned))))
+    ret = [pieces[0][0]]
+    for piece in itertools.cycle(pieces):
+        if len(ret) >= length:
+            break
+        ox, oy, oz = ret[-1]
+        sx, sy, sz = piece[0]
+        ret.extend((x-sx+ox, y-sy+oy, z-sz+oz) for (x, y, z) in piece[1:])
+    return ret[:length]
+
+def synthetic_path(length, seed=0):
+    '''the first 'length' stored points of a seeded synthetic flight, see synthetic_flight.py'''
+    n = length * 3
+    while True:
+        x, y, z = synthetic_flight.generate(n, seed)
+        path = stored_points(list(zip(x.tolist(), y.tolist(), z.tolist())))
+        if len(path) >= length:
+            return path[:length]
+        n *= 2
+
+### kernels ###
+# each takes a path, and returns (seconds, number of operations timed)
+
+def bench_segment_segment_dist(path):
+    start = time.perf_counter()
+    for i in range(len(path)-3):
+        segment_segment_dist(path[i], path[i+1], path[i+2], path[i+3])
+    return time.perf_counter() - start, len(path)-3
+
+def bench_point_line_dist(path):
+    start = time.perf_counter()
+    for i in range(len(path)-2):
+        point_line_dist(path[i+1], (path[i], path[i+2]))
+    return time.perf_counter() - start, len(path)-2
+
+def bench_rdp_iter(path):
+    path_cleanup.stk, path_cleanup.bitmask = None, None
+    start = time.perf_counter()
+    while not rdp_iter(path, path_cleanup.rdp_epsilon, float("inf")):
+        pass
+    return time.perf_counter() - start, 1
+
+def bench_detect_loops(path):
+    path_cleanup.detected_loops = []
+    start = time.perf_counter()
+    state = (0, 0)
+    while state[0] != -1:
+        state = detect_loops(path, state, float("inf"))
+    return time.perf_counter() - start, 1
+
+def bench_routine_cleanup(path):
+    # max_path_len is the path's length, so that the path is full and the cleanup has to run
+    return_path = Path(list(path), config=PathConfig(max_path_len=len(path)))
+    start = time.perf_counter()
+    return_path.routine_cleanup()
+    return time.perf_counter() - start, 1
+
+def bench_get_flyback_path(path):
+    return_path = Path(list(path))
+    start = time.perf_counter()
+    return_path.get_flyback_path()
+    return time.perf_counter() - start, 1
+
+def bench_routine_cleanup_jit(path):
+    return_path = path_cleanup_jit.JitPath(list(path), config=PathConfig(max_path_len=len(path)))
+    start = time.perf_counter()
+    return_path.routine_cleanup()
+    return time.perf_counter() - start, 1
+
+# (name, kernel, quadratic, available)
+kernels = [
+    ('segment_segment_dist', bench_segment_segment_dist, False, True),
+    ('point_line_dist', bench_point_line_dist, False, True),
+    ('rdp_iter', bench_rdp_iter, False, True),
+    ('detect_loops', bench_detect_loops, True, True),
+    ('routine_cleanup', bench_routine_cleanup, True, True),
+    ('get_flyback_path', bench_get_flyback_path, True, True),
+    ('routine_cleanup_jit', bench_routine_cleanup_jit, False, path_cleanup_jit.available), # without Numba this would time the interpreted kernels, which says nothing about the compiled ones
+]
+
+### statistics ###
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+def iqr(values):
+    '''the spread of the middle half of the samples'''
+    values = sorted(values)
+    return values[(3*len(values))//4] - values[len(values)//4]
+
+MIN_SAMPLES = 5 # fewer samples than this on either side are never flagged
+
+def permutation_p_value(baseline, current, rounds=2000, seed=0):
+    '''one-sided p-value that the median of 'current' is slower than the one of 'baseline' only by chance'''
+    observed = median(current) - median(baseline)
+    pooled = baseline + current
+    n = len(current)
+    if math.factorial(len(pooled)) // (math.factorial(n) * math.factorial(len(pooled)-n)) <= rounds:
+        splits = [list(c) for c in itertools.combinations(range(len(pooled)), n)]
+    else:
+        rng = random.Random(seed)
+        splits = [rng.sample(range(len(pooled)), n) for _ in range(rounds)]
+    at_least = 0
+    for split in splits:
+        chosen = set(split)
+        a = [pooled[i] for i in range(len(pooled)) if i in chosen]
+        b = [pooled[i] for i in range(len(pooled)) if i not in chosen]
+        if median(a) - median(b) >= observed:
+            at_least += 1
+    return at_least / float(len(splits))
+
+### main ###
+
+def run(sizes, repeat, quadratic_limit, only):
+    '''returns the timing samples per kernel, and the quality metrics of the flyback paths'''
+    results, metrics = {}, {}
+    for source in ('real', 'synthetic'):
+        for size in sizes:
+            path = real_path(size) if source == 'real' else synthetic_path(size)
+            for (name, kernel, quadratic, available) in kernels:
+                if not available or (only and name not in only) or (quadratic and size > quadratic_limit):
+                    continue
+                samples = []
+                for _ in range(repeat):
+                    seconds, ops = kernel(path)
+                    samples.append(seconds / ops)
+                key = "{}/{}/{}".format(name, source, size)
+                results[key] = samples
+                line = "{:<40} {:>12.3f} us".format(key, min(samples) * 1e6)
+                if name == 'get_flyback_path':
+                    metrics[key] = path_metrics(path, Path(list(path)).get_flyback_path())
+                    line += "   " + format_metrics(metrics[key])
+                print(line)
+                sys.stdout.flush()
+    return results, metrics
+
+def compare(baseline, results, threshold, alpha):
+    '''prints how every kernel moved against the baseline, and returns the keys which regressed'''
+    regressions = []
+    too_few = set()
+    print("\n{:<40} {:>10} {:>10} {:>8} {:>7}".format('kernel', 'base [us]', 'now [us]', 'change', 'p'))
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        base, now = baseline[key], results[key]
+        change = (median(now) / median(base) - 1) * 100. # medians, so that one preempted run doesn't count as a slowdown
+        p = permutation_p_value(base, now)
+        enough = min(len(base), len(now)) >= MIN_SAMPLES and 1. / math.comb(len(base) + len(now), len(now)) < alpha
+        if not enough:
+            too_few.add((len(base), len(now)))
+        flag = ''
+        if enough and change > threshold and median(now) - median(base) > iqr(base) and p < alpha:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print("{:<40} {:>10.3f} {:>10.3f} {:>+7.1f}% {:>7.3f}{}".format(key, median(base)*1e6, median(now)*1e6, change, p, flag))
+    for (b, n) in sorted(too_few):
+        print("warning: with {} baseline and {} new samples, nothing can be flagged, that needs at least {} on each side and p below alpha {}. Use a larger --repeat".format(
+            b, n, MIN_SAMPLES, alpha), file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the path_cleanup kernels')
+    parser.add_argument('--sizes', metavar='', type=str, default='50,100,500,1000,2000,5000,10000', help='comma separated path lengths')
+    parser.add_argument('--repeat', metavar='', type=int, default=5, help='timed runs per kernel and size')
+    parser.add_argument('--quadratic_limit', metavar='', type=int, default=1000, help='largest path length to run the quadratic kernels on')
+    parser.add_argument('--only', metavar='', type=str, default='', help='comma separated kernels to run, default all')
+    parser.add_argument('--save', metavar='', type=str, help='write the results to this JSON baseline')
+    parser.add_argument('--compare', metavar='', type=str, help='compare the results against this JSON baseline, and exit 1 on regressions')
+    parser.add_argument('--threshold', metavar='', type=float, default=10., help='smallest slowdown, in percent, that counts as a regression')
+    parser.add_argument('--alpha', metavar='', type=float, default=0.05, help='significance level of the regression test')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    only = [s for s in args.only.split(',') if s]
+    results, metrics = run(sizes, args.repeat, args.quadratic_limit, only)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'results': results,
+                'metrics': metrics,
+            }, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if compare(baseline, results, args.threshold, args.alpha):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
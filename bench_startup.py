@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+'''
+    Measures how long the tools take to start, in each mode, using python -X importtime.
+
+    Only the modules that a bare 'python -c pass' doesn't already import are counted, so the numbers are the
+    cost of our own imports, not of the interpreter or the site setup. Exits with status 1 if the headless
+    import cost is above the budget, so that batch jobs notice when somebody adds a heavy import.
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+def smallest_log():
+    logs = [os.path.join(here, 'logs', f) for f in os.listdir(os.path.join(here, 'logs')) if f.endswith('.log')]
+    return min(logs, key=os.path.getsize)
+
+def run_importtime(cmd):
+    '''runs cmd under -X importtime and returns (wall time in s, {module: self time in us})'''
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + cmd, cwd=here, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise Exception("{} failed:\n{}".format(' '.join(cmd), result.stderr))
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_us)
+    return wall, modules
+
+def median(values):
+    values = sorted(values)
+    return values[len(values)//2]
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the startup cost of visualizer.py and path_cleanup.py')
+    parser.add_argument('-n', '--runs', metavar='', type=int, default=5, help='how many times to run each mode')
+    parser.add_argument('--budget_ms', metavar='', type=float, default=50., help='fail if headless mode spends more than this many ms importing our dependencies')
+    args = parser.parse_args()
+
+    log = smallest_log()
+    modes = [
+        ('import path_cleanup', ['-c', 'import path_cleanup']),
+        ('visualizer --help', ['visualizer.py', '--help']),
+        ('visualizer --headless', ['visualizer.py', '--headless', log]),
+    ]
+
+    _, baseline = run_importtime(['-c', 'pass'])
+
+    headless_ms = None
+    print("{:<24} {:>10} {:>10}  {}".format('mode', 'wall [ms]', 'import [ms]', 'heaviest imports'))
+    for (name, cmd) in modes:
+        walls, costs = [], []
+        for _ in range(args.runs):
+            wall, modules = run_importtime(cmd)
+            ours = {k: v for (k, v) in modules.items() if k not in baseline}
+            walls.append(wall)
+            costs.append(sum(ours.values()))
+        heaviest = sorted(ours.items(), key=lambda kv: -kv[1])[:3]
+        cost_ms = median(costs) / 1000.
+        print("{:<24} {:>10.1f} {:>10.1f}  {}".format(name, median(walls)*1000., cost_ms, ', '.join(k for (k, _) in heaviest)))
+        if name == 'visualizer --headless':
+            headless_ms = cost_ms
+
+    if headless_ms > args.budget_ms:
+        print("headless startup imports take {:.1f}ms, over the {:.1f}ms budget".format(headless_ms, args.budget_ms), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
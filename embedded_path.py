@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+'''
+    Emulates the memory layout of cpp_implementation/path_cleanup.cpp, to find out how many points fit in a RAM budget
+    before flashing.
+
+    EmbeddedPath behaves like path_cleanup.Path, but every position and every intermediate result is a float32, and all
+    of its state lives in buffers preallocated with the C++ sizes: a Vector3f array of MAX_PATH_LEN points, a stack of
+    uint8 (start, finish) pairs, and a std::bitset for the RDP keep/delete flags. The C++ declares the stack
+    MAX_PATH_LEN long, but its comments ask for RDP_STACK_LEN, so the emulation checks the stack against RDP_STACK_LEN.
+    The C++ stops at the first loop it finds, so it has no loop buffer; here the detected loops go in a fixed buffer of
+    (uint8, uint8, Vector3f) structs, MAX_PATH_LEN entries long by default. Loops found after it is full are ignored,
+    which only means less gets pruned. That buffer only exists in the emulation, so footprint() leaves it out.
+
+    Instead of writing past the end of a buffer, like the C++ would, EmbeddedPath counts every overflow and keeps track
+    of the deepest the RDP stack got, so a flight can be checked against a given RDP_STACK_LEN.
+'''
+
+import argparse
+import sys
+from math import floor, log
+
+import numpy
+
+from path_cleanup import Path, PathConfig, plan_pruning
+
+MAX_PATH_LEN = 100
+RDP_STACK_LEN = 64
+
+f32 = numpy.float32
+SMALL_FLOAT = f32(0.0000001)
+FLT_MAX = f32(numpy.finfo(numpy.float32).max)
+
+point_dtype = numpy.dtype(('<f4', 3)) # Vector3f
+stack_dtype = numpy.dtype([('start', 'u1'), ('finish', 'u1')], align=True) # struct start_finish
+loop_dtype = numpy.dtype([('start', 'u1'), ('end', 'u1'), ('point', '<f4', 3)], align=True)
+index_size = 4 # last_index and worst_length are ints
+WORD_SIZE = 4 # bytes per word of a std::bitset: 4 on the 32-bit flight controllers, 8 on 64-bit hosts like SITL
+
+def required_rdp_stack_len(max_path_len):
+    '''the RDP_STACK_LEN which can never overflow, from the formula next to RDP_STACK_LEN in the C++'''
+    s = 2**int(floor(log(max_path_len)/log(2)))
+    return int((s/2-1) + min(s/2, max_path_len-s))
+
+def footprint(max_path_len=MAX_PATH_LEN, word_size=WORD_SIZE):
+    '''
+        returns the number of bytes used by each buffer of the C++, and their 'total'. The RDP stack is declared
+        MAX_PATH_LEN long, and a std::bitset takes a whole number of word_size words. Padding the compiler puts
+        between the buffers isn't counted.
+    '''
+    ret = {
+        'path': max_path_len * point_dtype.itemsize,
+        'rdp_stack': max_path_len * stack_dtype.itemsize,
+        'rdp_bitmask': (max_path_len + 8*word_size - 1) // (8*word_size) * word_size,
+        'indices': 2 * index_size,
+    }
+    ret['total'] = sum(ret.values())
+    return ret
+
+def max_points_for_budget(budget, word_size=WORD_SIZE):
+    '''the largest MAX_PATH_LEN (at most 255, because indices are uint8) whose buffers fit in 'budget' bytes'''
+    best = None
+    for n in range(2, 256):
+        if footprint(n, word_size)['total'] <= budget:
+            best = n
+    return best
+
+### float32 kernels, see path_cleanup.py for how they work ###
+
+def segment_segment_dist(p1, p2, p3, p4):
+    u = p2 - p1
+    v = p4 - p3
+    w = p1 - p3
+
+    a = u.dot(u)
+    b = u.dot(v)
+    c = v.dot(v)
+    d = u.dot(w)
+    e = v.dot(w)
+    D = a*c - b*b
+
+    if D < SMALL_FLOAT: # almost parallel
+        return FLT_MAX, numpy.zeros(3, dtype=f32)
+    t1 = min(max(f32(0), (b*e - c*d) / D), f32(1))
+    t2 = min(max(f32(0), (a*e - b*d) / D), f32(1))
+    dP = w + t1*u - t2*v
+    return numpy.sqrt(dP.dot(dP)), (p1 + t1*u + p3 + t2*v) / f32(2)
+
+def point_line_dist(point, line1, line2):
+    a = numpy.sqrt((point - line1).dot(point - line1))
+    b = numpy.sqrt((line1 - line2).dot(line1 - line2))
+    c = numpy.sqrt((line2 - point).dot(line2 - point))
+    s = (a + b + c) / f32(2)
+    area = numpy.sqrt(max(f32(0), s*(s-a)*(s-b)*(s-c)))
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return f32(2)*area/b
+
+class EmbeddedPath(object):
+    def __init__(self, home, config=None, rdp_stack_len=RDP_STACK_LEN, loop_buffer_len=None):
+        self.config = config if config is not None else PathConfig()
+        max_path_len = self.config.max_path_len
+        if max_path_len > 255:
+            raise ValueError("max_path_len must be at most 255, the C++ stores indices as uint8")
+        self.max_path_len = max_path_len
+        self.rdp_stack_len = rdp_stack_len
+        self.loop_buffer_len = max_path_len if loop_buffer_len is None else loop_buffer_len
+
+        self.points = numpy.zeros(max_path_len, dtype=point_dtype)
+        self.rdp_stack = numpy.zeros(rdp_stack_len, dtype=stack_dtype)
+        self.bitmask = numpy.ones(max_path_len, dtype=bool) # one bit per point in the std::bitset
+        self.loops = numpy.zeros(self.loop_buffer_len, dtype=loop_dtype)
+
+        self.position_delta_sq = f32(self.config.position_delta)**2
+        self.pruning_delta = f32(self.config.pruning_delta)
+        self.rdp_epsilon = f32(self.config.rdp_epsilon)
+
+        self.points[0] = home
+        self.length = 1
+        self.worst_length = 0
+
+        # what the C++ would have done wrong
+        self.path_overflows = 0
+        self.rdp_overflows = 0
+        self.loop_overflows = 0
+        self.max_rdp_depth = 0
+
+    @property
+    def path(self):
+        '''the stored points as a list of tuples, like Path.path'''
+        return [tuple(float(v) for v in p) for p in self.points[:self.length]]
+
+    def footprint(self):
+        '''the footprint() of the C++ buffers, plus the emulation's own loop buffer as 'loops', which isn't part of the total'''
+        ret = footprint(self.max_path_len)
+        ret['loops'] = self.loop_buffer_len * loop_dtype.itemsize
+        return ret
+
+    def append_if_far_enough(self, p):
+        if self.length > self.worst_length:
+            self.worst_length = self.length
+
+        p = numpy.asarray(p, dtype=f32)
+        delta = p - self.points[self.length-1]
+        if delta.dot(delta) >= self.position_delta_sq:
+            if self.length == self.max_path_len:
+                self.path_overflows += 1
+                return
+            self.points[self.length] = p
+            self.length += 1
+
+    def _detect_loops(self, path):
+        '''fills the loop buffer, like path_cleanup.detect_loops, and returns how many loops it holds'''
+        count = 0
+        min_j = 0
+        for i in range(1, len(path)-1):
+            for j in range(max(min_j, i+2), len(path)-1):
+                dist, point = segment_segment_dist(path[i], path[i+1], path[j], path[j+1])
+                if dist <= self.pruning_delta:
+                    min_j = j
+                    if count == self.loop_buffer_len:
+                        self.loop_overflows += 1
+                        return count
+                    self.loops[count] = (i+1, j+1, point)
+                    count += 1
+        return count
+
+    def _rdp(self, path):
+        '''fills the bitmask, like path_cleanup.rdp_iter run to completion, using the fixed size stack'''
+        bitmask = self.bitmask[:len(path)]
+        bitmask[:] = True
+        spill = [] # entries that didn't fit in the stack, so the result stays correct after an overflow
+        depth = 0
+
+        def push(start, finish):
+            if depth < self.rdp_stack_len:
+                self.rdp_stack[depth] = (start, finish)
+            else:
+                self.rdp_overflows += 1
+                spill.append((start, finish))
+            self.max_rdp_depth = max(self.max_rdp_depth, depth+1)
+            return depth+1
+
+        def pop():
+            if depth > self.rdp_stack_len:
+                return spill.pop()
+            entry = self.rdp_stack[depth-1]
+            return int(entry['start']), int(entry['finish'])
+
+        depth = push(0, len(path)-1)
+        while depth:
+            start, end = pop()
+            depth -= 1
+            max_dist = f32(0)
+            max_index = start
+            for i in range(start+1, end):
+                if bitmask[i]:
+                    dist = point_line_dist(path[i], path[start], path[end])
+                    if dist > max_dist:
+                        max_index = i
+                        max_dist = dist
+            if max_dist > self.rdp_epsilon:
+                depth = push(start, max_index)
+                depth = push(max_index, end)
+            else:
+                bitmask[start+1:end] = False
+        return bitmask
+
+    def _store(self, points):
+        self.points[:len(points)] = points
+        self.length = len(points)
+
+    def routine_cleanup(self):
+        '''the same decisions as Path.routine_cleanup'''
+        if self.length < self.max_path_len - 10:
+            return
+
+        path = self.points[:self.length]
+        loop_count = self._detect_loops(path)
+        loops = self.loops[:loop_count]
+        prunable = numpy.zeros(self.length, dtype=bool)
+        for loop in loops:
+            prunable[loop['start']:loop['end']] = True
+        potential_amount_to_prune = int(prunable.sum()) - loop_count
+
+        bitmask = self._rdp(path)
+        potential_amount_to_simplify = int(self.length - bitmask.sum())
+
+        if potential_amount_to_simplify > 10:
+            self._store(path[bitmask].copy())
+        elif potential_amount_to_prune:
+            candidates = [(int(loop['start']), int(loop['end']), loop['point']) for loop in loops]
+            chosen, _, _ = plan_pruning(path, candidates, 10)
+            keep = numpy.ones(self.length, dtype=bool)
+            for (a, b, _) in chosen:
+                keep[a:b] = False
+            self._store(path[keep].copy())
+        elif potential_amount_to_simplify + potential_amount_to_prune > 5:
+            self._store(numpy.array(self.get_flyback_path(), dtype=f32))
+        else:
+            raise Exception("Out of Memory. Safe RTL unavailabe.")
+
+    def get_flyback_path(self):
+        '''the same as Path.get_flyback_path, returned as a list of tuples'''
+        path = self.points[:self.length]
+        loop_count = self._detect_loops(path)
+        loops = self.loops[:loop_count].copy()
+        keep = self._rdp(path).copy()
+        ret = [tuple(float(v) for v in p) for p in path]
+        for loop in loops:
+            keep[loop['start']:loop['end']] = False
+        for loop in loops:
+            middle = int((int(loop['start']) + int(loop['end'])) / 2.)
+            ret[middle] = tuple(float(v) for v in loop['point'])
+            keep[middle] = True
+        return [p for (p, k) in zip(ret, keep) if k]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the embedded memory budget of Safe RTL')
+    parser.add_argument('logs', nargs='*', help='log files to fly through the float32 emulation')
+    parser.add_argument('--budget', metavar='', type=int, help='RAM budget in bytes: print the largest MAX_PATH_LEN that fits')
+    parser.add_argument('--max_path_len', metavar='', type=int, default=MAX_PATH_LEN, help='MAX_PATH_LEN to emulate')
+    parser.add_argument('--rdp_stack_len', metavar='', type=int, default=RDP_STACK_LEN, help='RDP_STACK_LEN to emulate')
+    parser.add_argument('--word_size', metavar='', type=int, default=WORD_SIZE, help='bytes per std::bitset word of the target: 4 for 32-bit, 8 for 64-bit')
+    args = parser.parse_args()
+
+    if args.budget is not None:
+        n = max_points_for_budget(args.budget, args.word_size)
+        if n is None:
+            print("nothing fits in {} bytes".format(args.budget))
+        else:
+            print("{} bytes fit MAX_PATH_LEN {}, and RDP_STACK_LEN {} is enough for it".format(args.budget, n, required_rdp_stack_len(n)))
+
+    size = footprint(args.max_path_len, args.word_size)
+    print("MAX_PATH_LEN {}: {} bytes".format(args.max_path_len, size['total']))
+    print('  ' + ', '.join("{} {}".format(k, v) for (k, v) in size.items() if k != 'total'))
+    print("  emulation only, not in the C++: loop buffer {} bytes".format(args.max_path_len * loop_dtype.itemsize))
+    print("RDP_STACK_LEN {} emulated, never overflows at {}".format(args.rdp_stack_len, required_rdp_stack_len(args.max_path_len)))
+
+    from positions import load_ned
+
+    config = PathConfig(max_path_len=args.max_path_len)
+    for log in args.logs:
+        ned = load_ned(log)
+        if ned is None:
+            print("{}: no GPS log data".format(log), file=sys.stderr)
+            continue
+        points = list(zip(*(a.tolist() for a in ned)))
+        embedded = EmbeddedPath(points[0], config, args.rdp_stack_len)
+        reference = Path([points[0]], config=config)
+        reference_result = None
+        flags = []
+        for p in points[1:]:
+            embedded.append_if_far_enough(p)
+            try:
+                embedded.routine_cleanup()
+            except Exception as e: # "Out of Memory. Safe RTL unavailabe."
+                flags.append(str(e))
+                break
+            if reference_result is None:
+                reference.append_if_far_enough(p)
+                try:
+                    reference.routine_cleanup()
+                except Exception: # "Out of Memory. Safe RTL unavailabe."
+                    reference_result = 'out of memory'
+        if embedded.rdp_overflows:
+            flags.append("RDP STACK OVERFLOW x{}".format(embedded.rdp_overflows))
+        if embedded.loop_overflows:
+            flags.append("loop buffer full x{}".format(embedded.loop_overflows))
+        if embedded.path_overflows:
+            flags.append("path full x{}".format(embedded.path_overflows))
+        print("{}: worst length {} (float64: {}), deepest RDP stack {}{}".format(
+            log, embedded.worst_length, reference_result or reference.worst_length, embedded.max_rdp_depth, ''.join(', ' + f for f in flags)))
+
+if __name__ == "__main__":
+    main()
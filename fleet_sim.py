@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+'''
+    Fleet-scale simulation, to size a ground station that keeps the Safe-RTL path of many vehicles at once.
+
+    Every vehicle has its own Path, fed from its own seeded synthetic trajectory (see synthetic_flight.py), or from the
+    given logs in turn. The vehicles are split into one shard per worker process. A worker advances all of its vehicles
+    in lockstep ticks: on every tick, each vehicle gets its next position, followed by a routine_cleanup, like on the
+    vehicle. A vehicle whose Path raises (e.g. runs out of memory) stops, and is counted as failed.
+
+    For every fleet size in --vehicles, this reports the aggregate appends/sec, the cleanup CPU per vehicle, and the
+    tail latency of a tick (all vehicles of a shard) and of a single vehicle's step, so the numbers can be plotted as a
+    scaling curve. 'realtime' is how many times faster than real time the fleet ran, for positions at --rate_hz: below
+    1, the host can't keep up with that fleet.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy
+
+from path_cleanup import Path, PathConfig
+
+### workers ###
+
+def vehicle_positions(spec, ticks):
+    '''the positions of one vehicle: spec is ('synthetic', seed) or ('log', filename)'''
+    kind, value = spec
+    if kind == 'synthetic':
+        import synthetic_flight
+        x, y, z = synthetic_flight.generate(ticks, seed=value)
+    else:
+        from positions import load_ned
+        ned = load_ned(value)
+        if ned is None:
+            return []
+        x, y, z = (a[:ticks] for a in ned)
+    return list(zip(x.tolist(), y.tolist(), z.tolist()))
+
+def run_shard(task):
+    '''simulates the vehicles of one shard in lockstep, returns the counts and timings'''
+    specs, ticks, config = task
+    clock = time.perf_counter
+    vehicles = [vehicle_positions(spec, ticks) for spec in specs]
+    paths = [Path([v[0]], config=PathConfig(**config)) if v else None for v in vehicles]
+    errors = [None if v else "no positions" for v in vehicles]
+    cleanup = numpy.zeros(len(paths))
+    steps = []
+    tick_seconds = []
+    appends = 0
+    for k in range(1, ticks):
+        if all(errors[i] is not None or k >= len(v) for (i, v) in enumerate(vehicles)):
+            break # every vehicle has landed or failed
+        tick_start = clock()
+        for (i, path) in enumerate(paths):
+            if errors[i] is not None or k >= len(vehicles[i]):
+                continue
+            start = clock()
+            try:
+                path.append_if_far_enough(vehicles[i][k])
+                appended = clock()
+                path.routine_cleanup()
+            except Exception as e: # e.g. "Out of Memory. Safe RTL unavailabe."
+                errors[i] = str(e) or type(e).__name__
+                continue
+            end = clock()
+            cleanup[i] += end - appended
+            steps.append(end - start)
+            appends += 1
+        tick_seconds.append(clock() - tick_start)
+    return {
+        'appends': appends,
+        'cleanup': cleanup,
+        'steps': numpy.array(steps),
+        'ticks': numpy.array(tick_seconds),
+        'errors': errors,
+        'worst_length': max([p.worst_length for p in paths if p is not None] or [0]),
+    }
+
+### fleet ###
+
+def shard(specs, jobs):
+    '''splits the vehicles into at most 'jobs' shards of nearly equal size'''
+    jobs = max(1, min(jobs, len(specs)))
+    return [specs[i::jobs] for i in range(jobs)]
+
+def fleet_specs(vehicles, logs=(), seed=0):
+    '''vehicle i flies logs[i % len(logs)], or the synthetic trajectory of seed + i if no logs are given'''
+    if logs:
+        return [('log', logs[i % len(logs)]) for i in range(vehicles)]
+    return [('synthetic', seed + i) for i in range(vehicles)]
+
+def simulate_fleet(specs, ticks, config, jobs, rate_hz=5., pool=None):
+    '''runs the fleet in a process pool (or in this process with jobs=1) and returns its numbers as a dict'''
+    tasks = [(s, ticks, config) for s in shard(specs, jobs)]
+    start = time.perf_counter()
+    if pool is not None:
+        results = pool.map(run_shard, tasks, chunksize=1)
+    else:
+        results = [run_shard(task) for task in tasks]
+    wall = time.perf_counter() - start
+
+    appends = sum(r['appends'] for r in results)
+    cleanup = numpy.concatenate([r['cleanup'] for r in results])
+    steps = numpy.concatenate([r['steps'] for r in results])
+    ticks_ms = 1e3 * numpy.concatenate([r['ticks'] for r in results])
+    errors = [e for r in results for e in r['errors'] if e is not None]
+    def pct(a, q):
+        return float(numpy.percentile(a, q)) if len(a) else float('nan')
+    return {
+        'vehicles': len(specs),
+        'jobs': len(tasks),
+        'ticks': ticks,
+        'wall_s': wall,
+        'appends': appends,
+        'appends_per_s': appends / wall if wall else 0.,
+        'realtime': (max(len(r['ticks']) for r in results) / rate_hz) / wall if wall else float('inf'),
+        'cleanup_ms_per_vehicle': 1e3 * float(cleanup.mean()) if len(cleanup) else 0.,
+        'cleanup_ms_per_vehicle_max': 1e3 * float(cleanup.max()) if len(cleanup) else 0.,
+        'tick_p50_ms': pct(ticks_ms, 50),
+        'tick_p99_ms': pct(ticks_ms, 99),
+        'tick_max_ms': float(ticks_ms.max()) if len(ticks_ms) else float('nan'),
+        'step_p99_ms': 1e3 * pct(steps, 99),
+        'step_max_ms': 1e3 * float(steps.max()) if len(steps) else float('nan'),
+        'worst_length': max(r['worst_length'] for r in results),
+        'failed': len(errors),
+        'errors': sorted(set(errors)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the Safe-RTL bookkeeping of a whole fleet, and report how it scales')
+    parser.add_argument('logs', nargs='*', help='log files the vehicles fly in turn, default a synthetic trajectory per vehicle')
+    parser.add_argument('--vehicles', metavar='', type=str, default='10,50,100,200', help='comma separated fleet sizes')
+    parser.add_argument('--ticks', metavar='', type=int, default=2000, help='most positions per vehicle')
+    parser.add_argument('--rate_hz', metavar='', type=float, default=5., help='position rate of every vehicle, for the real time factor')
+    parser.add_argument('--seed', metavar='', type=int, default=0, help='seed of the first synthetic trajectory')
+    parser.add_argument('--max_path_len', metavar='', type=int, help='max_path_len of every Path')
+    parser.add_argument('--early_pruning', action='store_true', help='splice out loops as soon as they close, see Path.splice_loop')
+    parser.add_argument('-j', '--jobs', metavar='', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--json', metavar='', type=str, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    config = dict(max_path_len=args.max_path_len) if args.max_path_len is not None else {}
+    if args.early_pruning:
+        config['early_pruning'] = True
+    sizes = [int(v) for v in args.vehicles.split(',')]
+    results = []
+    print("{:>8} {:>5} {:>9} {:>11} {:>9} {:>14} {:>11} {:>11} {:>11} {:>11} {:>7}".format(
+        'vehicles', 'jobs', 'wall [s]', 'appends/s', 'realtime', 'cleanup ms/veh', 'tick p50', 'tick p99', 'tick max', 'step p99', 'failed'))
+    with multiprocessing.Pool(args.jobs) as pool:
+        for size in sizes:
+            r = simulate_fleet(fleet_specs(size, args.logs, args.seed), args.ticks, config, args.jobs, args.rate_hz, pool)
+            results.append(r)
+            print("{vehicles:>8} {jobs:>5} {wall_s:>9.2f} {appends_per_s:>11.0f} {realtime:>9.1f} {cleanup_ms_per_vehicle:>14.1f} {tick_p50_ms:>11.2f} {tick_p99_ms:>11.2f} {tick_max_ms:>11.2f} {step_p99_ms:>11.3f} {failed:>7}".format(**r))
+            for e in r['errors']:
+                print("  vehicles failed with: {}".format(e), file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
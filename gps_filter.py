@@ -0,0 +1,120 @@
+'''
+    Drops bad GPS samples before they reach Path.append_if_far_enough.
+
+    A sample is dropped when its fix is worse than a 3D fix, it sees too few satellites, its HDop is too high, or it
+    is a jump: a position the vehicle could not have reached from its neighbours, judged by the speed and acceleration
+    it implies (see jump_mask). Jumps create spurious segments that inflate the path and trigger needless cleanups.
+
+    Every check is done on whole numpy arrays of the GPS channel. Checks whose channel is missing from the log are skipped.
+'''
+
+import numpy
+
+from positions import NEDConverter, altitude_label, time_label
+
+def rolling_median(p, window):
+    '''the median of every column of p over 'window' samples centered on each sample, repeating the first and last samples at the ends'''
+    half = window // 2
+    padded = numpy.pad(p, ((half, half), (0, 0)), mode='edge')
+    return numpy.median(numpy.lib.stride_tricks.sliding_window_view(padded, window, axis=0), axis=2)
+
+def jump_mask(t, north, east, alt, max_speed, max_accel, min_jump=2., window=5, passes=4):
+    '''
+        Returns a mask of the samples to keep. There are two tests:
+        - a sample more than min_jump meters from the median of the 'window' samples around it, far enough that the
+          vehicle would have needed more than max_accel to get there and back, is a glitch. This finds glitches of up
+          to window//2 samples, without blaming the good samples next to them. min_jump keeps GPS noise, which implies
+          large accelerations at high rates, from counting as a glitch.
+        - of the remaining samples, one that the vehicle would have needed more than max_speed to reach and to leave
+          again is a jump. Its neighbours then look too fast as well, so each pass only drops the samples that look
+          worse than both of their neighbours, and the next pass checks the remaining samples again.
+    '''
+    p = numpy.column_stack((north, east, alt))
+    if len(p) < 3:
+        return numpy.ones(len(p), dtype=bool)
+    deviation = numpy.sqrt(((p - rolling_median(p, window))**2).sum(axis=1))
+    dt = numpy.maximum(numpy.gradient(t), 1e-3) # the local sample interval
+    keep = ~((deviation > min_jump) & (2 * deviation / dt**2 > max_accel))
+
+    for _ in range(passes):
+        index = numpy.flatnonzero(keep)
+        if len(index) < 3:
+            break
+        q = p[index]
+        speed = numpy.sqrt((numpy.diff(q, axis=0)**2).sum(axis=1)) / numpy.maximum(numpy.diff(t[index]), 1e-3)
+        too_fast = numpy.minimum(speed[:-1], speed[1:]) / max_speed # how much too fast both in and out of every middle sample are
+        padded = numpy.concatenate(([0.], too_fast, [0.]))
+        worst = (too_fast > 1.) & (too_fast >= padded[:-2]) & (too_fast >= padded[2:])
+        if not worst.any():
+            break
+        keep[index[1:-1][worst]] = False
+    return keep
+
+class GPSFilter(object):
+    '''
+        The thresholds of the pre-filter. Any threshold can be None to skip that check.
+        After filtering, self.total is the number of samples looked at, and self.dropped counts the samples dropped by
+        each check. A sample is only counted against the first check it fails.
+    '''
+
+    def __init__(self, min_status=3, min_sats=6, max_hdop=2.5, max_speed=40., max_accel=30., min_jump=2.):
+        self.min_status = min_status
+        self.min_sats = min_sats
+        self.max_hdop = max_hdop
+        self.max_speed = max_speed # m/s
+        self.max_accel = max_accel # m/s/s
+        self.min_jump = min_jump # m
+        self.total = 0
+        self.dropped = dict(status=0, nsats=0, hdop=0, jump=0)
+
+    def __repr__(self):
+        return "GPSFilter(min_status={}, min_sats={}, max_hdop={}, max_speed={}, max_accel={}, min_jump={})".format(
+            self.min_status, self.min_sats, self.max_hdop, self.max_speed, self.max_accel, self.min_jump)
+
+    def filter_arrays(self, t, lat, lon, alt, status=None, nsats=None, hdop=None):
+        '''
+            Returns the north, east, alt arrays of the samples that pass, converted around the first of them,
+            and the indices of those samples. t is in seconds, and can be None to skip the jump check.
+        '''
+        lat, lon, alt = numpy.asarray(lat, dtype=float), numpy.asarray(lon, dtype=float), numpy.asarray(alt, dtype=float)
+        self.total = len(lat)
+        self.dropped = dict(status=0, nsats=0, hdop=0, jump=0)
+        keep = numpy.ones(len(lat), dtype=bool)
+        for (name, values, threshold, bad) in (('status', status, self.min_status, numpy.less),
+                                              ('nsats', nsats, self.min_sats, numpy.less),
+                                              ('hdop', hdop, self.max_hdop, numpy.greater)):
+            if values is None or threshold is None:
+                continue
+            failed = keep & bad(numpy.asarray(values, dtype=float), threshold)
+            self.dropped[name] = int(failed.sum())
+            keep &= ~failed
+
+        index = numpy.flatnonzero(keep)
+        if not len(index):
+            empty = numpy.zeros(0)
+            return empty, empty, empty, index
+        converter = NEDConverter(lat[index[0]], lon[index[0]], alt[index[0]])
+        north, east, alt = converter.convert_arrays(lat[index], lon[index], alt[index])
+
+        if t is not None and self.max_speed is not None and self.max_accel is not None:
+            good = jump_mask(numpy.asarray(t, dtype=float)[index], north, east, alt, self.max_speed, self.max_accel, self.min_jump)
+            good[0] = True # home stays
+            self.dropped['jump'] = int((~good).sum())
+            north, east, alt, index = north[good], east[good], alt[good], index[good]
+        return north, east, alt, index
+
+    def filter_channel(self, gps):
+        '''filter_arrays for the GPS channels of a parsed DataflashLog. Returns None if they have no position'''
+        label = altitude_label(gps)
+        if label is None:
+            return None
+        keys = list(gps["Lat"].dictData.keys())
+        def values(name):
+            return [gps[name].dictData[k] for k in keys] if name in gps else None
+        t_label, scale = time_label(gps)
+        t = numpy.array(values(t_label), dtype=float) * scale if t_label is not None else None
+        return self.filter_arrays(t, values("Lat"), values("Lng"), values(label), values("Status"), values("NSats"), values("HDop"))
+
+    def summary(self):
+        return "GPS filter dropped {} of {} samples ({})".format(
+            sum(self.dropped.values()), self.total, ', '.join("{} {}".format(k, v) for (k, v) in self.dropped.items()))
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+
+'''
+    Keep the Safe-RTL path live, from positions streamed over a local UDP or TCP socket, like next to a vehicle or SITL.
+
+    Every position is one line of text:
+        POS <seq> <sent> <lat> <lon> <alt>
+    seq counts the messages from 0, so lost UDP datagrams can be counted, and sent is the sender's time.time(), for
+    latency. The line
+        FLYBACK
+    is answered with the current flyback path, as one line of JSON: {"home": [lat, lon, alt], "path": [[x, y, z], ...]}.
+    Over TCP, lines are newline terminated. Over UDP, every datagram holds one line, and the answer goes back to the sender.
+
+    The ingest converts every position to NED around home as soon as it arrives: a fixed home given with --home, or the
+    first position. On a real-time tick, it hands the positions that arrived since the last tick to
+    Path.append_if_far_enough, each followed by Path.routine_cleanup, just like a headless run over the same positions.
+
+    './live_ingest.py replay' streams the GPS positions of a log to an ingest at 1x to 100x real time (or faster), and
+    './live_ingest.py bench' runs both in one process at several speeds, and prints the end-to-end latency and the
+    rate the ingest kept up with.
+'''
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import sys
+import time
+
+from path_cleanup import Path, PathConfig
+from positions import NEDConverter
+
+def format_position(seq, sent, lat, lon, alt):
+    return "POS {} {:.6f} {:.9f} {:.9f} {:.3f}\n".format(seq, sent, lat, lon, alt).encode('ascii')
+
+def parse_position(tokens):
+    '''returns seq, sent, lat, lon, alt of the tokens of a POS line, or None if they aren't valid'''
+    if len(tokens) != 6:
+        return None
+    try:
+        seq, values = int(tokens[1]), [float(v) for v in tokens[2:]]
+    except ValueError:
+        return None
+    if seq < 0 or not all(math.isfinite(v) for v in values):
+        return None
+    return (seq,) + tuple(values)
+
+def percentile(values, q):
+    '''the q-th percentile of a sorted list'''
+    if not values:
+        return float('nan')
+    return values[min(len(values)-1, int(q / 100. * len(values)))]
+
+class LiveIngest(object):
+    '''
+        The Path of a live vehicle. receive() takes the protocol's lines, tick() runs the Path on the positions received
+        since the last tick. Both are plain functions, the asyncio servers only move bytes in and out.
+    '''
+
+    def __init__(self, home=None, config=None, cls=Path, latency_window=10000):
+        self.cls = cls
+        self.config = config
+        self.home = None
+        self.converter = None
+        self.path = None
+        self.pending = [] # (seq, sent, received, (x, y, z)) received since the last tick
+        self.error = None
+        if home is not None:
+            self.set_home(*home)
+        # statistics
+        self.received = 0
+        self.processed = 0
+        self.lost = 0
+        self.next_seq = 0
+        self.ticks = 0
+        self.overruns = 0
+        self.tick_seconds = 0.
+        # the latencies of the last latency_window messages, or of all of them with None
+        self.receive_latency = collections.deque(maxlen=latency_window) # seconds from sent to received
+        self.latency = collections.deque(maxlen=latency_window) # seconds from sent to appended to the Path
+
+    def set_home(self, lat, lon, alt):
+        self.home = (lat, lon, alt)
+        self.converter = NEDConverter(lat, lon, alt)
+
+    def receive(self, line):
+        '''handles one line of the protocol, returns the answer as bytes, or None'''
+        tokens = line.split()
+        if not tokens:
+            return None
+        position = parse_position(tokens) if tokens[0] == b'POS' else None
+        if position is not None:
+            now = time.time()
+            seq, sent, lat, lon, alt = position
+            if self.converter is None:
+                self.set_home(lat, lon, alt)
+            if seq > self.next_seq:
+                self.lost += seq - self.next_seq
+            elif seq < self.next_seq and self.lost:
+                self.lost -= 1 # a late datagram, counted as lost when the gap opened
+            self.next_seq = max(self.next_seq, seq + 1)
+            self.received += 1
+            self.receive_latency.append(now - sent)
+            self.pending.append((seq, sent, now, self.converter.convert(lat, lon, alt)))
+        elif tokens[0] == b'FLYBACK':
+            path = [] if self.path is None else self.path.get_flyback_path()
+            return (json.dumps({'home': self.home, 'path': path}) + '\n').encode('ascii')
+        else:
+            print("bad message: {!r}".format(line), file=sys.stderr)
+        return None
+
+    def tick(self):
+        '''appends the pending positions to the Path, each followed by a cleanup'''
+        pending, self.pending = self.pending, []
+        if self.error is not None:
+            return
+        start = time.perf_counter()
+        try:
+            for (seq, sent, received, p) in pending:
+                if self.path is None:
+                    self.path = self.cls([p], config=self.config)
+                else:
+                    self.path.append_if_far_enough(p)
+                    self.path.routine_cleanup()
+                self.processed += 1
+                self.latency.append(time.time() - sent)
+        except Exception as e: # e.g. "Out of Memory. Safe RTL unavailabe.", keep serving the last path
+            self.error = e
+            print("Path failed, no more positions are added: {}".format(str(e) or type(e).__name__), file=sys.stderr)
+        self.ticks += 1
+        self.tick_seconds += time.perf_counter() - start
+
+    async def run_ticks(self, tick_hz):
+        '''calls tick() every 1/tick_hz seconds, counting the ticks that took longer than that'''
+        period = 1. / tick_hz
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while True:
+            self.tick()
+            due += period
+            delay = due - loop.time()
+            if delay < 0:
+                self.overruns += 1
+                due = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def report(self):
+        '''the statistics so far, as a dict. Latencies are in milliseconds, over the last latency_window messages'''
+        latency = sorted(self.latency)
+        receive_latency = sorted(self.receive_latency)
+        return {
+            'received': self.received,
+            'processed': self.processed,
+            'lost': self.lost,
+            'pending': len(self.pending),
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'tick_ms': 1e3 * self.tick_seconds / self.ticks if self.ticks else 0.,
+            'receive_p50_ms': 1e3 * percentile(receive_latency, 50),
+            'receive_p99_ms': 1e3 * percentile(receive_latency, 99),
+            'latency_p50_ms': 1e3 * percentile(latency, 50),
+            'latency_p99_ms': 1e3 * percentile(latency, 99),
+            'latency_max_ms': 1e3 * latency[-1] if latency else float('nan'),
+            'path_len': 0 if self.path is None else len(self.path.path),
+            'worst_length': 0 if self.path is None else self.path.worst_length,
+        }
+
+### asyncio transports ###
+
+class _UDPIngest(asyncio.DatagramProtocol):
+    def __init__(self, ingest):
+        self.ingest = ingest
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        answer = self.ingest.receive(data)
+        if answer is not None:
+            self.transport.sendto(answer, addr)
+
+async def serve(ingest, host='127.0.0.1', port=14560, protocol='udp', tick_hz=10.):
+    '''
+        Starts receiving on host:port and ticking the ingest. Returns (server, tick task). The server is a transport for
+        UDP and an asyncio.Server for TCP, close() stops both. With port 0, the system picks the port, see bound_port.
+    '''
+    loop = asyncio.get_running_loop()
+    if protocol == 'udp':
+        server, _ = await loop.create_datagram_endpoint(lambda: _UDPIngest(ingest), local_addr=(host, port))
+    else:
+        async def handle(reader, writer):
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    answer = ingest.receive(line)
+                    if answer is not None:
+                        writer.write(answer)
+                        await writer.drain()
+            except (asyncio.CancelledError, ConnectionError): # shutting down, or the sender went away
+                pass
+            finally:
+                writer.close()
+        server = await asyncio.start_server(handle, host, port)
+    return server, asyncio.ensure_future(ingest.run_ticks(tick_hz))
+
+def bound_port(server):
+    sock = server.get_extra_info('socket') if isinstance(server, asyncio.BaseTransport) else server.sockets[0]
+    return sock.getsockname()[1]
+
+### replay ###
+
+def log_positions(logfile):
+    '''returns the times in seconds, and the lat, lon and altitude lists of the GPS messages of a log'''
+    import DataflashLog
+    from position_source import channel_arrays, message_time
+    from positions import altitude_label
+    logdata = DataflashLog.DataflashLog(logfile)
+    gps = logdata.channels.get("GPS", {})
+    label = altitude_label(gps)
+    if "Lat" not in gps or label is None:
+        raise Exception("{}: no GPS log data".format(logfile))
+    lat, lon, alt = channel_arrays(gps, ["Lat", "Lng", label])
+    return message_time(gps).tolist(), lat.tolist(), lon.tolist(), alt.tolist()
+
+async def replay(positions, host='127.0.0.1', port=14560, protocol='udp', speed=1., duration=None, batch=64):
+    '''
+        Sends the positions of log_positions to an ingest, 'speed' times faster than they were logged, for at most
+        'duration' seconds. Returns the number of messages sent. At most 'batch' messages are sent in a row before
+        letting other tasks run, so an ingest in the same event loop keeps ticking however fast the replay is.
+    '''
+    t, lat, lon, alt = positions
+    loop = asyncio.get_running_loop()
+    if protocol == 'udp':
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+        send = transport.sendto
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+        send = writer.write
+    start = loop.time()
+    sent = 0
+    while sent < len(t):
+        now = loop.time() - start
+        if duration is not None and now >= duration:
+            break
+        # send what is due, then sleep until the next message is
+        end = sent + batch
+        while sent < min(end, len(t)) and (t[sent] - t[0]) / speed <= now:
+            send(format_position(sent, time.time(), lat[sent], lon[sent], alt[sent]))
+            sent += 1
+        if protocol == 'tcp':
+            await writer.drain()
+        if sent < len(t):
+            await asyncio.sleep(max(0., (t[sent] - t[0]) / speed - (loop.time() - start)))
+    if protocol == 'udp':
+        transport.close()
+    else:
+        writer.close()
+    return sent
+
+async def bench(positions, speeds, protocol='udp', tick_hz=10., duration=10., config=None, cls=Path):
+    '''runs an ingest and a replay on localhost for every speed, returns a report per speed'''
+    reports = []
+    for speed in speeds:
+        ingest = LiveIngest(config=config, cls=cls, latency_window=None)
+        server, ticks = await serve(ingest, port=0, protocol=protocol, tick_hz=tick_hz)
+        start = time.perf_counter()
+        sent = await replay(positions, port=bound_port(server), protocol=protocol, speed=speed, duration=duration)
+        elapsed = time.perf_counter() - start
+        # let the last positions arrive and get processed, until nothing more comes in
+        wait = time.perf_counter()
+        while ingest.processed < sent and ingest.error is None and time.perf_counter() - wait < 2.:
+            received = ingest.received
+            await asyncio.sleep(2. / tick_hz)
+            if not ingest.pending and ingest.received == received:
+                break
+        ticks.cancel()
+        server.close()
+        report = ingest.report()
+        # the ingest can't tell when the last datagrams were lost, the replay knows how many it sent
+        report.update(speed=speed, sent=sent, lost=sent - ingest.received, offered_per_s=sent / elapsed if elapsed else 0.)
+        reports.append(report)
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description='Keep the Safe-RTL path live from positions streamed over a socket')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    def add_socket_args(p):
+        p.add_argument('--host', metavar='', type=str, default='127.0.0.1', help='address to listen on or send to')
+        p.add_argument('--port', metavar='', type=int, default=14560, help='port to listen on or send to')
+        p.add_argument('--tcp', action='store_true', help='use TCP instead of UDP')
+    srv = subparsers.add_parser('serve', help='receive positions and keep the path')
+    add_socket_args(srv)
+    srv.add_argument('--home', metavar='', type=str, help='fixed home as lat,lon,alt, instead of the first position')
+    srv.add_argument('--tick_hz', metavar='', type=float, default=10., help='how often the path is updated')
+    srv.add_argument('--report_every', metavar='', type=float, default=5., help='seconds between status lines')
+    rep = subparsers.add_parser('replay', help='stream the GPS positions of a log to an ingest')
+    add_socket_args(rep)
+    rep.add_argument('logfile', type=str, help='log to replay')
+    rep.add_argument('--speed', metavar='', type=float, default=1., help='times faster than real time')
+    fly = subparsers.add_parser('flyback', help='ask an ingest for its current flyback path')
+    add_socket_args(fly)
+    ben = subparsers.add_parser('bench', help='measure latency and sustainable rate, with a replay and an ingest on localhost')
+    ben.add_argument('logfile', type=str, help='log to replay')
+    ben.add_argument('--tcp', action='store_true', help='use TCP instead of UDP')
+    ben.add_argument('--speeds', metavar='', type=str, default='1,10,100', help='comma separated replay speeds')
+    ben.add_argument('--tick_hz', metavar='', type=float, default=10., help='how often the path is updated')
+    ben.add_argument('--duration', metavar='', type=float, default=10., help='most seconds of replay per speed')
+    ben.add_argument('--max_path_len', metavar='', type=int, help='max_path_len of the Path')
+    ben.add_argument('--jit', action='store_true', help='use the Numba compiled Path of path_cleanup_jit.py')
+    args = parser.parse_args()
+    protocol = 'tcp' if args.tcp else 'udp'
+
+    if args.command == 'serve':
+        home = None
+        if args.home:
+            try:
+                home = tuple(float(v) for v in args.home.split(','))
+            except ValueError:
+                home = ()
+            if len(home) != 3 or not all(math.isfinite(v) for v in home):
+                parser.error("--home must be lat,lon,alt, got {!r}".format(args.home))
+        ingest = LiveIngest(home)
+        async def run():
+            server, ticks = await serve(ingest, args.host, args.port, protocol, args.tick_hz)
+            print("listening on {} {}:{}".format(protocol.upper(), args.host, bound_port(server)))
+            while True:
+                await asyncio.sleep(args.report_every)
+                r = ingest.report()
+                print("received {received} lost {lost} path {path_len} (worst {worst_length}) latency p50 {latency_p50_ms:.1f} ms p99 {latency_p99_ms:.1f} ms tick {tick_ms:.2f} ms overruns {overruns}".format(**r))
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'replay':
+        sent = asyncio.run(replay(log_positions(args.logfile), args.host, args.port, protocol, args.speed))
+        print("sent {} positions".format(sent))
+    elif args.command == 'flyback':
+        async def ask():
+            if protocol == 'tcp':
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+                writer.write(b'FLYBACK\n')
+                answer = await reader.readline()
+                writer.close()
+                return answer
+            loop = asyncio.get_running_loop()
+            answer = loop.create_future()
+            class Client(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    answer.set_result(data)
+            transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=(args.host, args.port))
+            transport.sendto(b'FLYBACK\n')
+            try:
+                return await asyncio.wait_for(answer, 2.)
+            finally:
+                transport.close()
+        print(asyncio.run(ask()).decode('ascii').strip())
+    else:
+        cls = Path
+        if args.jit:
+            from path_cleanup_jit import JitPath
+            cls = JitPath
+        speeds = [float(s) for s in args.speeds.split(',')]
+        reports = asyncio.run(bench(log_positions(args.logfile), speeds, protocol, args.tick_hz, args.duration, PathConfig(max_path_len=args.max_path_len), cls))
+        print("{:>7} {:>7} {:>10} {:>10} {:>6} {:>12} {:>12} {:>12} {:>9} {:>9}".format(
+            'speed', 'sent', 'offered/s', 'processed', 'lost', 'recv p99 ms', 'p50 ms', 'p99 ms', 'tick ms', 'overruns'))
+        for r in reports:
+            print("{speed:>7g} {sent:>7} {offered_per_s:>10.0f} {processed:>10} {lost:>6} {receive_p99_ms:>12.2f} {latency_p50_ms:>12.2f} {latency_p99_ms:>12.2f} {tick_ms:>9.3f} {overruns:>9}".format(**r))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+'''
+    A sidecar index of a text dataflash log, to parse only a time or line window of a long flight.
+
+    Building the index reads the log once, without parsing the messages. For every message type it keeps a checkpoint
+    every 'every' messages: the message's index within its type, its line number, the byte offset of its line, and
+    its time in seconds (if the type has a time label). It also keeps the header: the lines before the first message,
+    every FMT and PARM line, and the first MSG line, which holds the vehicle type.
+
+    The index is saved next to the log as <log>.index.json, or in positions.default_cache_dir if the log's directory
+    isn't writable. It is rebuilt when the log's size or modification time changes.
+
+    read_window() parses the header, seeks to the checkpoint before the window, and parses only up to its end.
+    Line numbers are the same as in a full parse. Binary and compressed logs are not indexed.
+'''
+
+import bisect
+import hashlib
+import io
+import json
+import os
+
+import DataflashLog
+from positions import default_cache_dir, time_label
+
+index_version = 2
+
+class LogIndex(object):
+    def __init__(self, size, mtime_ns, every, lines, header, types):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.every = every
+        self.lines = lines # number of lines in the log
+        self.header = header # list of [line number, line]
+        self.types = types # name -> {'count': messages, 'checkpoints': [[index, line, offset, time], ...], 'last_time': time of the last message}
+        # every checkpoint of every type, sorted by line, to seek to any line
+        self.seek_points = sorted((c[1], c[2]) for t in types.values() for c in t['checkpoints'])
+
+    def to_dict(self):
+        return dict(version=index_version, size=self.size, mtime_ns=self.mtime_ns, every=self.every, lines=self.lines, header=self.header, types=self.types)
+
+    @staticmethod
+    def from_dict(d):
+        return LogIndex(d['size'], d['mtime_ns'], d['every'], d['lines'], d['header'], d['types'])
+
+    def seek_point(self, line):
+        '''returns (line, offset) of the last checkpoint at or before 'line', or (1, 0) for the start of the file'''
+        i = bisect.bisect_right(self.seek_points, (line, float("inf")))
+        return self.seek_points[i-1] if i else (1, 0)
+
+    def lines_for_time(self, start=None, end=None, time_type='GPS'):
+        '''
+            returns (first_line, last_line) covering the times start to end, in seconds after the first 'time_type'
+            message. The window can start and end up to 'every' messages of that type early and late. If no message
+            is in the window, first_line is after last_line.
+        '''
+        if time_type not in self.types:
+            raise ValueError("the log has no {} messages".format(time_type))
+        checkpoints = [c for c in self.types[time_type]['checkpoints'] if c[3] is not None]
+        if not checkpoints:
+            raise ValueError("{} messages have no time".format(time_type))
+        t0 = checkpoints[0][3]
+        last_time = self.types[time_type]['last_time']
+        if (start is not None and last_time is not None and start > last_time - t0) or (end is not None and end < 0):
+            return self.lines + 1, self.lines
+        first_line, last_line = 1, self.lines
+        if start is not None:
+            before = [c for c in checkpoints if c[3] - t0 <= start]
+            first_line = before[-1][1] if before else checkpoints[0][1]
+        if end is not None:
+            after = [c for c in checkpoints if c[3] - t0 >= end]
+            last_line = after[0][1] if after else self.lines
+        return first_line, last_line
+
+def message_time(tokens, time_index):
+    '''the time in seconds of the message with these tokens, or None'''
+    if tokens[0] not in time_index:
+        return None
+    position, scale = time_index[tokens[0]]
+    try:
+        return float(tokens[1 + position]) * scale
+    except (IndexError, ValueError):
+        return None
+
+def build_index(logfile, every=64):
+    '''reads the log once, and returns its LogIndex'''
+    if DataflashLog.compression(logfile):
+        raise Exception("{} is compressed, only uncompressed text logs can be indexed".format(logfile))
+    with open(logfile, 'rb') as f:
+        if f.read(4) == b'\xa3\x95\x80\x80':
+            raise Exception("{} is a binary log, only text logs can be indexed. Read it whole with DataflashLog".format(logfile))
+    st = os.stat(logfile)
+    header = []
+    types = {}
+    last = {} # name -> tokens of its last message
+    time_index = {} # message name -> (position of its time among the values, scale to seconds)
+    seen_data = False
+    seen_msg = False
+    offset = 0
+    line_number = 0
+    with open(logfile, 'rb') as f:
+        for raw in f:
+            line_number += 1
+            line = raw.decode('utf-8', 'replace').strip('\n\r')
+            tokens = line.split(', ')
+            name = tokens[0]
+            if len(tokens) == 1:
+                if not seen_data:
+                    header.append([line_number, line])
+            elif name == 'FMT':
+                header.append([line_number, line])
+                if len(tokens) > 5:
+                    labels = tokens[5].split(',')
+                    label, scale = time_label(labels)
+                    if label is not None:
+                        time_index[tokens[3]] = (labels.index(label), scale)
+            elif name == 'PARM':
+                header.append([line_number, line])
+            else:
+                if name == 'MSG' and not seen_msg:
+                    header.append([line_number, line])
+                    seen_msg = True
+                seen_data = True
+                t = types.setdefault(name, {'count': 0, 'checkpoints': []})
+                if t['count'] % every == 0:
+                    t['checkpoints'].append([t['count'], line_number, offset, message_time(tokens, time_index)])
+                t['count'] += 1
+                last[name] = tokens
+            offset += len(raw)
+    for (name, t) in types.items():
+        t['last_time'] = message_time(last[name], time_index)
+    return LogIndex(st.st_size, st.st_mtime_ns, every, line_number, header, types)
+
+def index_files(logfile):
+    '''where the index of a log can live: next to it, or in the cache directory'''
+    key = hashlib.sha1(os.path.abspath(logfile).encode('utf-8')).hexdigest()
+    return [logfile + '.index.json', os.path.join(default_cache_dir, key + '.index.json')]
+
+def load_index(logfile, every=64):
+    '''returns the saved LogIndex of a log, or builds and saves it if there is none or the log changed'''
+    st = os.stat(logfile)
+    for filename in index_files(logfile):
+        try:
+            with open(filename) as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if d.get('version') == index_version and d['size'] == st.st_size and d['mtime_ns'] == st.st_mtime_ns and d['every'] == every:
+            return LogIndex.from_dict(d)
+
+    index = build_index(logfile, every)
+    for filename in index_files(logfile):
+        try:
+            if not os.path.isdir(os.path.dirname(os.path.abspath(filename))):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'w') as f:
+                json.dump(index.to_dict(), f)
+            break
+        except OSError:
+            continue
+    return index
+
+def read_window(logfile, start=None, end=None, first_line=None, last_line=None, time_type='GPS', ignoreBadlines=False, index=None):
+    '''
+        Returns a DataflashLog of only part of a text log: from 'start' to 'end' seconds after the first 'time_type'
+        message, or from line 'first_line' to 'last_line'. Anything not given extends to the start or end of the log.
+        Every line keeps its line number in the log, and lineCount is the number of lines parsed, header included.
+    '''
+    if index is None:
+        index = load_index(logfile)
+    if start is not None or end is not None:
+        first_line, last_line = index.lines_for_time(start, end, time_type)
+    first_line = max(first_line or 1, 1)
+    last_line = min(last_line or index.lines, index.lines)
+
+    logdata = DataflashLog.DataflashLog()
+    logdata.filename = logfile
+    logdata.formats = {'FMT': DataflashLog.Format}
+    # the header sets the formats and vehicle type. Its lines in the window are parsed with the window instead, and
+    # so are those between the seek point and the window, which are skipped there
+    line, offset = index.seek_point(first_line) if first_line <= last_line else (index.lines + 1, None)
+    header = [(n, text) for (n, text) in index.header if n < line or n > last_line]
+    runs = [] # [first line number, lines] of consecutive header lines
+    for (n, text) in header:
+        if runs and runs[-1][0] + len(runs[-1][1]) == n:
+            runs[-1][1].append(text)
+        else:
+            runs.append([n, [text]])
+    for (n, lines) in runs:
+        logdata.read_text(io.StringIO('\n'.join(lines) + '\n'), ignoreBadlines, firstLine=n)
+    numBytes, lineCount = 0, len(header)
+    if first_line <= last_line:
+        with open(logfile, 'rb') as raw:
+            raw.seek(offset)
+            f = io.TextIOWrapper(raw)
+            header_lines = set(n for (n, _) in index.header)
+            for n in range(line, first_line):
+                text = f.readline()
+                if n in header_lines:
+                    logdata.read_text(io.StringIO(text), ignoreBadlines, firstLine=n)
+                    lineCount += 1
+            numBytes, lineNumber = logdata.read_text(f, ignoreBadlines, firstLine=first_line, lastLine=last_line)
+        lineCount += lineNumber - first_line + 1
+    logdata.lineCount = lineCount
+    logdata.filesizeKB = numBytes / 1024.0
+    return logdata
@@ -0,0 +1,70 @@
+import queue
+import sys
+import threading
+
+import DataflashLog
+from positions import NEDConverter, altitude_label
+
+class _StreamingLog(DataflashLog.DataflashLog):
+    '''a DataflashLog which hands every GPS message to a GPSStream as soon as it has been parsed'''
+
+    def __init__(self, stream, logfile, format, ignoreBadlines):
+        self.stream = stream
+        DataflashLog.DataflashLog.__init__(self, logfile, format, ignoreBadlines)
+
+    def process(self, lineNumber, e):
+        DataflashLog.DataflashLog.process(self, lineNumber, e)
+        if e.NAME == "GPS":
+            self.stream._push(e)
+
+class GPSStream(object):
+    '''
+        Parses a log in a background thread, and streams its GPS samples, converted to NED, through a bounded queue.
+
+        The parser blocks whenever the queue is full, so it never runs more than 'depth' GPS samples ahead of the consumer.
+        The first sample is used as home, exactly like positions.gps_to_ned does for a fully parsed log.
+    '''
+
+    _end = object() # marks the end of the stream in the queue
+
+    def __init__(self, logfile, format="auto", ignoreBadlines=False, depth=64):
+        self.logfile = logfile
+        self.queue = queue.Queue(maxsize=depth)
+        self.converter = None
+        self.alt_label = None
+        self.error = None
+        self.finished = False
+        self.thread = threading.Thread(target=self._produce, args=(logfile, format, ignoreBadlines))
+        self.thread.daemon = True # don't keep the program alive if the window gets closed mid-parse
+        self.thread.start()
+
+    def _produce(self, logfile, format, ignoreBadlines):
+        try:
+            _StreamingLog(self, logfile, format, ignoreBadlines)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.queue.put(GPSStream._end)
+
+    def _push(self, e):
+        if self.converter is None:
+            self.alt_label = altitude_label(e.labels)
+            if self.alt_label is None:
+                raise ValueError("GPS messages have no altitude")
+            self.converter = NEDConverter(e.Lat, e.Lng, getattr(e, self.alt_label))
+        self.queue.put(self.converter.convert(e.Lat, e.Lng, getattr(e, self.alt_label)))
+
+    def get(self, block=False):
+        '''returns the next (x, y, z) sample, or None if there is none yet. Once the log is exhausted, 'finished' is set and None is returned'''
+        if self.finished:
+            return None
+        try:
+            sample = self.queue.get(block)
+        except queue.Empty:
+            return None
+        if sample is GPSStream._end:
+            self.finished = True
+            if self.error is not None:
+                print("Error while streaming {}: {}".format(self.logfile, self.error), file=sys.stderr)
+            return None
+        return sample
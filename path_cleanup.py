@@ -1,12 +1,11 @@
 #!/usr/bin/env python3
 
-import copy
+import bisect
+import heapq
 import itertools
+import json
 import time
-import unittest
-from math import sin, sqrt
-
-from bitarray import bitarray
+from math import floor, sqrt
 
 ### tuning variables ###
 
@@ -14,6 +13,27 @@ position_delta = 2. # how many meters to move before appending a new position to
 pruning_delta = position_delta * 1.5 # how many meters apart must two points be, such that we can assume there is no obstacle between those points
 rdp_epsilon = position_delta * 0.5
 max_path_len = 100
+early_pruning = False # on every append, splice out the loop if the vehicle came back within pruning_delta of an older point
+
+'''
+    The tuning variables for one Path. Anything not given is taken from the module-level tuning variables above.
+    If only position_delta is given, pruning_delta and rdp_epsilon keep their usual ratio to it.
+'''
+class PathConfig:
+    def __init__(self, position_delta=None, pruning_delta=None, rdp_epsilon=None, max_path_len=None, early_pruning=None):
+        g = globals()
+        ratio = 1. if position_delta is None else position_delta / g['position_delta']
+        self.position_delta = g['position_delta'] if position_delta is None else position_delta
+        self.pruning_delta = g['pruning_delta'] * ratio if pruning_delta is None else pruning_delta
+        self.rdp_epsilon = g['rdp_epsilon'] * ratio if rdp_epsilon is None else rdp_epsilon
+        self.max_path_len = g['max_path_len'] if max_path_len is None else max_path_len
+        self.early_pruning = g['early_pruning'] if early_pruning is None else early_pruning
+
+    def to_dict(self):
+        return dict(position_delta=self.position_delta, pruning_delta=self.pruning_delta, rdp_epsilon=self.rdp_epsilon, max_path_len=self.max_path_len, early_pruning=self.early_pruning)
+
+    def __repr__(self):
+        return "PathConfig({})".format(', '.join("{}={}".format(k, v) for (k, v) in sorted(self.to_dict().items())))
 
 def dot_product(u, v):
     return u[0]*v[0] + u[1]*v[1] + u[2]*v[2]
@@ -94,15 +114,17 @@ stk, bitmask = None, None
 def rdp_iter(path, epsilon, allowed_time):
     global stk, bitmask
     if stk is None and bitmask is None:
+        from bitarray import bitarray # only needed once a cleanup actually runs, so importing this module stays cheap
+
         # reset state to starting state
         stk = []
         end = len(path)-1
         bitmask = bitarray([True]*(end+1))
         stk.append( (0, end) )
 
-    start_time = time.clock()
+    start_time = time.perf_counter()
     while stk:
-        if (time.clock()-start_time > allowed_time/1000.):
+        if (time.perf_counter()-start_time > allowed_time/1000.):
             return False
         start, end = stk.pop()
         max_dist = 0.
@@ -122,6 +144,17 @@ def rdp_iter(path, epsilon, allowed_time):
 
     return True
 
+'''
+    Runs rdp_iter to completion, and returns the simplified path. Useful when there is no time budget to respect.
+'''
+def rdp(path, epsilon):
+    global stk, bitmask
+    stk = None
+    bitmask = None
+    while not rdp_iter(path, epsilon, float("inf")):
+        pass
+    return list(itertools.compress(path, bitmask))
+
 '''
     Saves a list of tuples to memory, each representing a detected loop. The tuple looks like (a,b,c), where a is the index of the first item to remove,
     b-1 is the index of the last item to remove (b itself should stay), and c is the point (as a tuple) which represents the new point to be inserted in that place
@@ -129,33 +162,196 @@ def rdp_iter(path, epsilon, allowed_time):
     This method will never detect a loop that is wholly contained within another loop
 
     This method takes as input: 1. an index which tells the algorithm where to continue searching from, and 2. how much time it can search before it must return (in ms)
+    Optionally, 3. how close two segments must get to count as a loop. This defaults to the module's pruning_delta.
 
     This method returns the index of where the algorithm left off. If a -1 is returned, the algorithm has run to completion.
 '''
 detected_loops = []
-def detect_loops(path, resume_state, allowed_time):
+def detect_loops(path, resume_state, allowed_time, delta=None):
     global detected_loops
-    start_time = time.clock()
+    if delta is None:
+        delta = pruning_delta
+    start_time = time.perf_counter()
     min_j = resume_state[1] # this is to prevent searching for loops that end before an existing loop, which prevents loops-within-loops.
     for i in range(resume_state[0] or 1, len(path)-1): # we will start at the specified index. If None or 0 is specified, it will start at 1.
-        if time.clock()-start_time > allowed_time/1000.:
+        if time.perf_counter()-start_time > allowed_time/1000.:
             return (i, min_j)
         # here we can choose: prune big/small loops starting in front/back?
         # for j in range(len(path)-2, i+1,-1): # counts backwards. This prunes old, big loops first.
         for j in range(max(min_j,i+2), len(path)-1): # count forwards. This prunes old, small loops first.
             dist = segment_segment_dist(path[i], path[i+1], path[j], path[j+1])
-            if dist[0] <= pruning_delta:
+            if dist[0] <= delta:
                 min_j = j
                 # path = path[:i+1] + [dist[1]] + path[j+1:]
                 detected_loops.append( (i+1, j+1, dist[1]) )
     return (-1, 0)
 
+'''
+    A voxel grid over the points of a path, to find the stored points near a position without comparing it to all of them.
+    The cells are 'cell' meters wide, so with cell >= radius, every point within radius of a position is in one of the
+    27 cells around the position's cell. Points are only ever added at the end of the path, and removed from its end.
+'''
+class VoxelIndex:
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {} # (i, j, k) -> indices of the points in that cell, in increasing order
+        self.keys = [] # the cell of every point, by index
+
+    def key(self, p):
+        c = self.cell
+        return (floor(p[0]/c), floor(p[1]/c), floor(p[2]/c))
+
+    def append(self, p):
+        key = self.key(p)
+        self.cells.setdefault(key, []).append(len(self.keys))
+        self.keys.append(key)
+
+    def truncate(self, length):
+        '''forgets the points from index 'length' on. Those are always the last indices of their cells'''
+        while len(self.keys) > length:
+            key = self.keys.pop()
+            indices = self.cells[key]
+            indices.pop()
+            if not indices:
+                del self.cells[key]
+
+    def oldest_near(self, path, p, radius, before):
+        '''returns the lowest index below 'before' of a point of 'path' within radius of p, or None'''
+        ki, kj, kk = self.key(p)
+        x, y, z = p
+        radius_sq = radius*radius
+        best = before
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for dk in (-1, 0, 1):
+                    for index in self.cells.get((ki+di, kj+dj, kk+dk), ()):
+                        if index >= best:
+                            break
+                        q = path[index]
+                        if (q[0]-x)**2 + (q[1]-y)**2 + (q[2]-z)**2 <= radius_sq:
+                            best = index
+                            break
+        return best if best < before else None
+
+'''
+    Chooses which of the loops found by detect_loops to prune, when the path needs to free 'required' points.
+
+    Pruning the loop (a, b, c) removes the points a..b-1, so it frees b-a points, and the path then runs straight
+    from point a-1 to point b. Two loops overlap if one removes a point the other keeps at its ends, and only one of
+    them can be pruned. The loops are kept in a heap, ordered by the points they free, then by how much shorter they
+    make the path, then by age (the oldest first). They are taken from the heap, skipping those that overlap a loop
+    already taken, until 'required' points are freed or the heap is empty. Taking the biggest loops first frees the
+    required points with the fewest changes to the path, and leaves the most room before the next cleanup.
+
+    Returns the loops to prune, in path order, the points they free, and the most points that any set of
+    non-overlapping loops could free.
+'''
+def plan_pruning(path, loops, required):
+    distance = [0.] # distance[i] is the length of the path from point 0 to point i
+    for i in range(1, len(path)):
+        distance.append(distance[-1] + hypot3(path[i-1], path[i]))
+
+    heap = []
+    for (n, (a, b, _)) in enumerate(loops):
+        saved = distance[b] - distance[a-1] - hypot3(path[a-1], path[b])
+        heap.append((a-b, -saved, a, n))
+    heapq.heapify(heap)
+
+    taken = [] # the chosen loops as (a, b, n), sorted
+    freed = 0
+    while heap and freed < required:
+        _, _, a, n = heapq.heappop(heap)
+        b = loops[n][1]
+        k = bisect.bisect(taken, (a, b, n))
+        if (k and taken[k-1][1] >= a) or (k < len(taken) and taken[k][0] <= b):
+            continue # overlaps a chosen loop
+        taken.insert(k, (a, b, n))
+        freed += b - a
+    chosen = [loops[n] for (_, _, n) in taken]
+
+    # weighted interval scheduling: best[k] is the most the first k loops, by end, can free
+    by_end = sorted(loops, key=lambda loop: loop[1])
+    ends = [b for (_, b, _) in by_end]
+    best = [0]
+    for (a, b, _) in by_end:
+        best.append(max(best[-1], b - a + best[bisect.bisect_left(ends, a)]))
+    return chosen, freed, best[-1]
+
 '''
     Takes in a list and return the same list with all instances of 'item' removed
 '''
 def remove_matching(arr, item):
     return [value for value in arr if value != item]
 
+'''
+    Per-stage profiling counters for Path. For every stage of the cleanup this records how often it ran,
+    how long each run took, and how many points it freed.
+
+    The stages are: detect_loops, rdp (finding which points simplification would remove), prune_bookkeeping
+    (tallying and marking the points to remove) and remove_matching (compacting the path). get_flyback_path
+    is recorded as a single 'flyback' stage, and the early loop check on every append (see Path.splice_loop)
+    as 'splice'. Freed points are credited to the step that chose them: detect_loops when loops were pruned,
+    rdp when the path was simplified. Pruning stops once it has freed enough (see plan_pruning), so the points
+    detect_loops could have freed, by pruning every loop it can, are counted separately.
+'''
+class CleanupStats:
+    stages = ('detect_loops', 'rdp', 'prune_bookkeeping', 'remove_matching', 'splice', 'flyback')
+
+    def __init__(self):
+        self.durations = dict((stage, []) for stage in self.stages) # seconds, one entry per call
+        self.freed = dict((stage, 0) for stage in self.stages)
+        self.possible = dict((stage, 0) for stage in self.stages) # what the stage could have freed in the same cleanups
+
+    def record(self, stage, seconds):
+        self.durations[stage].append(seconds)
+
+    def free(self, stage, points, possible=None):
+        self.freed[stage] += points
+        self.possible[stage] += points if possible is None else possible
+
+    @staticmethod
+    def percentile(sorted_values, p):
+        if not sorted_values:
+            return 0.
+        return sorted_values[min(len(sorted_values)-1, int(p/100. * len(sorted_values)))]
+
+    @staticmethod
+    def histogram(durations):
+        '''returns {upper bound in us: count}, using power-of-two buckets'''
+        buckets = {}
+        for seconds in durations:
+            bound = 1
+            while bound < seconds * 1e6:
+                bound *= 2
+            buckets[bound] = buckets.get(bound, 0) + 1
+        return dict(sorted(buckets.items()))
+
+    def to_dict(self):
+        ret = {}
+        for stage in self.stages:
+            durations = sorted(self.durations[stage])
+            ret[stage] = {
+                'calls': len(durations),
+                'total_ms': sum(durations) * 1000.,
+                'p50_ms': self.percentile(durations, 50) * 1000.,
+                'p99_ms': self.percentile(durations, 99) * 1000.,
+                'max_ms': durations[-1] * 1000. if durations else 0.,
+                'points_freed': self.freed[stage],
+                'points_possible': self.possible[stage],
+                'histogram_us': self.histogram(durations),
+            }
+        return ret
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def summary(self):
+        '''returns a printable table of the per-stage numbers'''
+        lines = ["{:<18} {:>7} {:>10} {:>9} {:>9} {:>9} {:>7} {:>8}".format('stage', 'calls', 'total[ms]', 'p50[ms]', 'p99[ms]', 'max[ms]', 'freed', 'possible')]
+        for (stage, s) in self.to_dict().items():
+            lines.append("{:<18} {:>7} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>7} {:>8}".format(stage, s['calls'], s['total_ms'], s['p50_ms'], s['p99_ms'], s['max_ms'], s['points_freed'], s['points_possible']))
+        return '\n'.join(lines)
+
 '''
     Takes a path and runs 2 cleanup steps: pruning, then simplification.
 
@@ -173,11 +369,21 @@ def remove_matching(arr, item):
     is not to find the optimal simplified path, but rather to simplify it enough that it is not at risk of running out of memory.
 
     The simplification step uses the Ramer-Douglas-Peucker algorithm. See Wikipedia for description.
+
+    The tuning variables come from 'config', a PathConfig. By default that uses the module-level tuning variables.
+    With config.early_pruning, loops are also spliced out as soon as they close, see splice_loop.
+
+    With profile=True, the time spent and points freed in every stage are recorded in self.stats (see CleanupStats).
+    Otherwise self.stats is None, and the only cost is a None check per stage.
 '''
 class Path:
-    def __init__(self, path):
+    def __init__(self, path, profile=False, config=None):
         self.path = path
+        self.config = config if config is not None else PathConfig()
         self.worst_length = 0
+        self.stats = CleanupStats() if profile else None
+        self.index = None # the VoxelIndex of early_pruning, and the path list it indexes
+        self.index_path = None
 
     def append_if_far_enough(self, p):
         if len(self.path) > self.worst_length:
@@ -185,24 +391,109 @@ class Path:
 
         x,y,z = p
         x_old, y_old, z_old = self.path[-1]
-        if (x-x_old)**2+(y-y_old)**2+(z-z_old)**2 >= position_delta**2:
+        if (x-x_old)**2+(y-y_old)**2+(z-z_old)**2 >= self.config.position_delta**2:
             self.path.append(p)
+            if self.config.early_pruning:
+                self.splice_loop()
 
     '''
-        Call this method regularly to clean up the path in memory.
+        Brings the voxel index up to date with the path. A cleanup replaces the path list, which rebuilds the index,
+        appends only add to it.
     '''
-    def routine_cleanup(self):
-        if len(self.path) < max_path_len - 10:
-            return
+    def sync_index(self):
+        if self.index is None or self.index_path is not self.path or len(self.index.keys) > len(self.path):
+            self.index = VoxelIndex(self.config.pruning_delta)
+            self.index_path = self.path
+        for p in self.path[len(self.index.keys):]:
+            self.index.append(p)
 
-        # detect loops
+    '''
+        If the last point came back within pruning_delta of an older point, the points in between are a loop: they
+        are removed right away, and the path goes straight from the older point to the last one. The oldest such point
+        is used, to free as much as possible, and at least 2 points must be in between, like for detect_loops.
+        This keeps the path short all the time, rather than in bursts of cleanups near max_path_len.
+        Returns the number of points removed.
+    '''
+    def splice_loop(self):
+        if self.stats is not None:
+            start_time = time.perf_counter()
+
+        self.sync_index()
+        last = len(self.path) - 1
+        older = self.index.oldest_near(self.path, self.path[last], self.config.pruning_delta, last - 2)
+        removed = 0
+        if older is not None:
+            p = self.path[last]
+            del self.path[older+1:]
+            self.path.append(p)
+            self.index.truncate(older+1)
+            self.index.append(p)
+            removed = last - older - 1
+
+        if self.stats is not None:
+            self.stats.record('splice', time.perf_counter() - start_time)
+            self.stats.free('splice', removed)
+        return removed
+
+    '''
+        Returns this path's state as a compact binary snapshot, see path_snapshot.py.
+        With cleanup_state=True, the state of the module's anytime algorithms is saved too.
+    '''
+    def snapshot(self, cleanup_state=False):
+        import path_snapshot
+        return path_snapshot.dumps(self, cleanup_state)
+
+    '''
+        Returns a new Path (or subclass) from a snapshot made by Path.snapshot.
+    '''
+    @classmethod
+    def restore(cls, data):
+        import path_snapshot
+        return path_snapshot.loads(data, cls)
+
+    '''
+        Returns the loops in 'path', as a list of detect_loops tuples. Runs detect_loops to completion, 0.5ms at a time.
+    '''
+    def find_loops(self, path):
         global detected_loops
         detected_loops = []
         loop_algorithm_state = (0,0) # stores how far along the loop-finding algorithm has searched
         while loop_algorithm_state[0] != -1:
             # allow this algorithm 0.5ms to run, and then run it repeatedly until it reports that it has completed
-            loop_algorithm_state = detect_loops(self.path, (loop_algorithm_state), 0.5)
-        loops = copy.deepcopy(detected_loops)
+            loop_algorithm_state = detect_loops(path, loop_algorithm_state, 0.5, self.config.pruning_delta)
+        return list(detected_loops) # the loops only hold tuples, so a shallow copy is enough
+
+    '''
+        Returns the RDP bitmask of 'path': True for the points to keep. Runs rdp_iter to completion, 0.5ms at a time.
+    '''
+    def simplification_bitmask(self, path):
+        global stk, bitmask
+        stk = None
+        bitmask = None
+        while not rdp_iter(path, self.config.rdp_epsilon, 0.5):
+            pass
+        return bitmask
+
+    '''
+        Call this method regularly to clean up the path in memory.
+    '''
+    def routine_cleanup(self):
+        if len(self.path) < self.config.max_path_len - 10:
+            return
+
+        stats = self.stats
+        possible = None # how many points the chosen step could have freed, if that's more than it did
+        if stats is not None:
+            lap = time.perf_counter()
+            length_before = len(self.path)
+
+        # detect loops
+        loops = self.find_loops(self.path)
+
+        if stats is not None:
+            now = time.perf_counter()
+            stats.record('detect_loops', now - lap)
+            lap = now
 
         prune_size_dict = {}
         ignored_points = 0 # this is the number of points that are going to get added back
@@ -212,56 +503,67 @@ class Path:
             ignored_points += 1
         potential_amount_to_prune = len(prune_size_dict.keys()) - ignored_points
 
+        if stats is not None:
+            now = time.perf_counter()
+            bookkeeping = now - lap
+            lap = now
+
         # simplify
-        global stk, bitmask
-        stk = None
-        bitmask = None
-        while not rdp_iter(self.path, rdp_epsilon, 0.5):
-            pass
-        simplification_bitmask = bitmask
+        simplification_bitmask = self.simplification_bitmask(self.path)
         potential_amount_to_simplify = len(simplification_bitmask) - simplification_bitmask.count()
 
+        if stats is not None:
+            now = time.perf_counter()
+            stats.record('rdp', now - lap)
+            lap = now
 
         if potential_amount_to_simplify > 10: # if applying simplification would remove 10+ points
             # just run simplification
             self.path = list(itertools.compress(self.path, simplification_bitmask))
+            freed_by = 'rdp'
         elif potential_amount_to_prune:
-            pruned_points = 0
-            while pruned_points < 10:
-                loop = loops.pop(0) # start pruning loops from the beginning
-                for i in range(loop[0], loop[1]):
+            chosen, _, possible = plan_pruning(self.path, loops, 10)
+            for (a, b, _) in chosen:
+                for i in range(a, b):
                     self.path[i] = None
-                pruned_points += loop[1] - loop[0] - 1
+            freed_by = 'detect_loops'
         elif potential_amount_to_simplify + potential_amount_to_prune > 5:
-            self.path = get_flyback_path()
+            if stats is not None:
+                now = time.perf_counter()
+                bookkeeping += now - lap
+            self.path = self.get_flyback_path() # records its own 'flyback' stage
+            if stats is not None:
+                lap = time.perf_counter()
+            freed_by = 'flyback'
         else: # can't clean up any more
             raise Exception("Out of Memory. Safe RTL unavailabe.")
 
+        if stats is not None:
+            now = time.perf_counter()
+            stats.record('prune_bookkeeping', bookkeeping + now - lap)
+            lap = now
+
         self.path = remove_matching(self.path, None)
 
+        if stats is not None:
+            stats.record('remove_matching', time.perf_counter() - lap)
+            stats.free(freed_by, length_before - len(self.path), possible)
+
     '''
         Hypothetically, if the copter were to fly back now, what path would it fly? This runs an aggressive cleanup and returns a path,
         but it does not alter the path in memory.
     '''
     def get_flyback_path(self):
-        ret = copy.deepcopy(self.path)
+        if self.stats is not None:
+            start_time = time.perf_counter()
+
+        ret = list(self.path) # points are tuples, so a shallow copy is enough
 
         # detect loops
-        global detected_loops
-        detected_loops = []
-        loop_algorithm_state = (0,0) # stores how far along the loop-finding algorithm has searched
-        while loop_algorithm_state[0] != -1:
-            # allow this algorithm 500ms to run, and then run it repeatedly until it reports that it has completed
-            loop_algorithm_state = detect_loops(ret, loop_algorithm_state, 0.5)
-        loops = copy.deepcopy(detected_loops)
+        loops = self.find_loops(ret)
 
         # simplify
-        global stk, bitmask
-        stk = None
-        bitmask = None
-        while not rdp_iter(self.path, rdp_epsilon, 0.5):
-            pass
-        simplification_bitmask = bitmask
+        simplification_bitmask = self.simplification_bitmask(self.path)
         potential_amount_to_simplify = len(simplification_bitmask) - simplification_bitmask.count()
 
         # flag points for simplification removal
@@ -276,69 +578,12 @@ class Path:
         for a,b,c in loops:
             ret[int((a+b)/2.)] = c
 
-        return remove_matching(ret, None) # remove all null-valued points before returning
-
-class TestLineCalculations(unittest.TestCase):
-    def test_perpendicular(self):
-        p1 = (0,0,0)
-        p2 = (1,0,0)
-        p3 = (0,0,1)
-        p4 = (0,1,1)
-        self.assertEqual((1,(0,0,0.5)), segment_segment_dist(p1,p2,p3,p4))
-
-    def test_parallel(self):
-        p1 = (0,0,0)
-        p2 = (1,1,0)
-        p3 = (0,0,1)
-        p4 = (1,1,1)
-        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p3,p4))
-
-    def test_intersecting(self):
-        p1 = (0,0,0)
-        p2 = (1,0,0)
-        p3 = (0,0,0)
-        p4 = (0,1,0)
-        self.assertEqual((0,(0,0,0)), segment_segment_dist(p1,p2,p3,p4))
-
-    def test_identical(self):
-        p1 = (0,0,0)
-        p2 = (1,1,0)
-        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p1,p2))
-        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p2,p1))
-
-    def test_parallel_but_spaced_out(self):
-        p1 = (0,0,0)
-        p2 = (1,0,0)
-        p3 = (3,0,0)
-        p4 = (4,0,0)
-        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p3,p4))
-
-    def test_perpendicular_but_spaced_out(self):
-        p1 = (-2,0,0)
-        p2 = (2,0,0)
-        p3 = (0,1,1)
-        p4 = (0,2,2)
-        self.assertEqual((sqrt(2), (0,0.5,0.5)), segment_segment_dist(p1,p2,p3,p4))
-
-    def test_line_point(self):
-        p = (0,0,1)
-        l = ((1,1,0),(-1,-1,0))
-        self.assertAlmostEqual(1., point_line_dist(p,l))
-
-    def test_line_point2(self):
-        p = (-3,9,7)
-        l = ((0,9,2),(5,9,8))
-        self.assertAlmostEqual(5.5056, point_line_dist(p,l), delta=0.001)
-
-    def test_recursive_rdp(self):
-        inp = [(0,0,0), (1,4,6), (4,2,1), (4,2,2), (4,3,3), (5,3,3), (6,6,9)]
-        out = [(0, 0, 0), (1, 4, 6), (4, 2, 1), (6, 6, 9)]
-        self.assertEqual(out, rdp(inp, 1))
-
-    def test_iterative_rdp(self):
-        inp = [(0,0,0), (1,4,6), (4,2,1), (4,2,2), (4,3,3), (5,3,3), (6,6,9)]
-        out = [(0, 0, 0), (1, 4, 6), (4, 2, 1), (6, 6, 9)]
-        self.assertEqual(out, rdp_iter(inp, 1))
+        ret = remove_matching(ret, None) # remove all null-valued points before returning
+
+        if self.stats is not None:
+            self.stats.record('flyback', time.perf_counter() - start_time)
+        return ret
 
 if __name__ == "__main__":
-    unittest.main()
+    import unittest
+    unittest.main(module="test_path_cleanup")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+'''
+    Compiled versions of the path_cleanup kernels, for near-native cleanup speed without the C++ build.
+
+    The kernels work on (n,3) float64 arrays instead of lists of tuples, and run to completion instead of in 0.5ms
+    slices: the RDP stack and the loop list become preallocated arrays, so that Numba can compile them in nopython mode.
+    They do exactly the same float64 arithmetic, in the same order, as path_cleanup.py, so they give the same results.
+
+    When Numba is not installed the kernels still work, interpreted, which is slower than path_cleanup.py itself.
+    Use new_path(), which only returns a JitPath when Numba is available, and a plain Path otherwise.
+'''
+
+from math import sqrt
+
+import numpy
+
+from path_cleanup import Path
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+available = numba is not None
+
+### kernels ###
+
+def segment_segment_dist(path, i, j):
+    '''path_cleanup.segment_segment_dist of the segments (path[i], path[i+1]) and (path[j], path[j+1]), returned as (dist, x, y, z)'''
+    u0, u1, u2 = path[i+1, 0]-path[i, 0], path[i+1, 1]-path[i, 1], path[i+1, 2]-path[i, 2]
+    v0, v1, v2 = path[j+1, 0]-path[j, 0], path[j+1, 1]-path[j, 1], path[j+1, 2]-path[j, 2]
+    w0, w1, w2 = path[i, 0]-path[j, 0], path[i, 1]-path[j, 1], path[i, 2]-path[j, 2]
+
+    a = u0*u0 + u1*u1 + u2*u2
+    b = u0*v0 + u1*v1 + u2*v2
+    c = v0*v0 + v1*v1 + v2*v2
+    d = u0*w0 + u1*w1 + u2*w2
+    e = v0*w0 + v1*w1 + v2*w2
+    D = a*c-b*b
+
+    if D < 0.0000001: # almost parallel
+        return numpy.inf, 0., 0., 0.
+    t1 = min(max(0., (b*e-c*d)/D), 1.)
+    t2 = min(max(0., (a*e-b*d)/D), 1.)
+
+    d0, d1, d2 = w0+t1*u0-t2*v0, w1+t1*u1-t2*v1, w2+t1*u2-t2*v2
+    return (sqrt(d0*d0 + d1*d1 + d2*d2),
+            (path[i, 0]+t1*u0+path[j, 0]+t2*v0)/2, (path[i, 1]+t1*u1 + path[j, 1]+t2*v1)/2, (path[i, 2]+t1*u2+path[j, 2]+t2*v2)/2)
+
+def hypot3(path, i, j):
+    return sqrt((path[i, 0]-path[j, 0])**2 + (path[i, 1]-path[j, 1])**2 + (path[i, 2]-path[j, 2])**2)
+
+def point_line_dist(path, point, start, end):
+    '''path_cleanup.point_line_dist of path[point] to the line through path[start] and path[end]'''
+    a = hypot3(path, point, start)
+    b = hypot3(path, start, end)
+    c = hypot3(path, end, point)
+    s = (a+b+c)/2.
+    area = sqrt(max(0., s*(s-a)*(s-b)*(s-c)))
+    return 2*area/b
+
+def rdp(path, epsilon):
+    '''path_cleanup.rdp_iter run to completion, returns the bitmask as a bool array'''
+    n = len(path)
+    bitmask = numpy.ones(n, dtype=numpy.bool_)
+    if n < 2:
+        return bitmask
+    stack = numpy.empty((n, 2), dtype=numpy.int64) # every entry on the stack covers a different range of points
+    stack[0, 0], stack[0, 1] = 0, n-1
+    depth = 1
+    while depth:
+        depth -= 1
+        start, end = stack[depth, 0], stack[depth, 1]
+        max_dist = 0.
+        max_index = start
+        for i in range(start+1, end):
+            if bitmask[i]:
+                dist = point_line_dist(path, i, start, end)
+                if dist > max_dist:
+                    max_index = i
+                    max_dist = dist
+        if max_dist > epsilon:
+            stack[depth, 0], stack[depth, 1] = start, max_index
+            stack[depth+1, 0], stack[depth+1, 1] = max_index, end
+            depth += 2
+        else:
+            for i in range(start+1, end):
+                bitmask[i] = False
+    return bitmask
+
+def detect_loops(path, delta):
+    '''path_cleanup.detect_loops run to completion, returns (starts, ends, points) arrays'''
+    n = len(path)
+    # the (i, j) of successive loops never go backwards, and j only repeats when i moves on, so there are at most 2n loops
+    starts = numpy.empty(2*n, dtype=numpy.int64)
+    ends = numpy.empty(2*n, dtype=numpy.int64)
+    points = numpy.empty((2*n, 3))
+    count = 0
+    min_j = 0
+    for i in range(1, n-1):
+        for j in range(max(min_j, i+2), n-1):
+            dist, x, y, z = segment_segment_dist(path, i, j)
+            if dist <= delta:
+                min_j = j
+                starts[count], ends[count] = i+1, j+1
+                points[count, 0], points[count, 1], points[count, 2] = x, y, z
+                count += 1
+    return starts[:count], ends[:count], points[:count]
+
+if available:
+    # rebinding the names first means the compiled kernels call each other compiled
+    segment_segment_dist = numba.njit(cache=True)(segment_segment_dist)
+    hypot3 = numba.njit(cache=True)(hypot3)
+    point_line_dist = numba.njit(cache=True)(point_line_dist)
+    rdp = numba.njit(cache=True)(rdp)
+    detect_loops = numba.njit(cache=True)(detect_loops)
+
+### Path ###
+
+'''
+    A Path whose cleanup runs the compiled kernels above. Everything else, and every cleanup decision, is Path's.
+'''
+class JitPath(Path):
+    def find_loops(self, path):
+        starts, ends, points = detect_loops(numpy.array(path, dtype=numpy.float64).reshape(-1, 3), self.config.pruning_delta)
+        return [(a, b, tuple(c)) for (a, b, c) in zip(starts.tolist(), ends.tolist(), points.tolist())]
+
+    def simplification_bitmask(self, path):
+        from bitarray import bitarray
+        ret = bitarray()
+        ret.pack(rdp(numpy.array(path, dtype=numpy.float64).reshape(-1, 3), self.config.rdp_epsilon).tobytes())
+        return ret
+
+def new_path(path, profile=False, config=None):
+    '''a JitPath if Numba is installed, a Path otherwise'''
+    return (JitPath if available else Path)(path, profile, config)
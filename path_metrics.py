@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+'''
+    Measures how much a flyback path distorts the route that was actually flown.
+
+    All functions take (n,3) arrays, or anything numpy.asarray turns into one, such as a list of (x,y,z) tuples.
+    Nearest-point queries use scipy's cKDTree when scipy is installed. Without it they use a voxel grid built with
+    numpy, and a chunked brute force for the few queries that have no point in their neighbouring voxels.
+'''
+
+import numpy
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+chunk_elements = 1 << 22 # size of each block of the brute force distance matrix, which bounds its memory use
+brute_force_limit = 1 << 26 # below this many query/point pairs, the brute force is quicker than building a grid
+
+def as_points(path):
+    return numpy.asarray(path, dtype=float).reshape(-1, 3)
+
+def brute_force_nearest(queries, points):
+    ret = numpy.empty(len(queries))
+    rows = max(1, chunk_elements // len(points))
+    points_sq = (points**2).sum(axis=1)
+    for start in range(0, len(queries), rows):
+        block = queries[start:start+rows]
+        # |q-p|^2 = |q|^2 + |p|^2 - 2 q.p, which needs no (rows, len(points), 3) temporary
+        d2 = (block**2).sum(axis=1)[:, None] + points_sq[None, :] - 2 * block.dot(points.T)
+        ret[start:start+rows] = numpy.sqrt(numpy.maximum(d2.min(axis=1), 0.))
+    return ret
+
+def grid_nearest(queries, points, cell):
+    '''
+        Nearest distances using a voxel grid of size 'cell'. Every query is compared against the points in its own
+        and its 26 neighbouring voxels, which finds the exact nearest point whenever it is within 'cell'.
+        Queries whose nearest point is further away are retried on a coarser grid, or by brute force once few are left.
+    '''
+    lowest = numpy.minimum(queries.min(axis=0), points.min(axis=0))
+    p_ijk = numpy.floor((points - lowest) / cell).astype(numpy.int64) + 1
+    q_ijk = numpy.floor((queries - lowest) / cell).astype(numpy.int64) + 1
+    dims = numpy.maximum(p_ijk.max(axis=0), q_ijk.max(axis=0)) + 2
+    def key(ijk):
+        return (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+    order = numpy.argsort(key(p_ijk), kind='stable')
+    sorted_keys = key(p_ijk)[order]
+
+    best = numpy.full(len(queries), numpy.inf)
+    for offset in numpy.array(numpy.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1])).reshape(3, -1).T:
+        k = key(q_ijk + offset)
+        lo = numpy.searchsorted(sorted_keys, k, 'left')
+        counts = numpy.searchsorted(sorted_keys, k, 'right') - lo
+        total = counts.sum()
+        if total == 0:
+            continue
+        # expand every query's [lo, hi) range of candidate points into flat (query, point) pairs
+        hit = numpy.flatnonzero(counts)
+        q_index = numpy.repeat(hit, counts[hit])
+        firsts = numpy.cumsum(counts[hit]) - counts[hit]
+        p_index = order[numpy.repeat(lo[hit], counts[hit]) + numpy.arange(total) - numpy.repeat(firsts, counts[hit])]
+        d2 = ((queries[q_index] - points[p_index])**2).sum(axis=1)
+        best[hit] = numpy.minimum(best[hit], numpy.minimum.reduceat(d2, firsts))
+    best = numpy.sqrt(best)
+
+    missed = best > cell
+    if missed.any():
+        if len(queries[missed]) * len(points) <= brute_force_limit:
+            best[missed] = brute_force_nearest(queries[missed], points)
+        else:
+            best[missed] = grid_nearest(queries[missed], points, cell * 4)
+    return best
+
+def nearest_distances(queries, points, cell=None):
+    '''returns, for every query point, the distance to the nearest of 'points'. 'cell' sets the voxel size of the fallback grid'''
+    queries, points = as_points(queries), as_points(points)
+    if cKDTree is not None:
+        return cKDTree(points).query(queries)[0]
+    if len(queries) * len(points) <= brute_force_limit:
+        return brute_force_nearest(queries, points)
+    if cell is None:
+        # a few times the typical spacing of the points, so most queries find their nearest point in the grid
+        spacing = numpy.sqrt((numpy.diff(points, axis=0)**2).sum(axis=1))
+        cell = max(4. * numpy.median(spacing), 1e-3)
+    return grid_nearest(queries, points, cell)
+
+def path_length(path):
+    path = as_points(path)
+    return numpy.sqrt((numpy.diff(path, axis=0)**2).sum(axis=1)).sum()
+
+def densify(path, step):
+    '''returns the polyline's vertices, plus points every 'step' meters along each of its segments'''
+    path = as_points(path)
+    if len(path) < 2:
+        return path
+    seg = numpy.diff(path, axis=0)
+    counts = numpy.maximum(1, numpy.ceil(numpy.sqrt((seg**2).sum(axis=1)) / step).astype(int))
+    starts = numpy.repeat(path[:-1], counts, axis=0)
+    offsets = numpy.concatenate([numpy.arange(c) / float(c) for c in counts])
+    return numpy.vstack((starts + offsets[:, None] * numpy.repeat(seg, counts, axis=0), path[-1:]))
+
+def hausdorff(a, b):
+    '''the largest distance from a point of either path to the nearest point of the other'''
+    return max(nearest_distances(a, b).max(), nearest_distances(b, a).max())
+
+def corridor_deviation(flown, flyback, step=0.5):
+    '''
+        The furthest the flyback path strays from where the vehicle actually flew: the largest distance from any point
+        along the flyback path, sampled every 'step' meters, to the nearest flown position.
+    '''
+    return nearest_distances(densify(flyback, step), flown).max()
+
+def discrete_frechet(a, b):
+    '''
+        The discrete Frechet distance between two paths, with O(len(a)*len(b)) time and O(max(len)) memory.
+
+        The usual dynamic program fills a table ca[i][j] = max(d(i,j), min(ca[i-1][j], ca[i-1][j-1], ca[i][j-1])).
+        It is filled one column j at a time, along the longer path. Within a column, ca[i] = clip(ca[i-1], d_i, max(d_i, a_i)),
+        where a_i = min(prev[i], prev[i-1]). Clips compose into clips, so the whole column is a prefix scan,
+        which is done with log2(n) vectorized steps instead of a Python loop over every cell.
+    '''
+    a, b = as_points(a), as_points(b)
+    if len(a) < len(b):
+        a, b = b, a # scan along the longer path, loop over the shorter one
+
+    col = numpy.maximum.accumulate(numpy.sqrt(((a - b[0])**2).sum(axis=1)))
+    for j in range(1, len(b)):
+        d = numpy.sqrt(((a - b[j])**2).sum(axis=1))
+        reach = numpy.minimum(col, numpy.concatenate(([numpy.inf], col[:-1]))) # min(prev[i], prev[i-1])
+        lo, hi = d, numpy.maximum(d, reach)
+        shift = 1
+        while shift < len(a):
+            # compose clip i with clip i-shift, which is applied first
+            new_lo = numpy.clip(lo[:-shift], lo[shift:], hi[shift:])
+            new_hi = numpy.clip(hi[:-shift], lo[shift:], hi[shift:])
+            lo = numpy.concatenate((lo[:shift], new_lo))
+            hi = numpy.concatenate((hi[:shift], new_hi))
+            shift *= 2
+        col = hi # starting the scan from +inf, the result of every composed clip is its upper bound
+    return col[-1]
+
+def path_metrics(flown, flyback):
+    '''returns all the metrics as a dict'''
+    flown, flyback = as_points(flown), as_points(flyback)
+    flown_length = path_length(flown)
+    return {
+        'hausdorff': hausdorff(flown, flyback),
+        'frechet': discrete_frechet(flown, flyback),
+        'length_ratio': path_length(flyback) / flown_length if flown_length > 0 else 1.,
+        'corridor_deviation': corridor_deviation(flown, flyback),
+    }
+
+def format_metrics(metrics):
+    return "hausdorff {hausdorff:.2f}m, frechet {frechet:.2f}m, length ratio {length_ratio:.3f}, corridor deviation {corridor_deviation:.2f}m".format(**metrics)
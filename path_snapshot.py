@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+'''
+    Compact binary snapshots of a Path, to checkpoint long simulations, ship a failing state as a test fixture, or
+    start a benchmark from a nearly full buffer.
+
+    A snapshot is a 64 byte header, followed by sections of packed little-endian values:
+
+        offset  size         contents
+        0       64           header, see header_format
+        64      24*points    the path, as float64 (x, y, z) triples, so it can be memory-mapped as an (n,3) array
+                8*stack      rdp_iter's stack of (start, end) uint32 pairs
+                bitmask      rdp_iter's bitmask, packed 8 points per byte, padded to a multiple of 8 bytes
+                32*loops     detect_loops' loops, as (start, end) uint32 followed by the (x, y, z) float64 point
+
+    The last three sections hold the module-level state of path_cleanup's anytime algorithms, and are only saved with
+    cleanup_state=True. A count of 0xffffffff means the state was None. Profiling stats are not saved.
+
+    Restoring and saving again gives back the same bytes.
+'''
+
+import argparse
+import struct
+
+import path_cleanup
+from path_cleanup import Path, PathConfig
+
+magic = b'SRTL'
+version = 1
+# magic, version, flags, points, worst_length, max_path_len, position_delta, pruning_delta, rdp_epsilon, stack, bitmask, loops
+header_format = '<4sHHIIIdddIII'
+header_size = 64
+flag_cleanup_state = 1
+flag_early_pruning = 2
+none = 0xffffffff
+
+def pad(data):
+    return data + b'\0' * (-len(data) % 8)
+
+def dumps(path, cleanup_state=False):
+    '''returns the snapshot of 'path' as bytes'''
+    config = path.config
+    stk, bitmask, loops = None, None, None
+    if cleanup_state:
+        stk, bitmask, loops = path_cleanup.stk, path_cleanup.bitmask, path_cleanup.detected_loops
+
+    def count(section):
+        return none if section is None else len(section)
+    flags = (flag_cleanup_state if cleanup_state else 0) | (flag_early_pruning if config.early_pruning else 0)
+    header = struct.pack(header_format, magic, version, flags,
+                         len(path.path), path.worst_length, config.max_path_len,
+                         config.position_delta, config.pruning_delta, config.rdp_epsilon,
+                         count(stk), count(bitmask), count(loops))
+    parts = [header.ljust(header_size, b'\0'), struct.pack('<{}d'.format(3*len(path.path)), *(v for p in path.path for v in p))]
+    if cleanup_state:
+        parts.append(struct.pack('<{}I'.format(2*len(stk or ())), *(v for pair in stk or () for v in pair)))
+        parts.append(pad(bitmask.tobytes() if bitmask is not None else b''))
+        for (a, b, c) in loops or ():
+            parts.append(struct.pack('<II3d', a, b, *c))
+    return b''.join(parts)
+
+def read_header(data):
+    '''returns the header fields as a dict'''
+    if len(data) < header_size or data[:4] != magic:
+        raise Exception("not a Path snapshot")
+    fields = struct.unpack_from(header_format, data)
+    if fields[1] > version:
+        raise Exception("Path snapshot version {} is newer than this reader, version {}".format(fields[1], version))
+    return dict(zip(('magic', 'version', 'flags', 'points', 'worst_length', 'max_path_len', 'position_delta',
+                     'pruning_delta', 'rdp_epsilon', 'stack', 'bitmask', 'loops'), fields))
+
+def loads(data, cls=Path):
+    '''
+        Returns a new 'cls' (Path by default) with the state in the snapshot 'data'. If the snapshot holds cleanup
+        state, that replaces path_cleanup's module-level anytime state.
+    '''
+    header = read_header(data)
+    offset = header_size
+    n = header['points']
+    values = struct.unpack_from('<{}d'.format(3*n), data, offset)
+    offset += 24*n
+    config = PathConfig(position_delta=header['position_delta'], pruning_delta=header['pruning_delta'],
+                        rdp_epsilon=header['rdp_epsilon'], max_path_len=header['max_path_len'],
+                        early_pruning=bool(header['flags'] & flag_early_pruning))
+    path = cls([values[i:i+3] for i in range(0, len(values), 3)], config=config)
+    path.worst_length = header['worst_length']
+
+    if header['flags'] & flag_cleanup_state:
+        stk = None
+        if header['stack'] != none:
+            pairs = struct.unpack_from('<{}I'.format(2*header['stack']), data, offset)
+            stk = [pairs[i:i+2] for i in range(0, len(pairs), 2)]
+            offset += 8*header['stack']
+        bitmask = None
+        if header['bitmask'] != none:
+            from bitarray import bitarray
+            size = (header['bitmask'] + 7) // 8
+            bitmask = bitarray()
+            bitmask.frombytes(bytes(data[offset:offset+size]))
+            del bitmask[header['bitmask']:]
+            offset += size + (-size % 8)
+        loops = []
+        for i in range(0 if header['loops'] == none else header['loops']):
+            a, b, x, y, z = struct.unpack_from('<II3d', data, offset)
+            loops.append((a, b, (x, y, z)))
+            offset += 32
+        path_cleanup.stk, path_cleanup.bitmask, path_cleanup.detected_loops = stk, bitmask, loops
+    return path
+
+def save(path, filename, cleanup_state=False):
+    with open(filename, 'wb') as f:
+        f.write(dumps(path, cleanup_state))
+
+def load(filename, cls=Path):
+    with open(filename, 'rb') as f:
+        return loads(f.read(), cls)
+
+def map_points(filename):
+    '''returns the points of a snapshot file as a read-only (n,3) numpy.memmap, without reading the rest of the file'''
+    import numpy
+    with open(filename, 'rb') as f:
+        header = read_header(f.read(header_size))
+    return numpy.memmap(filename, dtype='<f8', mode='r', offset=header_size, shape=(header['points'], 3))
+
+def main():
+    parser = argparse.ArgumentParser(description='Print what a Path snapshot holds')
+    parser.add_argument('snapshot', type=str, help='snapshot file')
+    args = parser.parse_args()
+
+    with open(args.snapshot, 'rb') as f:
+        header = read_header(f.read(header_size))
+    header['magic'] = header['magic'].decode()
+    for (k, v) in header.items():
+        print("{:<15} {}".format(k, 'None' if v == none and k in ('stack', 'bitmask', 'loops') else v))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+'''
+    Record and replay the exact sequence of operations on a Path, to benchmark the cleanup without parsing logs.
+
+    A trace is a .npz file holding:
+        ops     uint8, one per call: 0 append_if_far_enough, 1 routine_cleanup, 2 get_flyback_path
+        points  (n,3) float64, the position given to every append_if_far_enough, in order
+        home    the first point of the Path
+        config  the PathConfig tuning variables, as [position_delta, pruning_delta, rdp_epsilon, max_path_len, early_pruning]
+
+    Record a trace by wrapping a Path in a TraceRecorder (visualizer.py --headless --record_trace does this), or with
+    './path_trace.py record'. './path_trace.py replay' then feeds traces into a fresh Path as fast as it can, and
+    prints appends/sec and cleanups/sec, so algorithm variants can be compared on identical inputs.
+'''
+
+import argparse
+import sys
+import time
+
+import numpy
+
+from path_cleanup import Path, PathConfig
+
+APPEND, CLEANUP, FLYBACK = 0, 1, 2
+
+class Trace(object):
+    def __init__(self, home, config, ops=(), points=()):
+        self.home = tuple(home)
+        self.config = config
+        self.ops = list(ops)
+        self.points = list(points)
+
+    def save(self, filename):
+        c = self.config
+        numpy.savez(filename,
+                    ops=numpy.array(self.ops, dtype=numpy.uint8),
+                    points=numpy.array(self.points, dtype=numpy.float64).reshape(-1, 3),
+                    home=numpy.array(self.home, dtype=numpy.float64),
+                    config=numpy.array([c.position_delta, c.pruning_delta, c.rdp_epsilon, c.max_path_len, c.early_pruning], dtype=numpy.float64))
+
+    @staticmethod
+    def load(filename):
+        with numpy.load(filename) as f:
+            position_delta, pruning_delta, rdp_epsilon, max_path_len = f['config'].tolist()[:4]
+            early_pruning = len(f['config']) > 4 and bool(f['config'][4]) # traces from before early_pruning have 4 values
+            config = PathConfig(position_delta, pruning_delta, rdp_epsilon, int(max_path_len), early_pruning)
+            return Trace(f['home'].tolist(), config, f['ops'].tolist(), [tuple(p) for p in f['points'].tolist()])
+
+'''
+    Wraps a Path, and records every append_if_far_enough, routine_cleanup and get_flyback_path call into self.trace.
+    Everything else is passed through to the Path.
+'''
+class TraceRecorder(object):
+    def __init__(self, path):
+        self.__dict__['_path'] = path
+        self.__dict__['trace'] = Trace(path.path[0], path.config)
+
+    def __getattr__(self, name):
+        return getattr(self._path, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._path, name, value)
+
+    def append_if_far_enough(self, p):
+        self.trace.ops.append(APPEND)
+        self.trace.points.append(tuple(p))
+        return self._path.append_if_far_enough(p)
+
+    def routine_cleanup(self):
+        self.trace.ops.append(CLEANUP)
+        return self._path.routine_cleanup()
+
+    def get_flyback_path(self):
+        self.trace.ops.append(FLYBACK)
+        return self._path.get_flyback_path()
+
+def record(points, config=None, flyback_every=10):
+    '''
+        The trace of a headless run over 'points', which also asks for the flyback path every 'flyback_every' positions
+        (0 for never). If the Path raises, the trace stops with the call that raised.
+    '''
+    recorder = TraceRecorder(Path([points[0]], config=config))
+    try:
+        for (i, p) in enumerate(points[1:]):
+            recorder.append_if_far_enough(p)
+            recorder.routine_cleanup()
+            if flyback_every and (i+1) % flyback_every == 0:
+                recorder.get_flyback_path()
+    except Exception as e: # keep the trace up to the failing call, replaying it reproduces the failure
+        print("stopped after {} operations: {}".format(len(recorder.trace.ops), str(e) or type(e).__name__), file=sys.stderr)
+    return recorder.trace
+
+def replay(trace, cls=Path, config=None):
+    '''
+        Runs the trace on a new 'cls' (Path by default), with the trace's config unless another is given.
+        Returns the timings and counts as a dict. 'cleanups' only counts the routine_cleanup calls that had to clean up.
+    '''
+    path = cls([trace.home], config=config if config is not None else trace.config)
+    append, cleanup, flyback = path.append_if_far_enough, path.routine_cleanup, path.get_flyback_path
+    clock = time.perf_counter
+    threshold = path.config.max_path_len - 10
+    points = iter(trace.points)
+    seconds = [0., 0., 0.]
+    counts = [0, 0, 0]
+    cleanups = 0
+    for op in trace.ops:
+        if op == APPEND:
+            p = next(points)
+            start = clock()
+            append(p)
+        elif op == CLEANUP:
+            if len(path.path) >= threshold:
+                cleanups += 1
+            start = clock()
+            cleanup()
+        else:
+            start = clock()
+            flyback()
+        seconds[op] += clock() - start
+        counts[op] += 1
+    total = sum(seconds)
+    return {
+        'appends': counts[APPEND],
+        'cleanup_calls': counts[CLEANUP],
+        'cleanups': cleanups,
+        'flybacks': counts[FLYBACK],
+        'append_s': seconds[APPEND],
+        'cleanup_s': seconds[CLEANUP],
+        'flyback_s': seconds[FLYBACK],
+        'total_s': total,
+        'appends_per_s': counts[APPEND] / total if total else 0.,
+        'cleanups_per_s': cleanups / seconds[CLEANUP] if seconds[CLEANUP] else 0.,
+        'worst_length': path.worst_length,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay traces of Path operations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rec = subparsers.add_parser('record', help='record a headless run over a log')
+    rec.add_argument('logfile', type=str, help='log file to record')
+    rec.add_argument('trace', type=str, help='.npz trace to write')
+    rec.add_argument('--flyback_every', metavar='', type=int, default=10, help='ask for the flyback path every this many positions, 0 for never')
+    rec.add_argument('--max_path_len', metavar='', type=int, help='max_path_len of the recorded Path')
+    rep = subparsers.add_parser('replay', help='replay traces as fast as possible')
+    rep.add_argument('traces', nargs='+', help='.npz traces to replay')
+    rep.add_argument('--jit', action='store_true', help='replay into the Numba compiled Path of path_cleanup_jit.py')
+    rep.add_argument('--max_path_len', metavar='', type=int, help='replay with this max_path_len instead of the recorded one')
+    rep.add_argument('--repeat', metavar='', type=int, default=3, help='replays per trace, the fastest is printed')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from positions import load_ned
+        ned = load_ned(args.logfile)
+        if ned is None:
+            sys.exit("{}: no GPS log data".format(args.logfile))
+        trace = record(list(zip(*(a.tolist() for a in ned))), PathConfig(max_path_len=args.max_path_len), args.flyback_every)
+        trace.save(args.trace)
+        print("{}: {} operations".format(args.trace, len(trace.ops)))
+        return
+
+    cls = Path
+    if args.jit:
+        from path_cleanup_jit import JitPath
+        cls = JitPath
+    print("{:<40} {:>9} {:>9} {:>13} {:>14} {:>10} {:>6}".format('trace', 'appends', 'cleanups', 'appends/s', 'cleanups/s', 'total [s]', 'worst'))
+    for filename in args.traces:
+        trace = Trace.load(filename)
+        config = None
+        if args.max_path_len is not None:
+            c = trace.config
+            config = PathConfig(c.position_delta, c.pruning_delta, c.rdp_epsilon, args.max_path_len, c.early_pruning)
+        try:
+            r = min((replay(trace, cls, config) for _ in range(args.repeat)), key=lambda r: r['total_s'])
+        except Exception as e: # e.g. "Out of Memory. Safe RTL unavailabe."
+            print("{:<40} failed: {}".format(filename, str(e) or type(e).__name__))
+            continue
+        print("{:<40} {:>9} {:>9} {:>13.0f} {:>14.1f} {:>10.4f} {:>6}".format(filename, r['appends'], r['cleanups'], r['appends_per_s'], r['cleanups_per_s'], r['total_s'], r['worst_length']))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+'''
+    Where the positions fed to the Safe-RTL path come from.
+
+    GPS is the position source of every log. Newer logs also carry the estimator's position, at a higher rate:
+    POS (lat/lon, like GPS) and the EKF messages NKF1 and XKF1 (EKF1 in older logs), whose PN/PE/PD are meters
+    north/east/down of the EKF origin. Every source gives the same (t, x, y, z) arrays: seconds, meters north and east
+    of the source's first sample, and meters of altitude above home (above the EKF origin, for the EKF sources).
+
+    Feeding a fast source at full rate into Path.append_if_far_enough would only multiply the calls, since most
+    samples are within position_delta of the last stored point. decimate() finds the samples that would be stored,
+    so only those need to reach the Path.
+'''
+
+import numpy
+
+from positions import NEDConverter, time_label
+
+def channel_arrays(channel, labels):
+    '''returns a numpy array per label, in message order'''
+    keys = list(channel[labels[0]].dictData.keys())
+    return [numpy.array([channel[label].dictData[k] for k in keys], dtype=float) for label in labels]
+
+def message_time(channel):
+    label, scale = time_label(channel)
+    if label is None:
+        return None
+    return channel_arrays(channel, [label])[0] * scale
+
+class LatLonSource(object):
+    '''a message with Lat, Lng and an altitude, like GPS and POS'''
+
+    def __init__(self, name, altitude_labels):
+        self.name = name
+        self.altitude_labels = altitude_labels
+
+    def available(self, logdata):
+        channel = logdata.channels.get(self.name, {})
+        return "Lat" in channel and "Lng" in channel and any(label in channel for label in self.altitude_labels)
+
+    def positions(self, logdata):
+        channel = logdata.channels[self.name]
+        alt_label = next(label for label in self.altitude_labels if label in channel)
+        lat, lon, alt = channel_arrays(channel, ["Lat", "Lng", alt_label])
+        north, east, alt = NEDConverter(lat[0], lon[0], alt[0]).convert_arrays(lat, lon, alt)
+        return message_time(channel), north, east, alt
+
+class EKFSource(object):
+    '''
+        An EKF message with PN, PE and PD, in meters from the EKF origin.
+
+        XKF1 is logged once per EKF3 core, with the core number in C. Each core has its own estimate, so only the
+        primary core (C == 0) is used, mixing them would make the path zig-zag between the cores.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+
+    def available(self, logdata):
+        channel = logdata.channels.get(self.name, {})
+        return all(label in channel for label in ("PN", "PE", "PD"))
+
+    def positions(self, logdata):
+        channel = logdata.channels[self.name]
+        north, east, down = channel_arrays(channel, ["PN", "PE", "PD"])
+        t = message_time(channel)
+        if "C" in channel:
+            primary = channel_arrays(channel, ["C"])[0] == 0
+            north, east, down = north[primary], east[primary], down[primary]
+            t = None if t is None else t[primary]
+        return t, north - north[0], east - east[0], -down
+
+sources = {
+    'GPS': LatLonSource('GPS', ('RelAlt', 'Alt')),
+    'POS': LatLonSource('POS', ('RelHomeAlt', 'RelAlt', 'Alt')),
+    'XKF1': EKFSource('XKF1'),
+    'NKF1': EKFSource('NKF1'),
+    'EKF1': EKFSource('EKF1'),
+}
+preference = ('XKF1', 'NKF1', 'EKF1', 'POS', 'GPS') # for 'auto': the estimator first, since it has the highest rate
+
+def pick_source(logdata, name='auto'):
+    '''returns the named source, or with 'auto' the first available one in 'preference'. Returns None if it has no data'''
+    for candidate in (preference if name == 'auto' else (name,)):
+        source = sources[candidate]
+        if source.available(logdata):
+            return source
+    return None
+
+def decimate(x, y, z, position_delta, window=64):
+    '''
+        Returns the indices of the positions that Path.append_if_far_enough would store, starting from the first one
+        as home: every position at least position_delta from the previously stored one. The last position is
+        always included, so that Path.worst_length also counts the last stored position, like it does without decimation.
+
+        This is the same sequential test, but it looks for the next stored position in a vectorized window of the
+        following positions, which doubles until it finds one. So the Python loop runs once per stored position, not
+        once per sample, however fast the source is.
+    '''
+    p = numpy.column_stack((x, y, z))
+    delta_sq = position_delta**2
+    ret = [0]
+    last = 0
+    while last < len(p) - 1:
+        size = window
+        while True:
+            ahead = p[last+1:last+1+size]
+            hit = numpy.flatnonzero(((ahead - p[last])**2).sum(axis=1) >= delta_sq)
+            if len(hit) or last+1+size >= len(p):
+                break
+            size *= 2
+        if not len(hit):
+            break
+        last += 1 + hit[0]
+        ret.append(last)
+    if ret[-1] != len(p) - 1:
+        ret.append(len(p) - 1)
+    return numpy.array(ret)
@@ -0,0 +1,153 @@
+import hashlib
+import os
+from math import cos, radians, sin, sqrt
+
+# WGS84 ellipsoid
+wgs84_a = 6378137.0
+wgs84_f = 1/298.257223563
+wgs84_e2 = wgs84_f * (2 - wgs84_f)
+
+def altitude_label(labels):
+    '''returns the GPS altitude label to use, or None if the GPS messages carry no altitude'''
+    if "RelAlt" in labels:
+        return "RelAlt"
+    elif "Alt" in labels:
+        return "Alt"
+    return None
+
+# time labels across log versions, and the factor that turns them into seconds
+time_labels = (('TimeUS', 1e-6), ('TimeMS', 1e-3), ('Time', 1e-3), ('GMS', 1e-3))
+
+def time_label(labels):
+    '''returns (label, scale) of the message time, or (None, None) if the messages carry no time'''
+    for (label, scale) in time_labels:
+        if label in labels:
+            return label, scale
+    return None, None
+
+def geodetic_to_ecef(lat, lon, height):
+    '''returns the earth-centered, earth-fixed (x, y, z) of a WGS84 position. lat and lon are in radians, height in meters above the ellipsoid'''
+    sin_lat = sin(lat)
+    N = wgs84_a / sqrt(1 - wgs84_e2 * sin_lat * sin_lat) # prime vertical radius of curvature
+    return ((N + height) * cos(lat) * cos(lon),
+            (N + height) * cos(lat) * sin(lon),
+            (N * (1 - wgs84_e2) + height) * sin_lat)
+
+class NEDConverter(object):
+    '''
+        converts lat/lon to meters north and east of a fixed home position. Altitude is passed through unchanged.
+
+        This is the same as nvector's diff_positions(home, position).change_frame(FrameN(home)), done with plain math
+        so that converting positions doesn't pull in nvector and numpy. Like the original nvector code, the altitude
+        is handed to the ellipsoid as a depth, which only moves north/east by a few millimeters per kilometer.
+    '''
+
+    def __init__(self, lat, lon, alt):
+        self.home_lat = radians(lat)
+        self.home_lon = radians(lon)
+        self.home = geodetic_to_ecef(self.home_lat, self.home_lon, -alt)
+        self.sin_lat, self.cos_lat = sin(self.home_lat), cos(self.home_lat)
+        self.sin_lon, self.cos_lon = sin(self.home_lon), cos(self.home_lon)
+
+    def convert(self, lat, lon, alt):
+        '''returns (north, east, alt) of the given position'''
+        x, y, z = geodetic_to_ecef(radians(lat), radians(lon), -alt)
+        dx, dy, dz = x - self.home[0], y - self.home[1], z - self.home[2]
+        north = -self.sin_lat*self.cos_lon*dx - self.sin_lat*self.sin_lon*dy + self.cos_lat*dz
+        east = -self.sin_lon*dx + self.cos_lon*dy
+        return (north, east, alt)
+
+    def convert_arrays(self, lat, lon, alt):
+        '''the same as convert, for whole numpy arrays of positions. Returns (north, east, alt) arrays'''
+        import numpy # only the vectorized paths need numpy
+        lat, lon, alt = numpy.radians(lat), numpy.radians(lon), numpy.asarray(alt, dtype=float)
+        sin_lat = numpy.sin(lat)
+        N = wgs84_a / numpy.sqrt(1 - wgs84_e2 * sin_lat * sin_lat)
+        dx = (N - alt) * numpy.cos(lat) * numpy.cos(lon) - self.home[0]
+        dy = (N - alt) * numpy.cos(lat) * numpy.sin(lon) - self.home[1]
+        dz = (N * (1 - wgs84_e2) - alt) * sin_lat - self.home[2]
+        north = -self.sin_lat*self.cos_lon*dx - self.sin_lat*self.sin_lon*dy + self.cos_lat*dz
+        east = -self.sin_lon*dx + self.cos_lon*dy
+        return north, east, alt
+
+    def invert_arrays(self, north, east, alt, iterations=4):
+        '''returns the (lat, lon) arrays, in degrees, which convert_arrays maps back to the given north/east arrays'''
+        import numpy
+        north, east, alt = numpy.asarray(north, dtype=float), numpy.asarray(east, dtype=float), numpy.asarray(alt, dtype=float)
+        # start from a flat earth around home, then correct with Newton steps using the local radii of curvature
+        sin_lat = self.sin_lat
+        N = wgs84_a / sqrt(1 - wgs84_e2 * sin_lat * sin_lat)
+        M = N * (1 - wgs84_e2) / (1 - wgs84_e2 * sin_lat * sin_lat)
+        lat = numpy.full(north.shape, self.home_lat)
+        lon = numpy.full(north.shape, self.home_lon)
+        for _ in range(iterations):
+            n, e, _ = self.convert_arrays(numpy.degrees(lat), numpy.degrees(lon), alt)
+            lat = lat + (north - n) / M
+            lon = lon + (east - e) / (N * numpy.cos(lat))
+        return numpy.degrees(lat), numpy.degrees(lon)
+
+def gps_to_ned(logdata, gps_filter=None):
+    '''
+        returns x, y, z lists for every GPS sample of a parsed DataflashLog, using the first sample as home. Returns None if there is no usable GPS data.
+        With a gps_filter.GPSFilter, only the samples that pass it are returned, and the first of those is home.
+    '''
+    if "GPS" not in logdata.channels:
+        return None
+    gps = logdata.channels["GPS"]
+    if gps_filter is not None:
+        ned = gps_filter.filter_channel(gps)
+        if ned is None or not len(ned[0]):
+            return None
+        return ned[0].tolist(), ned[1].tolist(), ned[2].tolist()
+    label = altitude_label(gps)
+    if label is None:
+        return None
+
+    lat = gps["Lat"].dictData
+    lon = gps["Lng"].dictData
+    alt = gps[label].dictData
+
+    first_index = min(lat.keys())
+    converter = NEDConverter(lat[first_index], lon[first_index], alt[first_index])
+
+    x, y, z = [], [], []
+    for i in lat.keys():
+        north, east, down = converter.convert(lat[i], lon[i], alt[i])
+        x.append(north)
+        y.append(east)
+        z.append(down)
+    return x, y, z
+
+default_cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'safe_rtl_viz')
+
+def load_ned(logfile, cache_dir=default_cache_dir, format="auto", ignoreBadlines=False, gps_filter=None):
+    '''
+        Returns the x, y, z numpy arrays of gps_to_ned for a log file, or None if it has no usable GPS data.
+        The arrays are cached in cache_dir, keyed on the file's path, size and modification time, the format and
+        ignoreBadlines (and the gps_filter thresholds), so batch jobs only parse every log once. Pass cache_dir=None to always parse.
+        Compressed logs are keyed on the compressed file, and are decompressed while parsing, never to disk.
+        The drop counts of gps_filter are only filled in when the log is actually parsed.
+    '''
+    import numpy
+
+    cache_file = None
+    if cache_dir is not None:
+        st = os.stat(logfile)
+        key = "{}:{}:{}:{}:{}".format(os.path.abspath(logfile), st.st_size, st.st_mtime_ns, format, bool(ignoreBadlines))
+        if gps_filter is not None:
+            key += ":" + repr(gps_filter)
+        cache_file = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+        if os.path.exists(cache_file):
+            ned = numpy.load(cache_file)
+            return (ned[0], ned[1], ned[2]) if len(ned) else None
+
+    import DataflashLog
+    ned = gps_to_ned(DataflashLog.DataflashLog(logfile, format=format, ignoreBadlines=ignoreBadlines), gps_filter)
+
+    if cache_file is not None:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        numpy.save(cache_file, numpy.array(ned, dtype=float) if ned is not None else numpy.zeros((0, 0)))
+    if ned is None:
+        return None
+    return tuple(numpy.array(a, dtype=float) for a in ned)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+'''
+    Parallel parameter sweep over the Path tuning variables.
+
+    Every combination of --position_delta, --pruning_delta, --rdp_epsilon and --max_path_len is simulated on every log,
+    in a process pool. The logs are parsed once (through the positions.load_ned cache), and their NED arrays are put
+    in one shared memory block which all workers read, instead of being pickled into every task.
+
+    For each setting this reports the peak memory (worst_length), the CPU time spent in routine_cleanup, and the length
+    and quality (see path_metrics.py) of the flyback path at the end of the flight. It then prints the Pareto front of
+    the settings that no other setting beats on peak memory, CPU time and corridor deviation. A setting that runs out
+    of memory on a log is not eligible for the front.
+'''
+
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from math import sqrt
+from multiprocessing import shared_memory
+
+import numpy
+
+from gps_filter import GPSFilter
+from path_cleanup import Path, PathConfig
+from path_metrics import path_metrics
+from positions import load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+### simulation ###
+
+def path_length(path):
+    return sum(sqrt((a[0]-b[0])**2 + (a[1]-b[1])**2 + (a[2]-b[2])**2) for (a, b) in zip(path, path[1:]))
+
+def simulate(points, config):
+    '''flies the positions through a Path, and returns the numbers the sweep compares settings on'''
+    return_path = Path([points[0]], config=config)
+    cleanup_cpu = 0.
+    for p in points[1:]:
+        return_path.append_if_far_enough(p)
+        start = time.process_time()
+        return_path.routine_cleanup()
+        cleanup_cpu += time.process_time() - start
+    flyback = return_path.get_flyback_path()
+    ret = {
+        'worst_length': return_path.worst_length,
+        'cleanup_cpu': cleanup_cpu,
+        'flyback_points': len(flyback),
+        'flyback_length': path_length(flyback),
+    }
+    ret.update(path_metrics(points, flyback))
+    return ret
+
+### shared memory ###
+
+_shared = None # in a worker: the shared memory block, and the array view on it
+
+def attach(name, shape):
+    global _shared
+    block = shared_memory.SharedMemory(name=name)
+    _shared = (block, numpy.ndarray(shape, dtype=numpy.float64, buffer=block.buf))
+
+def run_task(task):
+    log, start, end, settings = task
+    points = [tuple(p) for p in _shared[1][start:end].tolist()]
+    result = dict(log=log, **settings)
+    try:
+        result.update(simulate(points, PathConfig(**settings)))
+    except Exception as e: # e.g. "Out of Memory. Safe RTL unavailabe."
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+### pareto front ###
+
+objectives = ('worst_length', 'cleanup_cpu', 'corridor_deviation')
+
+def dominates(a, b):
+    return all(a[k] <= b[k] for k in objectives) and any(a[k] < b[k] for k in objectives)
+
+def pareto_front(rows):
+    return [r for r in rows if not any(dominates(other, r) for other in rows)]
+
+def aggregate(results):
+    '''combines the per-log results of every setting: the worst peak memory and deviation, and the total CPU time and flyback length'''
+    by_setting = {}
+    for r in results:
+        key = tuple(r[k] for k in ('position_delta', 'pruning_delta', 'rdp_epsilon', 'max_path_len'))
+        by_setting.setdefault(key, []).append(r)
+    rows = []
+    for (key, runs) in sorted(by_setting.items()):
+        row = dict(zip(('position_delta', 'pruning_delta', 'rdp_epsilon', 'max_path_len'), key))
+        row['failed_logs'] = [r['log'] for r in runs if 'error' in r]
+        ok = [r for r in runs if 'error' not in r]
+        row['worst_length'] = max(r['worst_length'] for r in ok) if ok else None
+        row['cleanup_cpu'] = sum(r['cleanup_cpu'] for r in ok)
+        row['flyback_length'] = sum(r['flyback_length'] for r in ok)
+        row['corridor_deviation'] = max(r['corridor_deviation'] for r in ok) if ok else None
+        row['hausdorff'] = max(r['hausdorff'] for r in ok) if ok else None
+        rows.append(row)
+    return rows
+
+def print_rows(title, rows):
+    print(title)
+    print("{:>9} {:>9} {:>9} {:>9} {:>8} {:>10} {:>12} {:>13} {:>13}".format('pos_d', 'prune_d', 'rdp_eps', 'max_len', 'worst', 'cpu [s]', 'flyback [m]', 'corridor [m]', 'hausdorff [m]'))
+    for r in rows:
+        print("{:>9g} {:>9g} {:>9g} {:>9d} {:>8} {:>10.3f} {:>12.1f} {:>13.2f} {:>13.2f}".format(r['position_delta'], r['pruning_delta'], r['rdp_epsilon'], r['max_path_len'], r['worst_length'], r['cleanup_cpu'], r['flyback_length'], r['corridor_deviation'], r['hausdorff']))
+
+### main ###
+
+def floats(s):
+    return [float(v) for v in s.split(',')]
+
+def ints(s):
+    return [int(v) for v in s.split(',')]
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep the Path tuning variables over many logs in parallel')
+    parser.add_argument('logs', nargs='*', help='log files to simulate, default all of logs/*.log')
+    parser.add_argument('--position_delta', metavar='', type=floats, default=[1., 2., 3.], help='comma separated values to try')
+    parser.add_argument('--pruning_delta', metavar='', type=floats, default=[2., 3., 4.5], help='comma separated values to try')
+    parser.add_argument('--rdp_epsilon', metavar='', type=floats, default=[0.5, 1., 2.], help='comma separated values to try')
+    parser.add_argument('--max_path_len', metavar='', type=ints, default=[50, 100], help='comma separated values to try')
+    parser.add_argument('--filter_gps', action='store_true', help='drop bad GPS samples before simulating, see gps_filter.py')
+    parser.add_argument('-j', '--jobs', metavar='', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--per_log', action='store_true', help='print the Pareto front of every log, not just the combined one')
+    parser.add_argument('--json', metavar='', type=str, help='write every result to this JSON file')
+    args = parser.parse_args()
+
+    logs = args.logs or sorted(glob.glob(os.path.join(here, 'logs', '*.log')))
+
+    # parse every log once, and lay all the NED arrays out in one shared block
+    arrays, spans, offset = [], {}, 0
+    for log in logs:
+        ned = load_ned(log, gps_filter=GPSFilter() if args.filter_gps else None)
+        if ned is None:
+            print("{}: no GPS log data, skipping".format(log), file=sys.stderr)
+            continue
+        arrays.append(numpy.column_stack(ned))
+        spans[log] = (offset, offset + len(ned[0]))
+        offset += len(ned[0])
+    if not arrays:
+        sys.exit("no logs with GPS data")
+    data = numpy.vstack(arrays)
+    block = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        numpy.ndarray(data.shape, dtype=numpy.float64, buffer=block.buf)[:] = data
+
+        grid = [dict(position_delta=a, pruning_delta=b, rdp_epsilon=c, max_path_len=d) for (a, b, c, d) in
+                itertools.product(args.position_delta, args.pruning_delta, args.rdp_epsilon, args.max_path_len)]
+        tasks = [(log, start, end, settings) for settings in grid for (log, (start, end)) in spans.items()]
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.jobs, initializer=attach, initargs=(block.name, data.shape)) as pool:
+            results = pool.map(run_task, tasks, chunksize=1)
+        print("{} runs of {} settings over {} logs in {:.1f}s\n".format(len(tasks), len(grid), len(spans), time.perf_counter() - start))
+    finally:
+        block.close()
+        block.unlink()
+
+    if args.per_log:
+        for log in spans:
+            rows = [r for r in results if r['log'] == log and 'error' not in r]
+            print_rows("Pareto front for {}".format(log), sorted(pareto_front(rows), key=lambda r: r['worst_length']))
+            print()
+
+    rows = aggregate(results)
+    eligible = [r for r in rows if not r['failed_logs']]
+    for r in rows:
+        if r['failed_logs']:
+            print("position_delta={position_delta} pruning_delta={pruning_delta} rdp_epsilon={rdp_epsilon} max_path_len={max_path_len} failed on: {logs}".format(logs=', '.join(r['failed_logs']), **r), file=sys.stderr)
+    print_rows("Pareto front over all logs (worst peak memory, total cleanup CPU, worst corridor deviation)", sorted(pareto_front(eligible), key=lambda r: r['worst_length']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'settings': rows}, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+'''
+    Seeded generator of synthetic flight trajectories, for scaling and stress tests of the parser and the cleanup algorithms.
+
+    A trajectory is a chain of flight patterns (loiter circles, survey lawnmowers, spirals and back-and-forth transects)
+    joined by straight transit legs, resampled so consecutive positions are 'spacing' meters apart, plus gaussian GPS noise.
+    The same seed always gives the same trajectory. It can be returned as NumPy arrays, or written as a text .log file
+    or a binary .bin file that DataflashLog reads like a real one.
+'''
+
+import argparse
+
+import numpy
+
+from positions import NEDConverter
+
+### patterns ###
+# each takes a random generator, returns an (n,3) array of positions starting at the origin, densely sampled
+
+def loiter(rng):
+    '''several turns around the same circle, like a copter in LOITER or CIRCLE'''
+    radius = rng.uniform(5., 40.)
+    turns = rng.integers(2, 6)
+    t = numpy.linspace(0., 2*numpy.pi*turns, int(200*turns))
+    z = numpy.full(t.shape, rng.uniform(-3., 3.))
+    return numpy.column_stack((radius*(numpy.cos(t)-1), radius*numpy.sin(t), z))
+
+def survey(rng):
+    '''a lawnmower pattern of parallel rows, with the usual short turns between rows'''
+    length = rng.uniform(50., 300.)
+    step = rng.uniform(5., 20.)
+    rows = rng.integers(3, 12)
+    corners = []
+    for row in range(rows):
+        y = row*step
+        corners.extend([(0., y), (length, y)] if row % 2 == 0 else [(length, y), (0., y)])
+    corners = numpy.array(corners)
+    angle = rng.uniform(0, 2*numpy.pi)
+    rotation = numpy.array([[numpy.cos(angle), -numpy.sin(angle)], [numpy.sin(angle), numpy.cos(angle)]])
+    corners = corners.dot(rotation.T)
+    return numpy.column_stack((corners, numpy.zeros(len(corners))))
+
+def spiral(rng):
+    '''a climbing or descending spiral with a growing radius'''
+    turns = rng.uniform(2., 6.)
+    t = numpy.linspace(0., 2*numpy.pi*turns, int(200*turns))
+    radius = numpy.linspace(rng.uniform(2., 10.), rng.uniform(20., 60.), len(t))
+    z = numpy.linspace(0., rng.uniform(-20., 20.), len(t))
+    return numpy.column_stack((radius*numpy.cos(t)-radius[0], radius*numpy.sin(t), z))
+
+def transect(rng):
+    '''flying back and forth along the same line, which overlaps itself on every pass'''
+    length = rng.uniform(30., 200.)
+    passes = rng.integers(2, 8)
+    angle = rng.uniform(0, 2*numpy.pi)
+    ends = numpy.array([(0., 0.), (length*numpy.cos(angle), length*numpy.sin(angle))])
+    corners = numpy.array([ends[i % 2] for i in range(passes+1)])
+    return numpy.column_stack((corners, numpy.zeros(len(corners))))
+
+patterns = {
+    'loiter': loiter,
+    'survey': survey,
+    'spiral': spiral,
+    'transect': transect,
+}
+
+### trajectory ###
+
+def resample(points, spacing):
+    '''returns positions 'spacing' meters apart along the polyline through 'points' '''
+    seg = numpy.sqrt((numpy.diff(points, axis=0)**2).sum(axis=1))
+    dist = numpy.concatenate(([0.], numpy.cumsum(seg)))
+    samples = numpy.arange(0., dist[-1], spacing)
+    return numpy.column_stack([numpy.interp(samples, dist, points[:, k]) for k in range(3)])
+
+def generate(n, seed=0, pattern_names=tuple(patterns), spacing=1., noise=0.3, altitude=20.):
+    '''
+        Returns x, y, z arrays (north, east and altitude in meters, like positions.gps_to_ned) of n positions.
+        Starts at home (0, 0, 0), climbs to 'altitude' and then flies randomly chosen patterns until n positions exist.
+        'noise' is the standard deviation of the horizontal GPS noise; the vertical noise is 1.5 times that.
+    '''
+    rng = numpy.random.default_rng(seed)
+    pieces = [numpy.array([(0., 0., 0.), (0., 0., altitude)])]
+    position = pieces[0][-1]
+    total = altitude / spacing
+    while total < n:
+        # transit to somewhere new, then fly a pattern there
+        heading = rng.uniform(0, 2*numpy.pi)
+        distance = rng.uniform(20., 150.)
+        target = position + (distance*numpy.cos(heading), distance*numpy.sin(heading), rng.uniform(-5., 5.))
+        target[2] = max(target[2], 5.) # stay off the ground
+        pattern = patterns[pattern_names[rng.integers(len(pattern_names))]](rng) + target
+        pattern[:, 2] = numpy.maximum(pattern[:, 2], 5.) # descending spirals too
+        pieces.append(numpy.vstack((position, pattern)))
+        position = pattern[-1]
+        total += (distance + numpy.sqrt((numpy.diff(pattern, axis=0)**2).sum(axis=1)).sum()) / spacing
+
+    points = resample(numpy.vstack(pieces), spacing)[:n]
+    points[1:, :2] += rng.normal(0., noise, (len(points)-1, 2))
+    points[1:, 2] += rng.normal(0., noise*1.5, len(points)-1)
+    return points[:, 0], points[:, 1], points[:, 2]
+
+### log output ###
+
+log_header = '''ArduCopter V3.1 (5c6503e2)
+Free RAM: 1044
+APM 2
+FMT, 128, 89, FMT, BBnNZ, Type,Length,Name,Format,Columns
+FMT, 129, 23, PARM, Nf, Name,Value
+FMT, 130, 45, GPS, BIHBcLLeeEefI, Status,TimeMS,Week,NSats,HDop,Lat,Lng,RelAlt,Alt,Spd,GCrs,VZ,T
+FMT, 132, 67, MSG, Z, Message
+'''
+
+def gps_fields(x, y, z, home_lat, home_lon, home_alt, rate_hz, seed):
+    '''the values of the GPS messages of a trajectory, as numpy arrays named like the GPS labels'''
+    rng = numpy.random.default_rng(seed)
+    x, y, z = numpy.asarray(x), numpy.asarray(y), numpy.asarray(z)
+    lat, lon = NEDConverter(home_lat, home_lon, z[0]).invert_arrays(x, y, z)
+    time_ms = 100000000 + (numpy.arange(len(x)) * 1000. / rate_hz).astype(int)
+    velocity = numpy.diff(numpy.column_stack((x, y, z)), axis=0, prepend=[[x[0], y[0], z[0]]]) * rate_hz
+    return dict(
+        TimeMS=time_ms,
+        NSats=rng.integers(8, 14, len(x)),
+        HDop=rng.uniform(0.7, 1.6, len(x)),
+        Lat=lat,
+        Lng=lon,
+        RelAlt=z,
+        Alt=home_alt + z,
+        Spd=numpy.sqrt(velocity[:, 0]**2 + velocity[:, 1]**2),
+        GCrs=numpy.degrees(numpy.arctan2(velocity[:, 1], velocity[:, 0])) % 360.,
+        VZ=-velocity[:, 2],
+        T=time_ms // 1000)
+
+def write_log(filename, x, y, z, home_lat=-35.363261, home_lon=149.165230, home_alt=584., rate_hz=5., seed=0):
+    '''
+        Writes the trajectory as a text dataflash log, with one GPS message per position at 'rate_hz'.
+        x, y and z are converted back to lat/lon/RelAlt around the given home, so reading the file with DataflashLog
+        and positions.gps_to_ned gives back the same positions.
+    '''
+    g = gps_fields(x, y, z, home_lat, home_lon, home_alt, rate_hz, seed)
+    with open(filename, 'w') as f:
+        f.write(log_header)
+        for i in range(len(g['Lat'])):
+            f.write("GPS, 3, {}, 1774, {}, {:.2f}, {:.9f}, {:.9f}, {:.3f}, {:.3f}, {:.2f}, {:.2f}, {:.6f}, {}\n".format(
+                g['TimeMS'][i], g['NSats'][i], g['HDop'][i], g['Lat'][i], g['Lng'][i], g['RelAlt'][i], g['Alt'][i], g['Spd'][i], g['GCrs'][i], g['VZ'][i], g['T'][i]))
+
+# the messages of log_header, packed like in a binary log: after the 3 header bytes, the fields of the FMT types
+# B/I/H: unsigned, c: int16 * 100, L: int32 degrees * 1e7, e/E: int32/uint32 * 100, f: float, n/N/Z: 4/16/64 chars
+binary_header = [('head1', 'u1'), ('head2', 'u1'), ('msgid', 'u1')]
+fmt_dtype = numpy.dtype(binary_header + [('Type', 'u1'), ('Length', 'u1'), ('Name', 'S4'), ('Format', 'S16'), ('Columns', 'S64')])
+msg_dtype = numpy.dtype(binary_header + [('Message', 'S64')])
+gps_dtype = numpy.dtype(binary_header + [('Status', 'u1'), ('TimeMS', '<u4'), ('Week', '<u2'), ('NSats', 'u1'), ('HDop', '<i2'),
+                                         ('Lat', '<i4'), ('Lng', '<i4'), ('RelAlt', '<i4'), ('Alt', '<i4'), ('Spd', '<u4'),
+                                         ('GCrs', '<i4'), ('VZ', '<f4'), ('T', '<u4')])
+binary_scale = dict(HDop=100, Lat=1e7, Lng=1e7, RelAlt=100, Alt=100, Spd=100, GCrs=100)
+
+def binary_messages(msgid, dtype, n):
+    messages = numpy.zeros(n, dtype=dtype)
+    messages['head1'], messages['head2'], messages['msgid'] = 0xa3, 0x95, msgid
+    return messages
+
+def write_binary_log(filename, x, y, z, home_lat=-35.363261, home_lon=149.165230, home_alt=584., rate_hz=5., seed=0):
+    '''write_log, as a binary dataflash log'''
+    g = gps_fields(x, y, z, home_lat, home_lon, home_alt, rate_hz, seed)
+    formats = [line.split(', ') for line in log_header.splitlines() if line.startswith('FMT')]
+    fmt = binary_messages(128, fmt_dtype, len(formats))
+    for (i, tokens) in enumerate(formats):
+        fmt[i]['Type'], fmt[i]['Length'] = int(tokens[1]), int(tokens[2])
+        fmt[i]['Name'], fmt[i]['Format'], fmt[i]['Columns'] = (t.encode('ascii') for t in tokens[3:6])
+    msg = binary_messages(132, msg_dtype, 1)
+    msg['Message'] = log_header.splitlines()[0].encode('ascii')
+    gps = binary_messages(130, gps_dtype, len(g['Lat']))
+    gps['Status'], gps['Week'] = 3, 1774
+    for (label, values) in g.items():
+        gps[label] = numpy.round(values * binary_scale.get(label, 1))
+    with open(filename, 'wb') as f:
+        for messages in (fmt, msg, gps):
+            f.write(messages.tobytes())
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic flight as a dataflash log')
+    parser.add_argument('logfile', type=str, help='path of the .log or .bin file to write')
+    parser.add_argument('-n', '--points', metavar='', type=int, default=10000, help='number of GPS samples')
+    parser.add_argument('--seed', metavar='', type=int, default=0, help='random seed')
+    parser.add_argument('--patterns', metavar='', type=str, default=','.join(patterns), help='comma separated patterns to choose from: ' + ', '.join(patterns))
+    parser.add_argument('--spacing', metavar='', type=float, default=1., help='meters between consecutive samples')
+    parser.add_argument('--noise', metavar='', type=float, default=0.3, help='standard deviation of the horizontal GPS noise, in meters')
+    parser.add_argument('-f', '--format', metavar='', type=str, choices=['bin','log'], default='log', help='log file format: \'bin\' or \'log\'')
+    args = parser.parse_args()
+
+    x, y, z = generate(args.points, args.seed, tuple(args.patterns.split(',')), args.spacing, args.noise)
+    (write_binary_log if args.format == 'bin' else write_log)(args.logfile, x, y, z, seed=args.seed)
+
+if __name__ == "__main__":
+    main()
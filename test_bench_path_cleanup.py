@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import random
+import unittest
+
+from bench_path_cleanup import MIN_SAMPLES, compare
+
+def timings(rng, n, scale=1.):
+    '''n samples around 'scale' seconds, with the jitter and the odd preempted run of a busy machine'''
+    return [scale * rng.uniform(0.97, 1.05) * (3. if rng.random() < 0.05 else 1.) for _ in range(n)]
+
+def quiet_compare(baseline, results):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) as err:
+        regressions = compare(baseline, results, 10., 0.05)
+    return regressions, err.getvalue()
+
+class TestCompare(unittest.TestCase):
+    def test_self_comparison(self):
+        rng = random.Random(0)
+        for repeat in (3, MIN_SAMPLES, 10):
+            baseline = {'kernel/{}'.format(i): timings(rng, repeat) for i in range(100)}
+            self.assertEqual([], quiet_compare(baseline, baseline)[0])
+            # a second run on the same machine is only noise too
+            results = {key: timings(rng, repeat) for key in baseline}
+            self.assertEqual([], quiet_compare(baseline, results)[0])
+
+    def test_regression(self):
+        rng = random.Random(2)
+        baseline = {'kernel': timings(rng, 10)}
+        regressions, err = quiet_compare(baseline, {'kernel': timings(rng, 10, scale=1.5)})
+        self.assertEqual(['kernel'], regressions)
+        self.assertEqual('', err)
+
+    def test_too_few_samples(self):
+        regressions, err = quiet_compare({'kernel': [1., 1., 1.]}, {'kernel': [2., 2., 2.]})
+        self.assertEqual([], regressions)
+        self.assertIn('warning', err)
+
+if __name__ == "__main__":
+    unittest.main()
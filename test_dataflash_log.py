@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import DataflashLog
+import synthetic_flight
+from positions import gps_to_ned, load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class TestDataflashLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.x, self.y, self.z = synthetic_flight.generate(3000, seed=2)
+        self.text = os.path.join(self.dir, 'flight.log')
+        self.binary = os.path.join(self.dir, 'flight.bin')
+        synthetic_flight.write_log(self.text, self.x, self.y, self.z)
+        synthetic_flight.write_binary_log(self.binary, self.x, self.y, self.z)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def compress(self, filename, kind):
+        compressed = filename + '.' + kind
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if kind == 'zst':
+            data = zstandard.ZstdCompressor().compress(data)
+        else:
+            data = {'gz': gzip, 'xz': lzma, 'bz2': bz2}[kind].compress(data)
+        with open(compressed, 'wb') as f:
+            f.write(data)
+        return compressed
+
+    def test_binary(self):
+        log = DataflashLog.DataflashLog(self.binary)
+        self.assertEqual(log.firmwareVersion, 'V3.1')
+        self.assertEqual(len(log.channels['GPS']['Lat'].listData), len(self.x))
+        x, y, z = gps_to_ned(log)
+        # lat/lon are stored in 1e-7 degrees and altitudes in cm
+        self.assertLess(numpy.abs(numpy.array(x) - self.x).max(), 0.02)
+        self.assertLess(numpy.abs(numpy.array(y) - self.y).max(), 0.02)
+        self.assertLess(numpy.abs(numpy.array(z) - self.z).max(), 0.01)
+
+    def test_binary_chunks(self):
+        # messages cut across chunk boundaries parse the same
+        def read(chunkSize):
+            log = DataflashLog.DataflashLog()
+            with open(self.binary, 'rb') as f:
+                for (i, e) in enumerate(log._read_binary(f, False, chunkSize)):
+                    log.process(i+1, e)
+                    yield (e.NAME, e.SIZE)
+        small = list(read(100))
+        self.assertEqual(small, list(read(1 << 24)))
+        self.assertEqual(sum(size for (_, size) in small), os.path.getsize(self.binary))
+
+    def test_corrupt_binary(self):
+        with open(self.binary, 'rb') as f:
+            data = bytearray(f.read())
+        rng = numpy.random.default_rng(1)
+        garbage = rng.integers(0, 256, 20000, dtype=numpy.uint8)
+        garbage[::1000], garbage[1::1000] = 0xa3, 0x95 # plenty of false headers
+        boundary = 4*89 + 67 + 1100*45 # between two GPS messages, after the FMT and MSG messages
+        data[boundary:boundary] = garbage.tobytes()
+        data[10003:10063] = bytes(60)
+        corrupt = os.path.join(self.dir, 'corrupt.bin')
+        with open(corrupt, 'wb') as f:
+            f.write(data)
+
+        with self.assertRaises(ValueError):
+            DataflashLog.DataflashLog(corrupt)
+        log = DataflashLog.DataflashLog(corrupt, ignoreBadlines=True)
+        self.assertEqual(len(log.corruptRanges), 2)
+        (a, b), (c, d) = log.corruptRanges
+        self.assertTrue(a <= 10063 <= b < 10063 + 45)
+        self.assertEqual((c, d), (boundary, boundary + len(garbage)))
+        # only the messages that overlap the damage are lost
+        self.assertGreaterEqual(len(log.channels['GPS']['Lat'].listData), len(self.x) - 3)
+
+    def test_compressed(self):
+        kinds = ['gz', 'xz', 'bz2'] + (['zst'] if zstandard is not None else [])
+        for logfile in (self.text, self.binary):
+            expected = gps_to_ned(DataflashLog.DataflashLog(logfile))
+            for kind in kinds:
+                compressed = self.compress(logfile, kind)
+                self.assertIsNotNone(DataflashLog.compression(compressed))
+                self.assertEqual(gps_to_ned(DataflashLog.DataflashLog(compressed)), expected)
+        self.assertIsNone(DataflashLog.compression(self.text))
+
+    def test_compressed_cache(self):
+        compressed = self.compress(self.binary, 'gz')
+        cache_dir = os.path.join(self.dir, 'cache')
+        first = load_ned(compressed, cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1) # only the parsed positions, the log is never unpacked to disk
+        second = load_ned(compressed, cache_dir=cache_dir)
+        for (a, b) in zip(first, second):
+            self.assertTrue(numpy.array_equal(a, b))
+
+    def test_cache_keeps_options_apart(self):
+        with open(self.text) as f:
+            lines = f.readlines()
+        lines.insert(len(lines) // 2, 'GARBAGE LINE\n')
+        with open(self.text, 'w') as f:
+            f.writelines(lines)
+        cache_dir = os.path.join(self.dir, 'cache')
+        skipped = load_ned(self.text, cache_dir=cache_dir, ignoreBadlines=True)
+        self.assertEqual(len(skipped[0]), len(self.x))
+        # a strict read must not get the lenient read's result from the cache
+        self.assertRaises(Exception, load_ned, self.text, cache_dir=cache_dir)
+        self.assertRaises(Exception, load_ned, self.text, cache_dir=cache_dir, format='bin')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import numpy
+
+import synthetic_flight
+from embedded_path import EmbeddedPath, footprint, max_points_for_budget, required_rdp_stack_len
+from path_cleanup import Path, PathConfig
+from positions import load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class TestEmbeddedPath(unittest.TestCase):
+    def test_footprint(self):
+        size = footprint(100)
+        self.assertEqual(size['path'], 1200) # Vector3f
+        self.assertEqual(size['rdp_stack'], 200) # MAX_PATH_LEN uint8 pairs, like the C++ declares it
+        self.assertEqual(size['rdp_bitmask'], 16) # four uint32 words
+        self.assertEqual(size['total'], 1200 + 200 + 16 + 8)
+        self.assertEqual(footprint(100, word_size=8)['rdp_bitmask'], 16)
+        self.assertEqual(footprint(64, word_size=8)['rdp_bitmask'], 8)
+        self.assertEqual(footprint(65, word_size=4)['rdp_bitmask'], 12)
+        # the loop buffer only exists in the emulation
+        size = EmbeddedPath((0., 0., 0.)).footprint()
+        self.assertEqual(size['loops'], 1600)
+        self.assertEqual(size['total'], 1200 + 200 + 16 + 8)
+
+    def test_budget(self):
+        self.assertEqual(required_rdp_stack_len(100), 63)
+        n = max_points_for_budget(2048)
+        self.assertEqual(n, 144)
+        self.assertLessEqual(footprint(n)['total'], 2048)
+        self.assertGreater(footprint(n+1)['total'], 2048)
+        self.assertRaises(ValueError, EmbeddedPath, (0., 0., 0.), PathConfig(max_path_len=300))
+
+    def test_matches_path(self):
+        # logs that the float64 Path can clean up without running out of memory
+        for (log, max_path_len) in (('2015-10-11 20-17-22.log', 50), ('randyBachtell_AC35.log', 60), ('robert_lefebvre_octo_PM.log', 40)):
+            points = list(zip(*(a.tolist() for a in load_ned(os.path.join(here, 'logs', log)))))
+            config = PathConfig(max_path_len=max_path_len)
+            embedded = EmbeddedPath(points[0], config)
+            reference = Path([points[0]], config=config)
+            for p in points[1:]:
+                embedded.append_if_far_enough(p)
+                embedded.routine_cleanup()
+                reference.append_if_far_enough(p)
+                reference.routine_cleanup()
+            self.assertEqual(embedded.worst_length, reference.worst_length)
+            self.assertEqual(len(embedded.path), len(reference.path))
+            numpy.testing.assert_allclose(embedded.path, reference.path, atol=1e-3)
+            self.assertEqual(embedded.path_overflows, 0)
+            self.assertEqual(embedded.rdp_overflows, 0)
+
+    def test_rdp_stack_overflow(self):
+        x, y, z = synthetic_flight.generate(2000, seed=2)
+        points = list(zip(x.tolist(), y.tolist(), z.tolist()))
+        embedded = EmbeddedPath(points[0], rdp_stack_len=2)
+        for p in points[1:]:
+            embedded.append_if_far_enough(p)
+            embedded.routine_cleanup()
+        self.assertGreater(embedded.rdp_overflows, 0)
+        self.assertGreater(embedded.max_rdp_depth, 2)
+
+if __name__ == '__main__':
+    unittest.main()
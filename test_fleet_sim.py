@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+import unittest
+
+import fleet_sim
+from path_cleanup import Path
+from positions import load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+logs = [os.path.join(here, 'logs', name) for name in ('robert_lefebvre_octo_PM.log', '2015-10-11 20-17-22.log')]
+
+class TestFleetSim(unittest.TestCase):
+    def test_shard(self):
+        specs = fleet_sim.fleet_specs(10, seed=3)
+        shards = fleet_sim.shard(specs, 4)
+        self.assertEqual(sorted(s for shard in shards for s in shard), sorted(specs))
+        self.assertEqual([len(s) for s in shards], [3, 3, 2, 2])
+        self.assertEqual(len(fleet_sim.shard(specs[:2], 4)), 2)
+
+    def test_fleet(self):
+        # the fleet's numbers add up to independent headless runs of every vehicle
+        worst, appends = 0, 0
+        for log in logs:
+            points = list(zip(*(a.tolist() for a in load_ned(log))))
+            path = Path([points[0]])
+            for p in points[1:]:
+                path.append_if_far_enough(p)
+                path.routine_cleanup()
+            worst = max(worst, path.worst_length)
+            appends += 3 * (len(points) - 1)
+        specs = fleet_sim.fleet_specs(6, logs)
+        serial = fleet_sim.simulate_fleet(specs, 100000, {}, jobs=1)
+        with multiprocessing.Pool(2) as pool:
+            parallel = fleet_sim.simulate_fleet(specs, 100000, {}, jobs=2, pool=pool)
+        for r in (serial, parallel):
+            self.assertEqual(r['failed'], 0)
+            self.assertEqual(r['appends'], appends)
+            self.assertEqual(r['worst_length'], worst)
+        self.assertEqual(parallel['jobs'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy
+
+from gps_filter import GPSFilter
+from positions import NEDConverter
+
+class TestGPSFilter(unittest.TestCase):
+    def setUp(self):
+        # a figure eight at about 5m/s, sampled at 5Hz, as lat/lon around a home
+        self.t = numpy.arange(2000) * 0.2
+        rng = numpy.random.default_rng(4)
+        x = 50. * numpy.sin(0.1 * self.t) + rng.normal(0., 0.1, len(self.t))
+        y = 25. * numpy.sin(0.2 * self.t) + rng.normal(0., 0.1, len(self.t))
+        z = 20. + 5. * numpy.sin(0.05 * self.t) + rng.normal(0., 0.15, len(self.t))
+        self.lat, self.lon = NEDConverter(-35.36, 149.16, z[0]).invert_arrays(x, y, z)
+        self.alt = z
+        self.status = numpy.full(len(x), 3)
+        self.nsats = numpy.full(len(x), 10)
+        self.hdop = numpy.full(len(x), 1.)
+
+    def test_clean_flight(self):
+        f = GPSFilter()
+        north, east, alt, index = f.filter_arrays(self.t, self.lat, self.lon, self.alt, self.status, self.nsats, self.hdop)
+        self.assertEqual(len(index), len(self.t))
+        self.assertEqual(sum(f.dropped.values()), 0)
+
+    def test_bad_samples(self):
+        self.status[[5, 6]] = 1
+        self.nsats[100] = 4
+        self.hdop[[200, 201, 202]] = 9.
+        self.lat[[500, 1200]] += 0.001 # ~110m jumps
+        self.alt[[800, 801]] += 25. # a two sample altitude glitch
+        f = GPSFilter()
+        north, east, alt, index = f.filter_arrays(self.t, self.lat, self.lon, self.alt, self.status, self.nsats, self.hdop)
+        self.assertEqual(f.dropped, dict(status=2, nsats=1, hdop=3, jump=4))
+        self.assertEqual(sorted(set(range(len(self.t))) - set(index.tolist())), [5, 6, 100, 200, 201, 202, 500, 800, 801, 1200])
+        self.assertEqual(len(north), len(index))
+
+    def test_disabled_checks(self):
+        self.hdop[:] = 9.
+        f = GPSFilter(max_hdop=None)
+        north, east, alt, index = f.filter_arrays(None, self.lat, self.lon, self.alt, self.status, None, self.hdop)
+        self.assertEqual(len(index), len(self.t))
+
+if __name__ == '__main__':
+    unittest.main()
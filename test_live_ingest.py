@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import unittest
+
+import live_ingest
+from path_cleanup import Path
+from positions import NEDConverter
+
+here = os.path.dirname(os.path.abspath(__file__))
+logfile = os.path.join(here, 'logs', 'robert_lefebvre_octo_PM.log')
+
+class TestLiveIngest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.positions = live_ingest.log_positions(logfile)
+
+    def test_tcp_matches_headless(self):
+        report = asyncio.run(live_ingest.bench(self.positions, [1000.], 'tcp', tick_hz=50.))[0]
+        t, lat, lon, alt = self.positions
+        self.assertEqual(report['sent'], len(t))
+        self.assertEqual(report['processed'], len(t))
+        self.assertEqual(report['lost'], 0)
+
+        # the same positions, as sent, through a headless Path
+        converter = NEDConverter(lat[0], lon[0], alt[0])
+        points = [converter.convert(*(float(v) for v in live_ingest.format_position(0, 0., *p).split()[3:]))
+                  for p in zip(lat, lon, alt)]
+        path = Path([points[0]])
+        for p in points[1:]:
+            path.append_if_far_enough(p)
+            path.routine_cleanup()
+        self.assertEqual(report['worst_length'], path.worst_length)
+        self.assertEqual(report['path_len'], len(path.path))
+
+    def test_udp_flyback(self):
+        async def run():
+            ingest = live_ingest.LiveIngest()
+            server, ticks = await live_ingest.serve(ingest, port=0, tick_hz=50.)
+            port = live_ingest.bound_port(server)
+            sent = await live_ingest.replay(self.positions, port=port, speed=1000.)
+            await asyncio.sleep(0.1)
+
+            loop = asyncio.get_running_loop()
+            answer = loop.create_future()
+            class Client(asyncio.DatagramProtocol):
+                def datagram_received(self, data, addr):
+                    answer.set_result(data)
+            transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=('127.0.0.1', port))
+            transport.sendto(b'FLYBACK\n')
+            flyback = json.loads(await asyncio.wait_for(answer, 2.))
+            transport.close()
+            ticks.cancel()
+            server.close()
+            return ingest, sent, flyback
+
+        ingest, sent, flyback = asyncio.run(run())
+        self.assertGreater(ingest.received, 0.9 * sent) # localhost hardly drops datagrams, but UDP may
+        self.assertEqual(flyback['home'], list(ingest.home))
+        self.assertEqual(flyback['path'], [list(p) for p in ingest.path.get_flyback_path()])
+        self.assertGreater(len(flyback['path']), 1)
+
+    def test_bad_lines(self):
+        async def run():
+            ingest = live_ingest.LiveIngest()
+            server, ticks = await live_ingest.serve(ingest, port=0, protocol='tcp', tick_hz=50.)
+            reader, writer = await asyncio.open_connection('127.0.0.1', live_ingest.bound_port(server))
+            writer.write(live_ingest.format_position(0, 0., 50., 8., 100.))
+            writer.write(b'POS 1 1.0 nan? 2 3\nPOS 1 1.0 nan 2 3\nPOS x 1.0 1 2 3\nPOS 1 2\nHELLO\nFLYBACK\n')
+            await writer.drain()
+            answer = await asyncio.wait_for(reader.readline(), 2.)
+            writer.close()
+            ticks.cancel()
+            server.close()
+            return ingest, answer
+
+        ingest, answer = asyncio.run(run())
+        self.assertEqual(ingest.received, 1)
+        self.assertEqual(json.loads(answer)['home'], [50., 8., 100.])
+
+    def test_latency_window(self):
+        ingest = live_ingest.LiveIngest(latency_window=5)
+        for seq in range(20):
+            ingest.receive(live_ingest.format_position(seq, 0., 50., 8., 100.))
+        ingest.tick()
+        self.assertEqual(ingest.processed, 20)
+        self.assertEqual(len(ingest.receive_latency), 5)
+        self.assertEqual(len(ingest.latency), 5)
+
+    def test_reordered(self):
+        ingest = live_ingest.LiveIngest()
+        for seq in (0, 2, 3, 1, 6):
+            ingest.receive(live_ingest.format_position(seq, 0., 50., 8., 100.))
+        self.assertEqual(ingest.received, 5)
+        self.assertEqual(ingest.lost, 2) # 4 and 5, 1 only came late
+
+if __name__ == '__main__':
+    unittest.main()
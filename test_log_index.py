@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import DataflashLog
+import log_index
+import synthetic_flight
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class TestLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.dir, 'flight.log')
+        shutil.copy(os.path.join(here, 'logs', 'randyBachtell_AC35.log'), self.logfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_line_window(self):
+        full = DataflashLog.DataflashLog(self.logfile)
+        window = log_index.read_window(self.logfile, first_line=10000, last_line=12000)
+        self.assertEqual(window.vehicleType, full.vehicleType)
+        self.assertEqual(window.parameters, full.parameters)
+        for name in ('GPS', 'ATT', 'NKF1'):
+            for (label, data) in full.channels[name].items():
+                expected = {k: v for (k, v) in data.dictData.items() if 10000 <= k <= 12000}
+                self.assertEqual(window.channels[name][label].dictData, expected)
+
+    def test_time_window(self):
+        full = DataflashLog.DataflashLog(self.logfile)
+        window = log_index.read_window(self.logfile, 30, 60)
+        t0 = full.channels['GPS']['TimeUS'].listData[0][1]
+        t = [(v - t0) / 1e6 for v in window.channels['GPS']['TimeUS'].dictData.values()]
+        self.assertLessEqual(t[0], 30.)
+        self.assertGreaterEqual(t[-1], 60.)
+        self.assertLess(len(t), len(full.channels['GPS']['TimeUS'].listData) / 2)
+
+    def test_reuse(self):
+        index = log_index.load_index(self.logfile)
+        self.assertTrue(os.path.exists(self.logfile + '.index.json'))
+        self.assertEqual(log_index.load_index(self.logfile).to_dict(), index.to_dict())
+        with open(self.logfile, 'a') as f: # a changed log is indexed again
+            f.write('MSG, 0, changed\n')
+        self.assertEqual(log_index.load_index(self.logfile).lines, index.lines + 1)
+
+    def test_header_line_numbers(self):
+        window = log_index.read_window(self.logfile, first_line=10000, last_line=12000)
+        self.assertEqual(window.lineCount, len(log_index.load_index(self.logfile).header) + 2001)
+        with open(self.logfile) as f:
+            lines = f.readlines()
+        lines[225] = 'PARM, 86737897, CAM_TRIGG_DIST\n' # line 226, in the header
+        with open(self.logfile, 'w') as f:
+            f.writelines(lines)
+        with self.assertRaisesRegex(Exception, 'line 226 '):
+            log_index.read_window(self.logfile, first_line=10000, last_line=12000)
+
+    def test_empty_windows(self):
+        for (start, end) in ((1e6, None), (None, -1.)):
+            window = log_index.read_window(self.logfile, start, end)
+            self.assertNotIn('GPS', window.channels)
+            self.assertEqual(window.vehicleType, DataflashLog.VehicleType.Copter)
+        # no time type
+        index = log_index.load_index(self.logfile)
+        self.assertRaises(ValueError, index.lines_for_time, 10., 20., 'XKF1')
+
+    def test_binary_refused(self):
+        binary = os.path.join(self.dir, 'flight.bin')
+        x, y, z = synthetic_flight.generate(100)
+        synthetic_flight.write_binary_log(binary, x, y, z)
+        self.assertRaisesRegex(Exception, 'binary', log_index.build_index, binary)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import synthetic_flight
+from log_stream import GPSStream
+from positions import load_ned
+
+class TestLogStream(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.logfile = os.path.join(self.dir, 'flight.log')
+        x, y, z = synthetic_flight.generate(1500, seed=3)
+        synthetic_flight.write_log(self.logfile, x, y, z)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def stream_all(self, **kwargs):
+        stream = GPSStream(self.logfile, **kwargs)
+        samples = []
+        while True:
+            sample = stream.get(block=True)
+            if sample is None:
+                break
+            samples.append(sample)
+        self.assertTrue(stream.finished)
+        self.assertIsNone(stream.error)
+        return samples
+
+    def test_matches_load_ned(self):
+        samples = self.stream_all(depth=4) # a small queue, so the parser keeps waiting for the consumer
+        x, y, z = load_ned(self.logfile, cache_dir=None)
+        self.assertEqual(len(samples), len(x))
+        numpy.testing.assert_allclose(numpy.array(samples), numpy.column_stack((x, y, z)), atol=1e-9)
+        self.assertEqual(samples[0], (0., 0., 0.))
+
+    def test_missing_file(self):
+        stream = GPSStream(os.path.join(self.dir, 'missing.log'))
+        self.assertIsNone(stream.get(block=True))
+        self.assertTrue(stream.finished)
+        self.assertIsNotNone(stream.error)
+
+if __name__ == "__main__":
+    unittest.main()
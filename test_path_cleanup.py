@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+import itertools
+import math
+import unittest
+from math import sqrt
+
+import path_cleanup
+from path_cleanup import CleanupStats, Path, PathConfig, VoxelIndex, plan_pruning, point_line_dist, rdp, rdp_iter, segment_segment_dist
+
+class TestLineCalculations(unittest.TestCase):
+    def test_perpendicular(self):
+        p1 = (0,0,0)
+        p2 = (1,0,0)
+        p3 = (0,0,1)
+        p4 = (0,1,1)
+        self.assertEqual((1,(0,0,0.5)), segment_segment_dist(p1,p2,p3,p4))
+
+    def test_parallel(self):
+        p1 = (0,0,0)
+        p2 = (1,1,0)
+        p3 = (0,0,1)
+        p4 = (1,1,1)
+        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p3,p4))
+
+    def test_intersecting(self):
+        p1 = (0,0,0)
+        p2 = (1,0,0)
+        p3 = (0,0,0)
+        p4 = (0,1,0)
+        self.assertEqual((0,(0,0,0)), segment_segment_dist(p1,p2,p3,p4))
+
+    def test_identical(self):
+        p1 = (0,0,0)
+        p2 = (1,1,0)
+        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p1,p2))
+        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p2,p1))
+
+    def test_parallel_but_spaced_out(self):
+        p1 = (0,0,0)
+        p2 = (1,0,0)
+        p3 = (3,0,0)
+        p4 = (4,0,0)
+        self.assertEqual((float('inf'), ([0, 0], [0, 0])), segment_segment_dist(p1,p2,p3,p4))
+
+    def test_perpendicular_but_spaced_out(self):
+        p1 = (-2,0,0)
+        p2 = (2,0,0)
+        p3 = (0,1,1)
+        p4 = (0,2,2)
+        self.assertEqual((sqrt(2), (0,0.5,0.5)), segment_segment_dist(p1,p2,p3,p4))
+
+    def test_line_point(self):
+        p = (0,0,1)
+        l = ((1,1,0),(-1,-1,0))
+        self.assertAlmostEqual(1., point_line_dist(p,l))
+
+    def test_line_point2(self):
+        p = (-3,9,7)
+        l = ((0,9,2),(5,9,8))
+        self.assertAlmostEqual(5.5056, point_line_dist(p,l), delta=0.001)
+
+    def test_recursive_rdp(self):
+        inp = [(0,0,0), (1,4,6), (4,2,1), (4,2,2), (4,3,3), (5,3,3), (6,6,9)]
+        out = [(0, 0, 0), (1, 4, 6), (4, 2, 1), (6, 6, 9)]
+        self.assertEqual(out, rdp(inp, 1))
+
+    def test_iterative_rdp(self):
+        inp = [(0,0,0), (1,4,6), (4,2,1), (4,2,2), (4,3,3), (5,3,3), (6,6,9)]
+        out = [(0, 0, 0), (1, 4, 6), (4, 2, 1), (6, 6, 9)]
+        path_cleanup.stk, path_cleanup.bitmask = None, None
+        while not rdp_iter(inp, 1, 0.5):
+            pass
+        self.assertEqual(out, list(itertools.compress(inp, path_cleanup.bitmask)))
+
+class TestCleanupStats(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(Path([(0,0,0)]).stats)
+
+    def test_percentiles_and_histogram(self):
+        stats = CleanupStats()
+        for ms in range(1, 101):
+            stats.record('rdp', ms / 1000.)
+        stats.free('rdp', 12)
+        rdp = stats.to_dict()['rdp']
+        self.assertEqual(100, rdp['calls'])
+        self.assertAlmostEqual(51., rdp['p50_ms'])
+        self.assertAlmostEqual(100., rdp['p99_ms'])
+        self.assertAlmostEqual(100., rdp['max_ms'])
+        self.assertEqual(12, rdp['points_freed'])
+        self.assertEqual(100, sum(rdp['histogram_us'].values()))
+
+    def test_flyback_is_recorded(self):
+        path = Path([(0,0,0), (5,0,0), (10,0,0)], profile=True)
+        path.get_flyback_path()
+        self.assertEqual(1, path.stats.to_dict()['flyback']['calls'])
+
+class TestPathConfig(unittest.TestCase):
+    def test_defaults_follow_module(self):
+        config = PathConfig()
+        self.assertEqual(path_cleanup.position_delta, config.position_delta)
+        self.assertEqual(path_cleanup.max_path_len, config.max_path_len)
+
+    def test_deltas_scale_with_position_delta(self):
+        config = PathConfig(position_delta=4.)
+        self.assertAlmostEqual(6., config.pruning_delta)
+        self.assertAlmostEqual(2., config.rdp_epsilon)
+        self.assertAlmostEqual(1., PathConfig(position_delta=4., rdp_epsilon=1.).rdp_epsilon)
+
+    def test_position_delta_is_used(self):
+        path = Path([(0,0,0)], config=PathConfig(position_delta=5.))
+        path.append_if_far_enough((3,0,0))
+        path.append_if_far_enough((5,0,0))
+        self.assertEqual([(0,0,0), (5,0,0)], path.path)
+
+class TestPlanPruning(unittest.TestCase):
+    line = [(float(i), 0., 0.) for i in range(20)]
+
+    def test_biggest_first_without_overlaps(self):
+        loops = [(2, 5, None), (4, 12, None), (6, 9, None), (13, 15, None)]
+        self.assertEqual(([(4, 12, None), (13, 15, None)], 10, 10), plan_pruning(self.line, loops, 10))
+        # enough after the first loop, but the other non-overlapping loops could free more
+        self.assertEqual(([(4, 12, None)], 8, 10), plan_pruning(self.line, loops, 5))
+
+    def test_ties_go_to_the_oldest(self):
+        loops = [(7, 10, None), (2, 5, None)]
+        self.assertEqual(([(2, 5, None)], 3, 6), plan_pruning(self.line, loops, 3))
+
+    def test_shared_ends_overlap(self):
+        # the second loop would remove point 5, which the first one keeps
+        loops = [(2, 5, None), (5, 8, None)]
+        self.assertEqual(([(2, 5, None)], 3, 3), plan_pruning(self.line, loops, 10))
+
+    def test_runs_out_of_loops(self):
+        # a zigzag that can't be simplified, with a single small loop at its end
+        points = [(2.*i, 3.*(i%2), 0.) for i in range(86)]
+        points += [(170., 10., 0.), (167., 10., 0.), (167., 6., 0.), (167., 6., 10.)]
+        path = Path(points, profile=True, config=PathConfig(max_path_len=100))
+        path.routine_cleanup()
+        self.assertEqual(points[:86] + points[89:], path.path)
+        self.assertEqual(3, path.stats.freed['detect_loops'])
+        self.assertEqual(3, path.stats.possible['detect_loops'])
+
+class TestEarlyPruning(unittest.TestCase):
+    def test_voxel_index(self):
+        path = [(i * 0.7, (i % 5) * 1.3, 0.) for i in range(60)]
+        index = VoxelIndex(3.)
+        for p in path:
+            index.append(p)
+        index.truncate(40)
+        for p in [(1., 1., 0.), (20., 2., 0.), (100., 0., 0.)]:
+            for before in (10, 40):
+                near = [i for i in range(before) if sum((a-b)**2 for (a, b) in zip(path[i], p)) <= 9.]
+                self.assertEqual(near[0] if near else None, index.oldest_near(path, p, 3., before))
+
+    def test_splice(self):
+        # out 10m and back: the return leg splices the loop out as soon as it is within pruning_delta of the way out
+        config = PathConfig(early_pruning=True)
+        path = Path([(0.,0.,0.)], config=config)
+        for x in range(0, 21, 2):
+            path.append_if_far_enough((float(x), 0., 0.))
+        for x in range(20, -1, -2):
+            path.append_if_far_enough((float(x), 2., 0.))
+        # the last two points stay, a loop needs at least 2 points in between
+        self.assertEqual([(0.,0.,0.), (2.,2.,0.), (0.,2.,0.)], path.path)
+        self.assertEqual(12, path.worst_length)
+        self.assertEqual(path.index.keys, [path.index.key(p) for p in path.path])
+
+    def test_splice_after_cleanup(self):
+        # cleanups replace the path list, the index has to follow
+        config = PathConfig(early_pruning=True, max_path_len=30)
+        path = Path([(0.,0.,0.)], config=config)
+        for i in range(80): # most of a circle of 30m radius, 2.1m per step
+            a = 2.1 * i / 30.
+            path.append_if_far_enough((30. * (math.cos(a) - 1.), 30. * math.sin(a), 0.))
+            path.routine_cleanup()
+            path.sync_index()
+            self.assertEqual(path.index.keys, [path.index.key(p) for p in path.path])
+        self.assertLess(len(path.path), 30)
+        self.assertGreater(len(path.path), 2)
+        # closing the circle splices out everything in between
+        path.append_if_far_enough((0., 1., 0.))
+        self.assertEqual([(0.,0.,0.), (0.,1.,0.)], path.path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import path_cleanup_jit
+from path_cleanup import Path, PathConfig
+from path_cleanup_jit import JitPath
+from positions import load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+logs = sorted(f for f in os.listdir(os.path.join(here, 'logs')) if f.endswith('.log'))
+
+def log_points(log):
+    return list(zip(*(a.tolist() for a in load_ned(os.path.join(here, 'logs', log)))))
+
+'''
+    Runs the compiled backend against path_cleanup.py on the bundled logs. Without Numba, this checks the same
+    kernels interpreted.
+'''
+class TestJitBackend(unittest.TestCase):
+    def test_kernels(self):
+        for log in logs:
+            points = log_points(log)
+            stored = Path([points[0]])
+            for p in points[1:]:
+                stored.append_if_far_enough(p)
+            for config in (PathConfig(), PathConfig(pruning_delta=10., rdp_epsilon=0.2)):
+                python, jit = Path(list(stored.path), config=config), JitPath(list(stored.path), config=config)
+                self.assertEqual(jit.find_loops(jit.path), python.find_loops(python.path), log)
+                self.assertEqual(jit.simplification_bitmask(jit.path), python.simplification_bitmask(python.path), log)
+                self.assertEqual(jit.get_flyback_path(), python.get_flyback_path(), log)
+
+    def test_cleanup(self):
+        # settings under which the bundled logs need cleanups, without the pure Python Path running out of memory
+        for (log, max_path_len) in (('2015-10-11 20-17-22.log', 50), ('randyBachtell_AC35.log', 60), ('robert_lefebvre_octo_PM.log', 40)):
+            points = log_points(log)
+            config = PathConfig(max_path_len=max_path_len)
+            python, jit = Path([points[0]], config=config), JitPath([points[0]], config=config)
+            for p in points[1:]:
+                for path in (python, jit):
+                    path.append_if_far_enough(p)
+                    path.routine_cleanup()
+                self.assertEqual(jit.path, python.path, log)
+            self.assertEqual(jit.worst_length, python.worst_length)
+
+    def test_new_path(self):
+        path = path_cleanup_jit.new_path([(0., 0., 0.)])
+        self.assertIs(type(path), JitPath if path_cleanup_jit.available else Path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy
+
+from path_metrics import brute_force_nearest, corridor_deviation, discrete_frechet, grid_nearest, hausdorff
+
+def frechet_table(a, b):
+    '''the textbook dynamic program, to check the vectorized one against'''
+    d = numpy.sqrt(((a[:, None] - b[None])**2).sum(axis=2))
+    ca = numpy.zeros(d.shape)
+    for i in range(len(a)):
+        for j in range(len(b)):
+            if i == 0 and j == 0:
+                ca[i, j] = d[0, 0]
+            elif i == 0:
+                ca[i, j] = max(ca[i, j-1], d[i, j])
+            elif j == 0:
+                ca[i, j] = max(ca[i-1, j], d[i, j])
+            else:
+                ca[i, j] = max(min(ca[i-1, j], ca[i-1, j-1], ca[i, j-1]), d[i, j])
+    return ca[-1, -1]
+
+class TestPathMetrics(unittest.TestCase):
+    def test_frechet_matches_dynamic_program(self):
+        rng = numpy.random.default_rng(0)
+        for _ in range(100):
+            n, m = rng.integers(1, 25, 2)
+            a = rng.normal(size=(n, 3)).cumsum(axis=0)
+            b = rng.normal(size=(m, 3)).cumsum(axis=0)
+            self.assertAlmostEqual(frechet_table(a, b), discrete_frechet(a, b))
+
+    def test_frechet_cares_about_order(self):
+        a = [(0,0,0), (1,0,0), (2,0,0)]
+        self.assertAlmostEqual(0., discrete_frechet(a, a))
+        self.assertAlmostEqual(2., discrete_frechet(a, a[::-1]))
+        self.assertAlmostEqual(0., hausdorff(a, a[::-1]))
+
+    def test_corridor_deviation_samples_segments(self):
+        flown = [(0,0,0), (0,10,0), (10,10,0), (10,0,0)]
+        # the shortcut from the first to the last point passes 5m from the nearest flown corner
+        self.assertAlmostEqual(5., corridor_deviation(flown, [flown[0], flown[-1]]))
+
+    def test_grid_matches_brute_force(self):
+        rng = numpy.random.default_rng(1)
+        points = rng.normal(size=(2000, 3)).cumsum(axis=0)
+        queries = points[rng.integers(0, 2000, 500)] + rng.normal(0, 5, (500, 3))
+        numpy.testing.assert_allclose(brute_force_nearest(queries, points), grid_nearest(queries, points, 1.))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import path_cleanup
+import path_snapshot
+import synthetic_flight
+from path_cleanup import Path, PathConfig, rdp_iter
+
+class TestPathSnapshot(unittest.TestCase):
+    def full_path(self):
+        x, y, z = synthetic_flight.generate(400, seed=3)
+        path = Path([(x[0], y[0], z[0])], config=PathConfig(position_delta=1.5, max_path_len=1000))
+        for p in zip(x.tolist(), y.tolist(), z.tolist()):
+            path.append_if_far_enough(p)
+        return path
+
+    def test_round_trip(self):
+        path = self.full_path()
+        data = path.snapshot()
+        self.assertEqual(len(data), path_snapshot.header_size + 24*len(path.path))
+        restored = Path.restore(data)
+        self.assertEqual(restored.path, path.path)
+        self.assertEqual(restored.worst_length, path.worst_length)
+        self.assertEqual(restored.config.to_dict(), path.config.to_dict())
+        self.assertEqual(restored.snapshot(), data)
+        path.config.early_pruning = True
+        self.assertTrue(Path.restore(path.snapshot()).config.early_pruning)
+
+    def test_cleanup_state(self):
+        # stop rdp_iter half way, and check that a restored snapshot finishes with the same bitmask
+        path = self.full_path()
+        path_cleanup.stk, path_cleanup.bitmask = None, None
+        rdp_iter(path.path, 0.5, 0.)
+        path_cleanup.detected_loops = [(3, 9, (1., 2., 3.))]
+        data = path.snapshot(cleanup_state=True)
+        while not rdp_iter(path.path, 0.5, float("inf")):
+            pass
+        expected = path_cleanup.bitmask
+
+        path_cleanup.stk, path_cleanup.bitmask, path_cleanup.detected_loops = None, None, []
+        restored = Path.restore(data)
+        self.assertEqual(restored.snapshot(cleanup_state=True), data)
+        self.assertEqual(path_cleanup.detected_loops, [(3, 9, (1., 2., 3.))])
+        while not rdp_iter(restored.path, 0.5, float("inf")):
+            pass
+        self.assertEqual(path_cleanup.bitmask, expected)
+
+    def test_map_points(self):
+        path = self.full_path()
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'path.srtl')
+            path_snapshot.save(path, filename)
+            points = path_snapshot.map_points(filename)
+            self.assertEqual([tuple(p) for p in points.tolist()], path.path)
+            del points
+            self.assertEqual(path_snapshot.load(filename).path, path.path)
+        self.assertRaises(Exception, Path.restore, b'not a snapshot')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+from path_cleanup import Path, PathConfig
+from path_trace import APPEND, CLEANUP, FLYBACK, Trace, TraceRecorder, record, replay
+from positions import load_ned
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class TestPathTrace(unittest.TestCase):
+    def test_record_replay(self):
+        points = list(zip(*(a.tolist() for a in load_ned(os.path.join(here, 'logs', 'robert_lefebvre_octo_PM.log')))))
+        config = PathConfig(max_path_len=40)
+        trace = record(points, config, flyback_every=50)
+        self.assertEqual(trace.ops.count(APPEND), len(points)-1)
+        self.assertEqual(trace.ops.count(CLEANUP), len(points)-1)
+        self.assertEqual(trace.ops.count(FLYBACK), (len(points)-1) // 50)
+
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'trace.npz')
+            trace.save(filename)
+            loaded = Trace.load(filename)
+        self.assertEqual(loaded.ops, trace.ops)
+        self.assertEqual(loaded.points, trace.points)
+        self.assertEqual(loaded.config.to_dict(), config.to_dict())
+
+        # replaying gives the same Path as running the simulation directly
+        reference = Path([points[0]], config=config)
+        for p in points[1:]:
+            reference.append_if_far_enough(p)
+            reference.routine_cleanup()
+        result = replay(loaded)
+        self.assertEqual(result['appends'], len(points)-1)
+        self.assertEqual(result['worst_length'], reference.worst_length)
+        self.assertGreater(result['cleanups'], 0)
+
+    def test_recorder_passes_through(self):
+        recorder = TraceRecorder(Path([(0., 0., 0.)]))
+        recorder.append_if_far_enough((5., 0., 0.))
+        self.assertEqual(recorder.path, [(0., 0., 0.), (5., 0., 0.)])
+        recorder.worst_length = 7
+        self.assertEqual(recorder._path.worst_length, 7)
+        self.assertEqual(recorder.trace.points, [(5., 0., 0.)])
+
+if __name__ == '__main__':
+    unittest.main()
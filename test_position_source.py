@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import numpy
+
+import DataflashLog
+import synthetic_flight
+from path_cleanup import Path
+from position_source import decimate, pick_source, sources
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+class TestPositionSource(unittest.TestCase):
+    def test_sources(self):
+        log = DataflashLog.DataflashLog(os.path.join(here, 'logs', '2015-10-11 20-17-22.log'))
+        self.assertEqual(pick_source(log).name, 'EKF1')
+        self.assertIsNone(pick_source(log, 'XKF1'))
+        gps, pos, ekf = (sources[name].positions(log) for name in ('GPS', 'POS', 'EKF1'))
+        self.assertGreater(len(pos[0]), 1.5 * len(gps[0]))
+        for (t, x, y, z) in (gps, pos, ekf):
+            self.assertTrue(numpy.all(numpy.diff(t) > 0))
+            self.assertEqual((x[0], y[0]), (0., 0.))
+        # the estimator and the GPS agree on where the vehicle went, to within GPS accuracy
+        end = numpy.searchsorted(pos[0], gps[0][-1])
+        self.assertLess(abs(pos[1][end-1] - gps[1][-1]), 5.)
+        self.assertLess(abs(pos[2][end-1] - gps[2][-1]), 5.)
+
+    def test_ekf_cores(self):
+        # XKF1 from two EKF3 cores, interleaved: core 1 sits 3m north east of core 0
+        xkf1 = {}
+        for label in ("TimeUS", "C", "PN", "PE", "PD"):
+            xkf1[label] = DataflashLog.Channel()
+        for i in range(20):
+            core = i % 2
+            line = 10 + i
+            for (label, value) in (("TimeUS", 100000 * (i // 2)), ("C", core), ("PN", 5. + i // 2 + 3 * core), ("PE", 3. * core), ("PD", -10.)):
+                xkf1[label].dictData[line] = value
+        log = DataflashLog.DataflashLog()
+        log.channels["XKF1"] = xkf1
+        t, x, y, z = pick_source(log, 'XKF1').positions(log)
+        numpy.testing.assert_allclose(t, [0.1 * i for i in range(10)])
+        self.assertEqual(x.tolist(), [float(i) for i in range(10)])
+        self.assertEqual(y.tolist(), [0.] * 10)
+        self.assertEqual(z.tolist(), [10.] * 10)
+
+    def test_decimate(self):
+        # a 50Hz source: ten samples per meter
+        x, y, z = synthetic_flight.generate(20000, seed=5, spacing=0.1)
+        stored = decimate(x, y, z, 2.)
+        path = Path([(x[0], y[0], z[0])])
+        for p in zip(x.tolist(), y.tolist(), z.tolist()):
+            path.append_if_far_enough(p)
+        self.assertEqual(path.path, [(x[i], y[i], z[i]) for i in stored[:-1]])
+        self.assertEqual(stored[-1], len(x)-1)
+        self.assertLess(len(stored), len(x) / 15)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import numpy
+
+import synthetic_flight
+from trajectory_lod import TrajectoryLOD
+
+class TestTrajectoryLOD(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.x, cls.y, cls.z = synthetic_flight.generate(20000, seed=1)
+        cls.lod = TrajectoryLOD(cls.x, cls.y, cls.z, max_vertices=500)
+
+    def test_levels(self):
+        lod = self.lod
+        self.assertGreater(len(lod.levels), 2)
+        self.assertLessEqual(len(lod.levels[-1]), 500)
+        self.assertTrue(all(len(a) > len(b) for (a, b) in zip(lod.levels, lod.levels[1:])))
+
+    def test_finer_when_zoomed_in(self):
+        levels = [self.lod.level_for_extent(extent) for extent in (1., 10., 100., 1000., 1e6)]
+        self.assertEqual(levels, sorted(levels))
+        self.assertEqual(levels[0], 0)
+        self.assertEqual(levels[-1], len(self.lod.levels)-1)
+
+    def test_visible_within_budget(self):
+        cx, cy, cz = self.x[10000], self.y[10000], self.z[10000]
+        for half in (5., 20., 100., 1000., 1e5):
+            bounds = ((cx-half, cx+half), (cy-half, cy+half), (cz-half, cz+half))
+            x, y, z = self.lod.points_for_extent(2*half, bounds=bounds)
+            drawn = numpy.isfinite(x)
+            self.assertGreater(drawn.sum(), 0)
+            self.assertLessEqual(drawn.sum(), 500)
+        # zoomed in, the view is drawn from the full trajectory
+        half = 5.
+        bounds = ((cx-half, cx+half), (cy-half, cy+half), (cz-half, cz+half))
+        x, y, z = self.lod.points_for_extent(2*half, bounds=bounds)
+        inside = (numpy.abs(self.x - cx) <= half) & (numpy.abs(self.y - cy) <= half) & (numpy.abs(self.z - cz) <= half)
+        for (px, py, pz) in zip(self.x[inside], self.y[inside], self.z[inside]):
+            self.assertTrue(numpy.any((x == px) & (y == py) & (z == pz)))
+
+    def test_no_bounds_fits_budget(self):
+        x, y, z = self.lod.points_for_extent(1.)
+        self.assertLessEqual(len(x), 500)
+
+    def test_max_vertices(self):
+        with self.assertRaises(ValueError):
+            TrajectoryLOD([0,1,2,3,4], [0,1,0,1,0], [0]*5, max_vertices=1)
+        lod = TrajectoryLOD([0,1,2,3,4], [0,1,0,1,0], [0]*5, max_vertices=2)
+        self.assertEqual(2, len(lod.levels[-1]))
+
+if __name__ == "__main__":
+    unittest.main()
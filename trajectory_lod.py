@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import numpy
+
+'''
+    Returns the distance from every point in 'points' to the 3D line segment from 'a' to 'b'.
+    Unlike path_cleanup.point_line_dist this works on a whole (n,3) array at once, and it also
+    copes with a zero-length segment, which happens whenever the copter returns to where it started.
+'''
+def points_segment_dist(points, a, b):
+    ab = b - a
+    length_sq = numpy.dot(ab, ab)
+    if length_sq < 1e-12:
+        return numpy.sqrt(((points - a)**2).sum(axis=1))
+    t = numpy.clip((points - a).dot(ab) / length_sq, 0., 1.)
+    closest = a + t[:, None] * ab
+    return numpy.sqrt(((points - closest)**2).sum(axis=1))
+
+'''
+    Ramer-Douglas-Peucker over an (n,3) array. Returns the indices of the points to keep.
+    This is the same algorithm as path_cleanup.rdp_iter, but it always runs to completion
+    and measures the distance of each span with a single vectorized call.
+'''
+def rdp_indices(points, epsilon):
+    n = len(points)
+    if n < 3:
+        return numpy.arange(n)
+    keep = numpy.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stk = [(0, n-1)]
+    while stk:
+        start, end = stk.pop()
+        if end - start < 2:
+            continue
+        dists = points_segment_dist(points[start+1:end], points[start], points[end])
+        max_index = int(numpy.argmax(dists))
+        if dists[max_index] > epsilon:
+            max_index += start + 1
+            keep[max_index] = True
+            stk.append( (start, max_index) )
+            stk.append( (max_index, end) )
+    return numpy.flatnonzero(keep)
+
+'''
+    A level-of-detail pyramid over a flown trajectory, built once from the NED arrays.
+
+    Level 0 is the full trajectory. Every following level is an RDP simplification of the previous one,
+    with twice the epsilon. Levels are added until one of them fits within 'max_vertices', so there is
+    always a level that can be drawn at a bounded cost, no matter how long the flight was.
+    RDP keeps both ends of the trajectory, so 'max_vertices' has to be at least 2.
+'''
+class TrajectoryLOD(object):
+    def __init__(self, x, y, z, base_epsilon=0.25, max_vertices=500):
+        if max_vertices < 2:
+            raise ValueError('max_vertices must be at least 2, got %r' % (max_vertices,))
+        self.max_vertices = max_vertices
+        points = numpy.column_stack((x, y, z)).astype(float)
+        self.levels = [points]
+        self.epsilons = [0.]
+        epsilon = base_epsilon
+        while len(self.levels[-1]) > max(max_vertices, 2):
+            coarser = self.levels[-1][rdp_indices(self.levels[-1], epsilon)]
+            if len(coarser) == len(self.levels[-1]):
+                # nothing more to remove at this epsilon, try a larger one before adding a level
+                epsilon *= 2
+                continue
+            self.levels.append(coarser)
+            self.epsilons.append(epsilon)
+            epsilon *= 2
+
+    def level_for_extent(self, extent, pixels=800):
+        '''returns the index of the coarsest level whose error is below one pixel, when 'extent' meters span 'pixels' pixels'''
+        tolerance = extent / float(pixels)
+        level = 0
+        for i, epsilon in enumerate(self.epsilons):
+            if epsilon <= tolerance:
+                level = i
+        return level
+
+    def visible_points(self, level, bounds=None):
+        '''returns the (n,3) points of a level within bounds ((xmin, xmax), (ymin, ymax), (zmin, zmax)), with the
+           points just outside that the segments crossing the border need. Where the trajectory leaves the view and
+           comes back, a row of NaN breaks the line. With bounds None, this is the whole level.'''
+        points = self.levels[level]
+        if bounds is None:
+            return points
+        inside = numpy.ones(len(points), dtype=bool)
+        for axis, (lo, hi) in enumerate(bounds):
+            inside &= (points[:, axis] >= min(lo, hi)) & (points[:, axis] <= max(lo, hi))
+        keep = inside.copy()
+        keep[1:] |= inside[:-1]
+        keep[:-1] |= inside[1:]
+        index = numpy.flatnonzero(keep)
+        gaps = numpy.flatnonzero(numpy.diff(index) > 1) + 1
+        return numpy.insert(points[index], gaps, numpy.nan, axis=0)
+
+    def points_for_extent(self, extent, pixels=800, bounds=None):
+        '''returns the x, y and z arrays to draw for the given visible extent, clipped to bounds (see visible_points).
+           If more than max_vertices of them are visible, coarser levels are used until they fit, which the last
+           level always does.'''
+        level = self.level_for_extent(extent, pixels)
+        points = self.visible_points(level, bounds)
+        while numpy.isfinite(points[:, 0]).sum() > self.max_vertices and level < len(self.levels)-1:
+            level += 1
+            points = self.visible_points(level, bounds)
+        return points[:, 0], points[:, 1], points[:, 2]
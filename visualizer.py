@@ -3,77 +3,178 @@
 import argparse
 import sys
 
-import matplotlib.animation as animation
-import matplotlib.pyplot as plt
-import nvector as nv
-from mpl_toolkits.mplot3d import Axes3D
-
-import DataflashLog
-from path_cleanup import Path
-
 ### setup ###
 
 parser = argparse.ArgumentParser(description='Analyze an APM Dataflash log for known issues')
 parser.add_argument('logfile', type=argparse.FileType('r'), help='path to Dataflash log file (or - for stdin)')
 parser.add_argument('-f', '--format',  metavar='', type=str, action='store', choices=['bin','log','auto'], default='auto', help='log file format: \'bin\',\'log\' or \'auto\'')
 parser.add_argument('-s', '--skip_bad', metavar='', action='store_const', const=True, help='skip over corrupt dataflash lines')
+parser.add_argument('--headless', action='store_true', help='run the Safe-RTL simulation without drawing, and print the worst path length')
+parser.add_argument('--profile', action='store_true', help='record time spent and points freed in each cleanup stage, and print (headless) or plot them')
+parser.add_argument('--metrics', action='store_true', help='after a headless run, print how much the final flyback path deviates from the flown path')
+parser.add_argument('--stream', action='store_true', help='start animating while the log is still being parsed. The flown path so far is drawn from every n-th sample, not through the level-of-detail pyramid')
+parser.add_argument('--queue_depth', metavar='', type=int, default=64, help='how many GPS samples the parser may run ahead of the animation when streaming')
+parser.add_argument('--source', metavar='', type=str, choices=['GPS','POS','NKF1','XKF1','EKF1','auto'], default='GPS', help='position source: GPS, POS, NKF1, XKF1, EKF1, or auto for the fastest one in the log')
+parser.add_argument('--decimate', action='store_true', help='only feed the Path the positions that are far enough apart to be stored')
+parser.add_argument('--filter_gps', action='store_true', help='drop GPS samples with a bad fix, few satellites, high HDop or implausible jumps, see gps_filter.py')
+parser.add_argument('--early_pruning', action='store_true', help='splice out loops as soon as the vehicle comes back near an older point, instead of waiting for a cleanup')
+parser.add_argument('--jit', action='store_true', help='run the cleanup with the Numba compiled kernels, if Numba is installed')
+parser.add_argument('--record_trace', metavar='', type=str, help='with --headless, save every Path operation to this .npz trace, see path_trace.py')
+parser.add_argument('--window', metavar='', type=str, help='only parse START:END seconds after the first GPS sample of a text log (either can be empty), using a sidecar index, see log_index.py')
+parser.add_argument('--max_vertices', metavar='', type=int, default=500, help='most vertices used to draw the visible part of the flown path each frame')
 args = parser.parse_args()
-logdata = DataflashLog.DataflashLog(args.logfile.name, format=args.format, ignoreBadlines=args.skip_bad) # read log
-
-if "GPS" not in logdata.channels:
-    print("No GPS log data")
-    sys.exit(0)
+if args.record_trace and not args.headless:
+    parser.error("--record_trace only works with --headless, the animation doesn't save the trace")
+if args.max_vertices < 2:
+    parser.error('--max_vertices must be at least 2, the path always keeps its first and last point')
 
-### Convert from lat/lon to meters ###
+# everything else is imported only once we know it is needed, so --help and --headless start fast
+import DataflashLog
+from path_cleanup import Path, PathConfig
+from positions import gps_to_ned
+
+if args.stream and (args.source != 'GPS' or args.decimate):
+    print("--stream only reads GPS samples one by one, so --source and --decimate are ignored", file=sys.stderr)
+if args.stream and args.window:
+    print("--stream reads the whole log, so --window is ignored", file=sys.stderr)
+
+gps_filter = None
+if args.filter_gps:
+    if args.stream or args.source != 'GPS':
+        print("--filter_gps works on the whole GPS channel, so it only works with --source GPS and without --stream", file=sys.stderr)
+    else:
+        from gps_filter import GPSFilter
+        gps_filter = GPSFilter()
+
+stream = None
+if args.stream:
+    # parse in the background, and start animating as soon as the first GPS sample is in
+    from log_stream import GPSStream
+    stream = GPSStream(args.logfile.name, format=args.format, ignoreBadlines=args.skip_bad, depth=args.queue_depth)
+    home = stream.get(block=True)
+    if home is None:
+        print("No GPS log data")
+        sys.exit(0)
+    x, y, z = [home[0]], [home[1]], [home[2]]
+else:
+    if args.window:
+        from log_index import read_window
+        start, end = (float(t) if t else None for t in args.window.split(':'))
+        logdata = read_window(args.logfile.name, start, end, ignoreBadlines=args.skip_bad) # read only the window of the log
+    else:
+        logdata = DataflashLog.DataflashLog(args.logfile.name, format=args.format, ignoreBadlines=args.skip_bad) # read log
+
+    ### Convert from lat/lon to meters ###
+
+    if args.source == 'GPS':
+        ned = gps_to_ned(logdata, gps_filter)
+    else:
+        from position_source import pick_source
+        source = pick_source(logdata, args.source)
+        ned = None if source is None else [a.tolist() for a in source.positions(logdata)[1:]]
+    if ned is None:
+        print("No {} log data".format('position' if args.source == 'auto' else args.source))
+        sys.exit(0)
+    x, y, z = ned
+    if gps_filter is not None:
+        print(gps_filter.summary())
+
+    if args.decimate:
+        import path_cleanup
+        from position_source import decimate
+        stored = decimate(x, y, z, path_cleanup.position_delta).tolist()
+        print("{} of {} positions are far enough apart to be stored, or the last one".format(len(stored), len(x)))
+        x, y, z = [x[i] for i in stored], [y[i] for i in stored], [z[i] for i in stored]
+
+if args.jit:
+    from path_cleanup_jit import available, new_path
+    if not available:
+        print("Numba is not installed, using the pure Python cleanup", file=sys.stderr)
+    return_path = new_path( [ (x[0],y[0],z[0]) ], profile=args.profile, config=PathConfig(early_pruning=args.early_pruning) )
+else:
+    return_path = Path( [ (x[0],y[0],z[0]) ], profile=args.profile, config=PathConfig(early_pruning=args.early_pruning) )
+cleanup_path = return_path # the Path itself, for what isn't part of the flight
+if args.record_trace:
+    from path_trace import TraceRecorder
+    return_path = TraceRecorder(return_path)
 
-wgs84 = nv.FrameE(name='WGS84')
+### headless simulation ###
 
-lat = logdata.channels["GPS"]["Lat"].dictData
-lon = logdata.channels["GPS"]["Lng"].dictData
-alt = []
-if "RelAlt" in logdata.channels["GPS"]:
-    alt = logdata.channels["GPS"]["RelAlt"].dictData
-elif "Alt" in logdata.channels["GPS"]:
-    alt = logdata.channels["GPS"]["Alt"].dictData
-else:
-    print("No GPS log data")
+if args.headless:
+    i = 1
+    try:
+        while True:
+            if stream is not None:
+                sample = stream.get(block=True)
+                if sample is None:
+                    break
+                x.append(sample[0])
+                y.append(sample[1])
+                z.append(sample[2])
+            elif i >= len(x):
+                break
+            return_path.append_if_far_enough( (x[i], y[i], z[i]) )
+            return_path.routine_cleanup()
+            i += 1
+    finally: # keep the trace up to a failing call, replaying it reproduces the failure
+        if args.record_trace:
+            return_path.trace.save(args.record_trace)
+    print("{}: worst path length {}".format(args.logfile.name, return_path.worst_length))
+    if args.profile:
+        print(return_path.stats.summary())
+    if args.metrics:
+        from path_metrics import format_metrics, path_metrics
+        print(format_metrics(path_metrics(list(zip(x, y, z)), cleanup_path.get_flyback_path())))
     sys.exit(0)
 
-first_index = min(lat.keys())
+### animate ###
 
-home = wgs84.GeoPoint(latitude=lat[first_index], longitude=lon[first_index], z=alt[first_index], degrees=True)
+import matplotlib.animation as animation
+import matplotlib.pyplot as plt
+from mpl_toolkits.mplot3d import Axes3D
 
-x, y, z = [], [], []
-for i in lat.keys():
-    position = wgs84.GeoPoint(latitude=lat[i], longitude=lon[i], z=alt[i], degrees=True)
-    ned = nv.diff_positions(home, position)
-    frame_N = nv.FrameN(home)
-    ned = ned.change_frame(frame_N)
-    ned = ned.pvector.ravel()
-    x.append(ned[0])
-    y.append(ned[1])
-    z.append(alt[i])
+from trajectory_lod import TrajectoryLOD
 
-### animate ###
+flown_path = None # when streaming, the rest of the flight isn't known yet
+if stream is None:
+    flown_path = TrajectoryLOD(x, y, z, max_vertices=args.max_vertices)
 
-return_path = Path( [ (x[0],y[0],z[0]) ] )
 path_len = []
 counter = 10 # only render memory usage every 10 frames
 
 fig = plt.figure()
 ax = fig.add_subplot(111, projection='3d')
 mem_ax = fig.add_subplot(5,2,10)
+stats_ax = fig.add_subplot(5,2,8) if args.profile else None
 
 def animate(i):
+    if stream is not None:
+        # take at most one new sample per frame, and keep showing the latest one while the parser catches up
+        sample = stream.get()
+        if sample is not None:
+            x.append(sample[0])
+            y.append(sample[1])
+            z.append(sample[2])
+        i = len(x)-1
     try:
         return_path.append_if_far_enough( (x[i], y[i], z[i]) )
         return_path.routine_cleanup()
     except IndexError:
         pass # pause everything when it ends. Let the user choose when to end the program
+    # pick the level of detail from what the previous frame showed, since clearing resets the limits
+    limits = (ax.get_xlim3d(), ax.get_ylim3d(), ax.get_zlim3d())
+    extent = max(hi-lo for (lo,hi) in limits)
+    # the first frame shows the whole flight, later ones keep the view the user zoomed or panned to
+    keep_view = flown_path is not None and i > 0
     ax.clear()
 
-    ## plot flown whole path
-    # ax.plot_wireframe(x,y,z)
+    ## plot flown whole path, only what is in view
+    if flown_path is not None:
+        ax.plot(*flown_path.points_for_extent(extent, bounds=limits if keep_view else None), color='lightgray')
+    elif len(x) > 1:
+        # streaming: the flight so far, from every step-th sample so that it stays within max_vertices
+        step = -(-len(x) // args.max_vertices)
+        ax.plot(x[::step] + x[-1:], y[::step] + y[-1:], z[::step] + z[-1:], color='lightgray')
     ## plot return path currently in memory
     ax.plot_wireframe([k[0] for k in return_path.path], [k[1] for k in return_path.path], [k[2] for k in return_path.path], color='green')
     ## plot hypothetical return path if RTL activated now
@@ -84,6 +185,10 @@ def animate(i):
         ax.scatter(x[i], y[i], z[i], c='r', marker = 'o')
     except:
         pass
+    if keep_view:
+        ax.set_xlim3d(limits[0])
+        ax.set_ylim3d(limits[1])
+        ax.set_zlim3d(limits[2])
     ## render memory usage
     global counter
     counter = counter+1
@@ -92,6 +197,11 @@ def animate(i):
         path_len.append(len(return_path.path))
         mem_ax.clear()
         mem_ax.plot(path_len)
+        if stats_ax is not None:
+            stages = return_path.stats.to_dict()
+            stats_ax.clear()
+            stats_ax.barh(list(stages.keys()), [s['total_ms'] for s in stages.values()])
+            stats_ax.set_xlabel('cleanup time [ms]')
 
 ax.set_xlabel('X')
 ax.set_ylabel('Y')